@@ -63,6 +63,11 @@ const MOCKDATA = [
   },
 ];
 
+const PAGE_PARAMS = {
+  ordering: "expiration_date",
+  fields: "id,name,quantity,unit,expiration_date",
+};
+
 const PantryItem = ({ item, onToggleSelected }) => {
   const { id, name, quantity, unit, selected, status } = item;
 
@@ -105,6 +110,8 @@ const Pantry = () => {
   const [loading, setLoading] = useState(true);
   const [updateDate, setUpdateDate] = useState("");
   const [isGenerating, setIsGenerating] = useState(false);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Helper function to determine item status based on expiration date
   const getItemStatus = (expirationDate) => {
@@ -139,23 +146,27 @@ const Pantry = () => {
     setLoading(false);
   };
 
+  // Transform the API response to match our component's expected format
+  const transformItems = (items) =>
+    items.map((item) => ({
+      id: item.id,
+      name: item.name,
+      quantity: item.quantity,
+      unit: item.unit,
+      selected: false,
+      status: getItemStatus(item.expiration_date),
+      expiringDays: item.expiration_date
+        ? getDaysUntilExpiry(item.expiration_date)
+        : null,
+    }));
+
   const fetchPantryItems = async () => {
     try {
       setLoading(true);
-      const items = await inventoryService.getAllItems();
-      // Transform the API response to match our component's expected format
-      const transformedItems = items.map((item) => ({
-        id: item.id,
-        name: item.name,
-        quantity: item.quantity,
-        unit: item.unit,
-        selected: false,
-        status: getItemStatus(item.expiration_date),
-        expiringDays: item.expiration_date
-          ? getDaysUntilExpiry(item.expiration_date)
-          : null,
-      }));
-      setPantryItems(transformedItems);
+      // First page, soonest to expire first, with only the fields we render
+      const page = await inventoryService.getItems(PAGE_PARAMS);
+      setPantryItems(transformItems(page.results));
+      setNextPage(page.next);
       setUpdateDate(new Date().toLocaleDateString());
     } catch (error) {
       console.error("Failed to fetch pantry items:", error);
@@ -170,6 +181,19 @@ const Pantry = () => {
     fetchPantryItems();
   }, []);
 
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await inventoryService.getItems({}, nextPage);
+      setPantryItems((items) => [...items, ...transformItems(page.results)]);
+      setNextPage(page.next);
+    } catch (error) {
+      console.error("Failed to load more pantry items:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleToggleSelected = async (itemId, selected) => {
     try {
       // Update local state immediately for responsive UI
@@ -258,13 +282,8 @@ const Pantry = () => {
     try {
       setLoading(true); // Show loading state
 
-      // Delete each selected item from the inventory
-      for (const item of selectedItems) {
-        const result = await inventoryService.deleteItem(item.id);
-        if (result && result.success) {
-          console.log(`Item ${item.id} successfully deleted`);
-        }
-      }
+      // Delete the selected items from the inventory in one request
+      await inventoryService.deleteItems(selectedItems.map((item) => item.id));
 
       // Refresh the pantry items
       const remainingItems = pantryItems.filter((item) => !item.selected);
@@ -394,6 +413,16 @@ const Pantry = () => {
             ))}
           </div>
         )}
+
+        {nextPage && (
+          <button
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+            className="w-full text-sm text-blue-600 py-2"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        )}
       </div>
 
       <div className="mt-6 flex space-x-2">
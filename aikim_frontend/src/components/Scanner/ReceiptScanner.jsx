@@ -8,6 +8,7 @@ const ReceiptScanner = () => {
   const canvasRef = useRef(null);
   const [isCameraActive, setIsCameraActive] = useState(false);
   const [isScanning, setIsScanning] = useState(false);
+  const [scannedItems, setScannedItems] = useState([]);
   const [error, setError] = useState(null);
   const navigate = useNavigate();
 
@@ -151,8 +152,12 @@ const ReceiptScanner = () => {
       canvas.toBlob(
         async (blob) => {
           try {
-            // Use our API service to scan the receipt
-            const receiptData = await receiptService.scanReceipt(blob);
+            // Stream the scan so items show up while the receipt is still being read
+            setScannedItems([]);
+            const receiptData = await receiptService.scanReceiptStream(
+              blob,
+              (item) => setScannedItems((items) => [...items, item])
+            );
 
             // Navigate to confirmation page with the response data
             navigate("/scan-confirmation", {
@@ -244,6 +249,15 @@ const ReceiptScanner = () => {
                 <div className="flex flex-col items-center text-white">
                   <div className="w-12 h-12 border-2 border-white border-t-transparent rounded-full animate-spin mb-3"></div>
                   <p className="text-lg font-medium">Processing receipt...</p>
+                  {scannedItems.length > 0 && (
+                    <ul className="mt-3 text-sm text-center">
+                      {scannedItems.map((item, index) => (
+                        <li key={index}>
+                          {item.name} · {item.quantity} {item.unit}
+                        </li>
+                      ))}
+                    </ul>
+                  )}
                 </div>
               </div>
             )}
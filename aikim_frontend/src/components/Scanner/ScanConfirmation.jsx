@@ -50,7 +50,7 @@ const ScanConfirmation = () => {
 
       if (itemsToAdd.length > 0) {
         // Call the API to add items to inventory
-        await inventoryService.createItems(itemsToAdd);
+        await inventoryService.createItems(itemsToAdd, { merge: true });
       }
 
       // Navigate back to the pantry page
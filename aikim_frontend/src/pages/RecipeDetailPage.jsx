@@ -66,45 +66,16 @@ const RecipeDetailPage = () => {
         return;
       }
 
-      // Process each used ingredient to update inventory
-      for (const ingredient of ingredientsToUpdate) {
-        try {
-          // First get the current inventory item to check quantity
-          const inventoryItems = await inventoryService.getAllItems();
-          const inventoryItem = inventoryItems.find(
-            (item) => item.name.toLowerCase() === ingredient.name.toLowerCase()
-          );
-
-          if (inventoryItem) {
-            // Calculate new quantity
-            const newQuantity =
-              parseFloat(inventoryItem.quantity) -
-              parseFloat(ingredient.quantity);
-
-            if (newQuantity <= 0) {
-              // Delete the item if quantity is zero or negative
-              const result = await inventoryService.deleteItem(
-                inventoryItem.id
-              );
-              if (result && result.success) {
-                console.log(`Item ${inventoryItem.id} successfully deleted`);
-              }
-            } else {
-              // Update with new quantity
-              await inventoryService.updateItem(inventoryItem.id, {
-                ...inventoryItem,
-                quantity: newQuantity,
-              });
-            }
-          }
-        } catch (itemError) {
-          console.error(
-            `Error updating inventory item ${ingredient.name}:`,
-            itemError
-          );
-          // Continue with other items even if one fails
-        }
-      }
+      // The backend matches the ingredients to pantry items, converts units and
+      // subtracts them; items that run out are removed
+      await inventoryService.consumeIngredients(
+        recipe.recipe,
+        ingredientsToUpdate.map(({ name, quantity, unit }) => ({
+          name,
+          quantity,
+          unit,
+        }))
+      );
 
       // Show success message
       alert("Your pantry has been updated with the used ingredients!");
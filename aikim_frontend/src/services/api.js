@@ -60,9 +60,13 @@ export const authService = {
 
 // Inventory/Pantry related API calls
 export const inventoryService = {
-  getAllItems: async () => {
+  // One page of items: { next, results }. Pass `next` back as `cursorUrl` for the following page.
+  // params: ordering, fields, name, unit, expiring_before, page_size
+  getItems: async (params = {}, cursorUrl = null) => {
     try {
-      const response = await api.get("/inventory/");
+      const response = cursorUrl
+        ? await api.get(cursorUrl)
+        : await api.get("/inventory/", { params });
       return response.data;
     } catch (error) {
       console.error("Error fetching inventory items:", error);
@@ -70,9 +74,23 @@ export const inventoryService = {
     }
   },
 
-  createItems: async (items) => {
+  // Every item, following the pages
+  getAllItems: async (params = {}) => {
+    let page = await inventoryService.getItems({ page_size: 500, ...params });
+    const items = [...page.results];
+    while (page.next) {
+      page = await inventoryService.getItems({}, page.next);
+      items.push(...page.results);
+    }
+    return items;
+  },
+
+  // With merge, quantities are added to matching pantry items instead of creating duplicates
+  createItems: async (items, { merge = false } = {}) => {
     try {
-      const response = await api.post("/inventory/", items);
+      const response = await api.post("/inventory/", items, {
+        params: merge ? { merge: true } : undefined,
+      });
       return response.data;
     } catch (error) {
       console.error("Error creating inventory items:", error);
@@ -100,6 +118,47 @@ export const inventoryService = {
     }
   },
 
+  // changes: [{ id, delta }] or [{ id, quantity }]; items that run out are removed.
+  // Returns { results: [{ id, status: "updated" | "deleted" | "not_found", quantity }] }
+  changeQuantities: async (changes, { removeEmpty = true } = {}) => {
+    try {
+      const response = await api.patch("/inventory/bulk/", changes, {
+        params: { remove_empty: removeEmpty },
+      });
+      return response.data;
+    } catch (error) {
+      console.error("Error updating inventory quantities:", error);
+      throw error;
+    }
+  },
+
+  // Cook a recipe: the backend matches its ingredients to pantry items, converts units and
+  // subtracts them in one transaction. Returns { results: [{ name, status, used, missing }] }
+  consumeIngredients: async (recipeName, ingredients) => {
+    try {
+      const response = await api.post("/inventory/consume/", {
+        recipe: recipeName,
+        ingredients,
+      });
+      return response.data;
+    } catch (error) {
+      console.error("Error consuming recipe ingredients:", error);
+      throw error;
+    }
+  },
+
+  deleteItems: async (itemIds) => {
+    try {
+      const response = await api.delete("/inventory/bulk/", {
+        data: { ids: itemIds },
+      });
+      return response.data;
+    } catch (error) {
+      console.error("Error deleting inventory items:", error);
+      throw error;
+    }
+  },
+
   deleteAllItems: async () => {
     try {
       const response = await api.delete("/inventory/");
@@ -164,6 +223,9 @@ export const recipeService = {
 };
 
 // Receipt scanning service
+const SCAN_POLL_INTERVAL_MS = 1000;
+const SCAN_POLL_TIMEOUT_MS = 120000;
+
 export const receiptService = {
   scanReceipt: async (imageFile) => {
     try {
@@ -175,12 +237,91 @@ export const receiptService = {
           "Content-Type": "multipart/form-data",
         },
       });
-      return response.data;
+
+      // Uploads are queued on the backend; poll the job until the scan finishes
+      let job = response.data;
+      const deadline = Date.now() + SCAN_POLL_TIMEOUT_MS;
+      while (job.status === "pending" || job.status === "running") {
+        if (Date.now() > deadline) {
+          throw new Error("Receipt scan timed out");
+        }
+        await new Promise((resolve) => setTimeout(resolve, SCAN_POLL_INTERVAL_MS));
+        job = await receiptService.getScanJob(job.job_id);
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error || "Receipt scan failed");
+      }
+      return job;
     } catch (error) {
       console.error("Error scanning receipt:", error);
       throw error;
     }
   },
+
+  // Streams the scan over Server-Sent Events; onItem is called for every item as soon as
+  // the backend has parsed it. Resolves with the final summary event.
+  scanReceiptStream: async (imageFile, onItem = () => {}) => {
+    const formData = new FormData();
+    formData.append("image", imageFile);
+
+    const headers = { Accept: "text/event-stream" };
+    const token = process.env.REACT_APP_AUTH_TOKEN;
+    if (token) {
+      headers.Authorization = `Token ${token}`;
+    }
+
+    try {
+      const response = await fetch(`${api.defaults.baseURL}/receipts/scan_receipt/stream/`, {
+        method: "POST",
+        headers,
+        body: formData,
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Receipt scan failed (${response.status})`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const message = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          const event = message.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] || "null");
+          if (event === "item") {
+            onItem(data);
+          } else if (event === "summary") {
+            return data;
+          } else if (event === "error") {
+            throw new Error(data.error || "Receipt scan failed");
+          }
+        }
+      }
+      throw new Error("Receipt scan stream ended unexpectedly");
+    } catch (error) {
+      console.error("Error streaming receipt scan:", error);
+      throw error;
+    }
+  },
+
+  getScanJob: async (jobId) => {
+    try {
+      const response = await api.get(`/receipts/scan_jobs/${jobId}/`);
+      return response.data;
+    } catch (error) {
+      console.error("Error fetching receipt scan job:", error);
+      throw error;
+    }
+  },
 };
 
 // User management API calls
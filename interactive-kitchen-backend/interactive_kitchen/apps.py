@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class InteractiveKitchenConfig(AppConfig):
+    name = 'interactive_kitchen'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import db
+        connection_created.connect(db.configure_sqlite, dispatch_uid='interactive_kitchen.db.configure_sqlite')
@@ -3,6 +3,10 @@ ASGI config for interactive_kitchen project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. `uvicorn interactive_kitchen.asgi:application`) so the
+async endpoints can keep many LLM calls in flight per process; see "Async Endpoints and the
+ASGI Profile" in README.md.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
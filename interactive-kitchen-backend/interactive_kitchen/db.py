@@ -0,0 +1,42 @@
+"""
+Per-connection database setup.
+
+SQLite keeps most of its tuning per connection, so `configure_sqlite` runs the
+SQLITE_PRAGMAS of the settings on every new connection (`connection_created`). The
+PRAGMAs go straight to the driver connection and do not appear in the query log.
+"""
+import logging
+import re
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def pragma_statements(pragmas):
+    statements = []
+    for name, value in pragmas.items():
+        if not re.fullmatch(r'\w+', name) or not re.fullmatch(r'\w+', str(value)):
+            raise ValueError(f"Invalid SQLite PRAGMA {name} = {value}")
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for statement in pragma_statements(getattr(settings, 'SQLITE_PRAGMAS', {})):
+        connection.connection.execute(statement)
+    logger.debug(f"Configured SQLite connection to {connection.settings_dict['NAME']}")
+
+
+def sqlite_settings(connection):
+    """
+    The journal mode, synchronous level and busy timeout of an open SQLite connection.
+    """
+    with connection.cursor() as cursor:
+        values = {}
+        for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
@@ -0,0 +1,141 @@
+import json
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from interactive_kitchen.db import sqlite_settings
+from inventory import bulk
+from inventory.models import InventoryItem
+from inventory.normalization import normalize_name
+from recipes.management.commands.benchmark_llm import percentile
+from users.models import CustomUser
+
+SEED_ITEMS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure inventory write throughput with parallel clients against the configured database "
+        "profile (DB_PROFILE); run it once per profile to compare them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help="Parallel clients, each with its own connection and user.")
+        parser.add_argument('--operations', type=int, default=200, help="Operations per client.")
+        parser.add_argument('--workload', choices=['create', 'update', 'mixed'], default='mixed',
+                            help="create: add items; update: bulk quantity changes; mixed: add, change and delete.")
+        parser.add_argument('--read-ratio', type=float, default=0.0,
+                            help="Share of operations that read the client's pantry instead of writing.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON (for CI).")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        users = [
+            CustomUser.objects.create_user(username=f"benchmark-db-{run}-{n}", email=f"{run}-{n}@benchmark.invalid")
+            for n in range(options['clients'])
+        ]
+        try:
+            InventoryItem.objects.bulk_create(
+                InventoryItem(name=f"Item {n}", normalized_name=normalize_name(f"Item {n}"), quantity=10, unit="pcs", added_by=user)
+                for user in users for n in range(SEED_ITEMS)
+            )
+            # Read before the clients start, so only the measured operations contend for locks
+            ids = {user.id: [] for user in users}
+            for user_id, item_id in InventoryItem.objects.filter(added_by__in=users).order_by('id').values_list('added_by', 'id'):
+                ids[user_id].append(item_id)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+                results = list(pool.map(
+                    lambda args: self.run_client(*args, ids[args[1].id], options), enumerate(users)
+                ))
+            wall = time.perf_counter() - started
+        finally:
+            for user in users:
+                user.delete()
+        report = self.report(options, [sample for samples in results for sample in samples], wall)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['profile']} ({report['vendor']}): {report['clients']} clients, {report['writes']} writes, "
+            f"{report['reads']} reads, {report['errors']} errors ({report['lock_errors']} lock), "
+            f"{report['writes_per_s']} writes/s"
+        ))
+        self.stdout.write(
+            f"write latency ms  p50 {report['p50_ms']}  p90 {report['p90_ms']}  p99 {report['p99_ms']}  max {report['max_ms']}"
+        )
+        self.stdout.write(f"settings {json.dumps(report['settings'])}")
+
+    def run_client(self, index, user, ids, options):
+        rng = random.Random(options['seed'] + index)
+        samples = []
+        try:
+            for n in range(options['operations']):
+                if rng.random() < options['read_ratio']:
+                    kind, call = 'read', lambda: len(InventoryItem.objects.filter(added_by=user).order_by('id')[:50])
+                else:
+                    kind, call = 'write', self.write_operation(options['workload'], n, user, ids, rng)
+                samples.append((kind, *self.timed(call)))
+        finally:
+            connection.close()
+        return samples
+
+    def write_operation(self, workload, n, user, ids, rng):
+        step = {'create': 0, 'update': 1}.get(workload, n % 3)
+
+        def create():
+            item = InventoryItem.objects.create(name=f"Extra {n}", quantity=1, unit="pcs", added_by=user)
+            ids.append(item.id)
+
+        def update():
+            changes = [{"id": item_id, "delta": rng.choice((-1, 1))} for item_id in rng.sample(ids, min(3, len(ids)))]
+            bulk.change_quantities(user, changes, remove_empty=False)
+
+        def delete():
+            if len(ids) > SEED_ITEMS:
+                bulk.delete_items(user, [ids.pop()])
+        return (create, update, delete)[step]
+
+    def timed(self, call):
+        start = time.perf_counter()
+        error = None
+        try:
+            call()
+        except OperationalError as e:
+            error = 'lock' if 'locked' in str(e) else 'other'
+        except Exception as e:
+            self.stderr.write(f"Operation failed: {e}")
+            error = 'other'
+        return round((time.perf_counter() - start) * 1000, 2), error
+
+    def report(self, options, samples, wall):
+        writes = [ms for kind, ms, error in samples if kind == 'write' and error is None]
+        database = settings.DATABASES['default']
+        if connection.vendor == 'sqlite':
+            database_settings = dict(sqlite_settings(connection), **database.get('OPTIONS', {}))
+        else:
+            database_settings = {"CONN_MAX_AGE": database.get('CONN_MAX_AGE'), **database.get('OPTIONS', {})}
+        return {
+            "profile": settings.DB_PROFILE,
+            "vendor": connection.vendor,
+            "settings": database_settings,
+            "clients": options['clients'],
+            "workload": options['workload'],
+            "writes": len(writes),
+            "reads": sum(kind == 'read' and error is None for kind, _, error in samples),
+            "errors": sum(error is not None for _, _, error in samples),
+            "lock_errors": sum(error == 'lock' for _, _, error in samples),
+            "wall_s": round(wall, 3),
+            "writes_per_s": round(len(writes) / wall, 1) if wall else None,
+            "mean_ms": round(statistics.fmean(writes), 2) if writes else None,
+            **{f"p{pct}_ms": percentile(writes, pct) for pct in (50, 90, 99)},
+            "max_ms": max(writes) if writes else None,
+        }
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     'users',           # Add users app
     'recipes',         # Add recipes app
     'receipts',        # Add receipts app
+    'interactive_kitchen',  # Project-wide hooks and commands
 
 ]
 
@@ -93,19 +95,272 @@ AUTH_USER_MODEL = 'users.CustomUser'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_PROFILE picks one of DATABASE_PROFILES:
+# - 'sqlite' (default): the local file (SQLITE_PATH), tuned for concurrent requests by SQLITE_PRAGMAS.
+#   Transactions take the write lock when they start (IMMEDIATE), so a transaction that
+#   reads and then writes waits for the busy timeout instead of failing with "database is
+#   locked" when another writer got there first.
+# - 'sqlite-untuned': the same file with SQLite's defaults (rollback journal, full sync),
+#   to compare against with `manage.py benchmark_db_writes`.
+# - 'postgresql': persistent connections, reused for DB_CONN_MAX_AGE seconds and checked
+#   before reuse.
+# - 'postgresql-pooled': a psycopg 3 connection pool per process (needs psycopg[pool]).
+DB_PROFILE = os.getenv('DB_PROFILE', 'sqlite')
+POSTGRESQL = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': os.getenv('POSTGRES_DB', 'interactive_kitchen'),
+    'USER': os.getenv('POSTGRES_USER', 'postgres'),
+    'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+    'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+    'PORT': os.getenv('POSTGRES_PORT', '5432'),
+}
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    },
+    'sqlite-untuned': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    },
+    'postgresql': dict(
+        POSTGRESQL,
+        CONN_MAX_AGE=int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        CONN_HEALTH_CHECKS=True,
+    ),
+    'postgresql-pooled': dict(
+        POSTGRESQL,
+        # Pooled connections go back to the pool after each request
+        CONN_MAX_AGE=0,
+        OPTIONS={'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 20)),
+            'timeout': 10,  # seconds to wait for a free connection
+        }},
+    ),
+}
+DATABASES = {
+    'default': DATABASE_PROFILES[DB_PROFILE],
+}
+
+# PRAGMAs run on every new SQLite connection (interactive_kitchen/db.py). WAL lets readers
+# work alongside the writer, synchronous=NORMAL is durable across application crashes in WAL
+# mode, and writers wait up to busy_timeout ms for the lock.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+} if DB_PROFILE != 'sqlite-untuned' else {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+# Cache backend profiles, picked with the CACHE_BACKEND environment variable:
+# 'locmem' (per process), 'file' (CACHE_LOCATION is a directory shared by the processes of a
+# host), 'redis' (CACHE_LOCATION is a server URL; needs redis-py) or 'fake-redis' (an
+# in-process stand-in for Redis from utils/fake_redis.py, for tests and benchmarks).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_PROFILES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'interactive-kitchen',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+    },
+    'fake-redis': {
+        'BACKEND': 'utils.fake_redis.FakeRedisCache',
+        'LOCATION': 'redis://fake/0',
+    },
+}
+CACHES = {
+    'default': dict(CACHE_PROFILES[CACHE_BACKEND], KEY_PREFIX='ik', TIMEOUT=300),
+}
+
+# Namespaced cache helpers (utils/caching.py). NAMESPACES overrides 'TTL' (seconds) or
+# 'ENABLED' of single namespaces, e.g. {'expiry-summary': {'TTL': 600}}.
+CACHING = {
+    'ALIAS': 'default',
+    'LOCK_TIMEOUT': 30,  # seconds
+    'LOCK_WAIT': 5.0,  # seconds
+    'POLL_INTERVAL': 0.05,
+    'NAMESPACES': {},
 }
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Token authentication cache (users/token_cache.py). Process-local entries live for LOCAL_TTL,
+# which bounds how long other processes accept a revoked token; set SHARED_CACHE to a CACHES
+# alias (e.g. Redis) to share entries for the full TTL when running several processes.
+TOKEN_AUTH_CACHE = {
+    'ENABLED': True,
+    'TTL': 5 * 60,  # seconds, in the shared cache
+    'LOCAL_TTL': 10,  # seconds, in the process LRU
+    'MAX_ENTRIES': 10000,
+    'SHARED_CACHE': None,
+}
+
+# Receipt scan result cache (see receipts/cache.py)
+RECEIPT_SCAN_CACHE = {
+    'ENABLED': True,
+    'TTL': 7 * 24 * 60 * 60,  # seconds
+    'MAX_ENTRIES': 5000,
+}
+
+# Receipt extraction engines, tried in order (see receipts/engines.py).
+# The local Tesseract result is used when its parse confidence reaches the threshold;
+# otherwise the scan falls through to the OpenAI vision model.
+RECEIPT_EXTRACTION = {
+    'ENGINES': [
+        ('receipts.engines.TesseractEngine', {'lang': 'eng', 'config': '--psm 6 --oem 1'}),
+        'receipts.engines.OpenAIVisionEngine',
+    ],
+    'CONFIDENCE_THRESHOLD': 0.8,
+}
+
+# Receipt photo preprocessing before OCR / vision calls (see receipts/preprocessing.py).
+# Images are downscaled to TARGET_DPI for a RECEIPT_WIDTH_MM wide strip of paper.
+RECEIPT_PREPROCESSING = {
+    'ENABLED': True,
+    'GRAYSCALE': True,
+    'CROP': True,
+    'DESKEW': True,
+    'MAX_SKEW_DEGREES': 5.0,
+    'TARGET_DPI': 300,
+    'RECEIPT_WIDTH_MM': 80,
+    'FORMAT': 'JPEG',  # or 'PNG'
+    'JPEG_QUALITY': 80,
+}
+
+# Receipt scan job queue (see receipts/jobs.py). With AUTOSTART the web process runs
+# WORKERS scan threads itself; turn it off when running `manage.py run_scan_workers`.
+RECEIPT_SCAN_QUEUE = {
+    'WORKERS': 4,
+    'AUTOSTART': True,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 2.0,  # doubled after every failed attempt
+    'BACKOFF_MAX_SECONDS': 60.0,
+    'POLL_INTERVAL': 1.0,
+    'STALE_AFTER': 300,  # seconds before a RUNNING job is assumed abandoned
+    'REQUEUE_INTERVAL': 60,  # seconds between checks for abandoned jobs while workers run
+}
+
+# Multi-image scans (receipts/scan_batch/). CONCURRENCY bounds the batch scans running
+# at once in a process, across all batch requests.
+RECEIPT_BATCH = {
+    'MAX_IMAGES': 10,
+    'CONCURRENCY': 4,
+}
+
+# Recipe suggestion cache (recipes/cache.py). A user's entries are also dropped whenever
+# their inventory changes.
+RECIPE_CACHE = {
+    'ENABLED': True,
+    'TTL': 24 * 60 * 60,  # seconds
+    'MAX_ENTRIES': 5000,
+}
+
+# Recipe prompt compaction (recipes/utils/prompt_builder.py). Ingredients beyond the budget
+# are aggregated into one "also available" line.
+RECIPE_PROMPT = {
+    'MAX_INGREDIENT_TOKENS': 600,
+    'MODEL': 'gpt-3.5-turbo',  # picks the tiktoken encoding when tiktoken is installed
+}
+
+# Offline recipe matching over the bundled collection (recipes/matcher.py).
+# DEFAULT_ENGINE is used when a suggest request does not send `engine` ('gpt', 'local' or 'hybrid').
+RECIPE_MATCHER = {
+    'DEFAULT_ENGINE': 'gpt',
+    'TOP_K': 3,
+    'MIN_COVERAGE': 0.5,  # share of a recipe's required ingredients that must be on hand
+    'URGENT_DAYS': 3,
+    'URGENCY_WEIGHT': 0.5,
+    'PREFILTER_K': 5,  # local candidates passed to the model in hybrid mode
+}
+
+# Concurrent one-recipe completions instead of one long completion (recipes/utils/gpt_utils.py).
+# Used when a suggest request sends `fanout`, or for every request when ENABLED. Times in seconds.
+RECIPE_FANOUT = {
+    'ENABLED': False,
+    'CALLS': 3,
+    'MAX_CALLS': 5,
+    'CALL_TIMEOUT': 20.0,
+    'DEADLINE': 25.0,  # the whole fan-out returns by then with whatever finished
+    'MAX_TOKENS': 900,  # completion cap per call
+}
+
+# Parsing of model answers (utils/llm_output.py): how often to ask the model again when
+# its answer cannot be repaired locally.
+LLM_OUTPUT = {
+    'REASK_ATTEMPTS': 1,
+}
+
+# Where chat completions come from (utils/llm_providers.py): 'openai', 'fake' (in-process
+# stand-in with canned answers, for benchmarks and CI) or a dotted path. Latencies in ms.
+LLM_PROVIDER = {
+    'BACKEND': os.getenv('LLM_PROVIDER', 'openai'),
+    'FAKE_LATENCY': {'DISTRIBUTION': 'lognormal', 'MEDIAN_MS': 800, 'SIGMA': 0.5},
+    'FAKE_ERROR_RATE': 0.0,
+    'FAKE_SEED': None,
+    'FAKE_RESPONSES': {},  # {'receipt': <JSON value>, 'recipe': [<raw answer>, ...]}
+}
+
+# Shared async OpenAI client (utils/async_runtime.py). One pooled client per process is
+# reused across requests; timeouts are in seconds.
+OPENAI_CLIENT = {
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    'KEEPALIVE_EXPIRY': 30.0,
+    'CONNECT_TIMEOUT': 5.0,
+    'READ_TIMEOUT': 60.0,
+    'WRITE_TIMEOUT': 10.0,
+    'POOL_TIMEOUT': 10.0,
+    'MAX_RETRIES': 2,
+}
+
+# Bulk inventory ingestion (inventory/ingestion.py). With MERGE on, items with the same
+# normalized name and unit whose expiration dates fall in the same EXPIRY_BUCKET_DAYS
+# window are added to the existing row instead of creating a new one.
+INVENTORY_INGESTION = {
+    'MERGE': False,
+    'EXPIRY_BUCKET_DAYS': 3,
+}
+
+# Bulk quantity changes and deletes (inventory/bulk.py). With REMOVE_EMPTY, items whose
+# quantity drops to 0 or below are deleted in the same transaction.
+INVENTORY_BULK = {
+    'MAX_ITEMS': 500,
+    'REMOVE_EMPTY': True,
+}
+
+# Cursor pagination of the inventory list (inventory/pagination.py)
+INVENTORY_LIST = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 500,
+    'ORDERING': 'id',
+}
+
+# Expiring-soon endpoint and the daily expiry summaries (inventory/expiry.py). BUCKETS maps
+# labels to their upper bound in days from today; the rest count as 'later' / 'no_date'.
+INVENTORY_EXPIRY = {
+    'DEFAULT_WITHIN_DAYS': 3,
+    'MAX_WITHIN_DAYS': 365,
+    'MAX_RESULTS': 200,
+    'BUCKETS': {'expired': -1, 'today': 0, 'within_3_days': 3, 'within_7_days': 7},
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
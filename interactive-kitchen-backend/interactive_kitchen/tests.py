@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from interactive_kitchen.db import pragma_statements, sqlite_settings
+from inventory.models import InventoryItem
+from users.models import CustomUser
+
+
+class SQLiteTuningTests(SimpleTestCase):
+
+    def open(self, path):
+        wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=path), alias='tuning')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_new_connections_are_tuned(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open(os.path.join(directory, 'db.sqlite3'))
+            self.assertEqual(sqlite_settings(wrapper), {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000})
+
+    def test_pragmas_come_from_the_settings(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(SQLITE_PRAGMAS={'journal_mode': 'DELETE', 'synchronous': 'FULL'}):
+            wrapper = self.open(os.path.join(directory, 'db.sqlite3'))
+            self.assertEqual(sqlite_settings(wrapper)['journal_mode'], 'delete')
+            self.assertEqual(sqlite_settings(wrapper)['synchronous'], 2)
+
+    def test_invalid_pragmas_are_rejected(self):
+        with self.assertRaises(ValueError):
+            pragma_statements({'journal_mode': 'WAL; DROP TABLE x'})
+
+
+class BenchmarkDBWritesTests(TransactionTestCase):
+
+    def test_report(self):
+        out = StringIO()
+        call_command("benchmark_db_writes", clients=2, operations=9, read_ratio=0.2, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report["profile"], report["vendor"], report["clients"]), ("sqlite", "sqlite", 2))
+        self.assertEqual(report["writes"] + report["reads"] + report["errors"], 18)
+        self.assertGreater(report["writes_per_s"], 0)
+        self.assertIn("journal_mode", report["settings"])
+        # The temporary users and their items are gone
+        self.assertFalse(CustomUser.objects.filter(username__startswith="benchmark-db-").exists())
+        self.assertEqual(InventoryItem.objects.count(), 0)
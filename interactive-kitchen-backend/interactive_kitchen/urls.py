@@ -42,6 +42,7 @@ urlpatterns = [
     path('api/auth/register/', RegisterView.as_view(), name='register'),
     path('api/auth/login/', LoginView.as_view(), name='login'),
     path('api/auth/logout/', LogoutView.as_view(), name='logout'),
+    path('api/auth/token_cache/stats/', user_views.token_cache_stats, name='token_cache_stats'),
     path('api/auth/', include('rest_framework.urls')),
     path('api/recipe/', include('recipes.urls')),  # Include recipe-specific URLs
     path('api/receipts/', include('receipts.urls')),
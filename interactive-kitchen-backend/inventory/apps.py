@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from . import expiry, signals, versioning
+        signals.inventory_changed.connect(versioning.on_inventory_changed, dispatch_uid='inventory.versioning.bump')
+        signals.inventory_changed.connect(expiry.on_inventory_changed, dispatch_uid='inventory.expiry.invalidate')
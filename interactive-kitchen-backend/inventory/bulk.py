@@ -0,0 +1,88 @@
+"""
+Set-based changes to many inventory items in one request.
+
+`change_quantities` applies quantity deltas (`F('quantity') + delta`, never below 0) and
+absolute quantities with a single bulk UPDATE, and in the same transaction deletes the items
+that ran out.
+`delete_items` removes a list of items with one DELETE. Both report an outcome per id; ids
+that do not exist or belong to someone else are `not_found` and do not abort the rest. The
+number of queries does not depend on the number of items.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest
+
+from .models import InventoryItem
+from .signals import notify_inventory_changed
+
+DEFAULTS = {
+    'MAX_ITEMS': 500,
+    'REMOVE_EMPTY': True,
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'INVENTORY_BULK', {}))
+    return options
+
+
+def change_quantities(user, changes, remove_empty=None):
+    """
+    Apply validated `{"id", "delta"}` / `{"id", "quantity"}` dicts to the user's items.
+
+    Deltas never take a quantity below 0. With `remove_empty` (default
+    INVENTORY_BULK['REMOVE_EMPTY']) items left with a quantity of 0 are deleted. Returns one outcome per change, in order:
+    `{"id", "status": "updated", "quantity"}`, `{"id", "status": "deleted"}` or
+    `{"id", "status": "not_found"}`.
+    """
+    remove_empty = get_options()['REMOVE_EMPTY'] if remove_empty is None else remove_empty
+    ids = [change['id'] for change in changes]
+    with transaction.atomic():
+        owned = set(
+            InventoryItem.objects.select_for_update().filter(added_by=user, id__in=ids).values_list('id', flat=True)
+        )
+        updates = []
+        for change in changes:
+            if change['id'] not in owned:
+                continue
+            if 'delta' in change:
+                quantity = Greatest(F('quantity') + change['delta'], Value(0.0), output_field=FloatField())
+            else:
+                quantity = change['quantity']
+            updates.append(InventoryItem(id=change['id'], quantity=quantity))
+        quantities = {}
+        if updates:
+            InventoryItem.objects.bulk_update(updates, ['quantity'])
+            quantities = dict(InventoryItem.objects.filter(id__in=owned).values_list('id', 'quantity'))
+        emptied = {item_id for item_id, quantity in quantities.items() if quantity <= 0} if remove_empty else set()
+        if emptied:
+            InventoryItem.objects.filter(id__in=emptied).delete()
+    if owned:
+        notify_inventory_changed(user.id)
+
+    outcomes = []
+    for item_id in ids:
+        if item_id not in owned:
+            outcomes.append({"id": item_id, "status": "not_found"})
+        elif item_id in emptied:
+            outcomes.append({"id": item_id, "status": "deleted"})
+        else:
+            outcomes.append({"id": item_id, "status": "updated", "quantity": quantities[item_id]})
+    return outcomes
+
+
+def delete_items(user, ids):
+    """
+    Delete the user's items among `ids`; returns `{"id", "status": "deleted" | "not_found"}` per id.
+    """
+    with transaction.atomic():
+        owned = set(
+            InventoryItem.objects.select_for_update().filter(added_by=user, id__in=ids).values_list('id', flat=True)
+        )
+        if owned:
+            InventoryItem.objects.filter(id__in=owned).delete()
+    if owned:
+        notify_inventory_changed(user.id)
+    return [{"id": item_id, "status": "deleted" if item_id in owned else "not_found"} for item_id in ids]
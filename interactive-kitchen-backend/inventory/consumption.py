@@ -0,0 +1,126 @@
+"""
+Consuming a recipe's ingredients from the inventory ("cook this recipe").
+
+Ingredients are matched to inventory rows through the stored `normalized_name`. Matching
+names share their last word, so one SELECT reads and locks the candidate rows of all
+ingredients: names equal to an ingredient's last word or ending in it. Each ingredient then
+uses its best matching rows (see `match_rank`): the same name, then a more specific item
+("rice" -> "white rice"), then a more general one ("fresh baby spinach" -> "spinach").
+
+Quantities are converted between units of the same dimension (inventory/units.py), and each
+ingredient is taken from the rows that expire first. Rows that run out are deleted and the
+others updated in bulk. A consume runs in one transaction and costs a fixed number of
+queries, however many ingredients the recipe has.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import InventoryItem
+from .normalization import normalize_name
+from .signals import notify_inventory_changed
+from .units import convert
+
+# Quantities at or below this are treated as used up
+EPSILON = 1e-6
+
+
+def match_rank(ingredient, item):
+    """
+    How well an inventory item's normalized name matches an ingredient's (lower is better),
+    or None when they do not match.
+    """
+    if item == ingredient:
+        return 0
+    if item.endswith(' ' + ingredient):
+        return 1
+    if ingredient.endswith(' ' + item):
+        # Prefer the longest matching tail
+        return 1 + len(ingredient.split()) - len(item.split())
+    return None
+
+
+def best_matches(ingredient, rows):
+    ranked = [(match_rank(ingredient, row.normalized_name), row) for row in rows]
+    ranked = [(rank, row) for rank, row in ranked if rank is not None]
+    if not ranked:
+        return []
+    best = min(rank for rank, _ in ranked)
+    return [row for rank, row in ranked if rank == best]
+
+
+def _round(quantity):
+    return round(quantity, 6)
+
+
+def consume(user, ingredients, dry_run=False):
+    """
+    Take validated `{"name", "quantity", "unit"}` dicts out of the user's inventory.
+
+    Returns one outcome per ingredient with a `status` of `consumed`, `partial` (not enough
+    on hand; `missing` is what is lacking, in the ingredient's unit), `not_found`,
+    `unit_mismatch` (only items in incomparable units) or `skipped` (no quantity given),
+    and the rows it was taken from under `used`. With `dry_run` nothing is written.
+    """
+    names = [normalize_name(ingredient['name']) for ingredient in ingredients]
+    last_words = {name.split()[-1] for name in names if name}
+    matching = Q(normalized_name__in=last_words)
+    for word in last_words:
+        matching |= Q(normalized_name__endswith=' ' + word)
+    with transaction.atomic():
+        rows = list(
+            InventoryItem.objects
+            .select_for_update()
+            .filter(matching, added_by=user)
+            .order_by(F('expiration_date').asc(nulls_last=True), 'id')
+        ) if last_words else []
+
+        outcomes, changed = [], {}
+        for ingredient, name in zip(ingredients, names):
+            outcome = {"name": ingredient['name'], "quantity": ingredient['quantity'], "unit": ingredient['unit'], "used": []}
+            outcomes.append(outcome)
+            candidates = best_matches(name, rows) if name else []
+            if not candidates:
+                outcome['status'] = 'not_found'
+                continue
+            if ingredient['quantity'] is None:
+                outcome['status'] = 'skipped'
+                continue
+            compatible = [row for row in candidates if convert(1, ingredient['unit'], row.unit) is not None]
+            if not compatible:
+                outcome['status'] = 'unit_mismatch'
+                outcome['available_units'] = sorted({row.unit for row in candidates})
+                continue
+
+            remaining = ingredient['quantity']
+            for row in compatible:
+                if remaining <= EPSILON:
+                    break
+                available = convert(row.quantity, row.unit, ingredient['unit'])
+                if available <= EPSILON:
+                    continue
+                taken = min(available, remaining)
+                taken_in_row_unit = convert(taken, ingredient['unit'], row.unit)
+                row.quantity = _round(row.quantity - taken_in_row_unit)
+                remaining -= taken
+                changed[row.id] = row
+                outcome['used'].append({"id": row.id, "name": row.name, "quantity": _round(taken_in_row_unit), "unit": row.unit})
+            outcome['status'] = 'consumed' if remaining <= EPSILON else 'partial'
+            if outcome['status'] == 'partial':
+                outcome['missing'] = _round(remaining)
+
+        emptied = {row.id for row in changed.values() if row.quantity <= EPSILON}
+        if changed and not dry_run:
+            kept = [row for row in changed.values() if row.id not in emptied]
+            if kept:
+                InventoryItem.objects.bulk_update(kept, ['quantity'])
+            if emptied:
+                InventoryItem.objects.filter(id__in=emptied).delete()
+    if changed and not dry_run:
+        notify_inventory_changed(user.id)
+
+    # Report what is left of each row once every ingredient has been taken
+    for outcome in outcomes:
+        for used in outcome['used']:
+            used['remaining'] = 0 if used['id'] in emptied else changed[used['id']].quantity
+            used['deleted'] = used['id'] in emptied
+    return outcomes
@@ -0,0 +1,181 @@
+"""
+Expiring-soon queries and the per-user expiry summary.
+
+`expiring_items` is a range query on the (added_by, expiration_date) index, so listing what
+expires in the next few days costs the same however large the pantry is.
+
+`summarize` counts every user's items by expiry bucket (see BUCKETS) in one GROUP BY query.
+`materialize_expiry_buckets` stores the result daily in ExpirySummary for dashboards and
+notifications. A stored summary is only served while it is for today and the user's
+inventory version (inventory/versioning.py) has not moved since; otherwise `get_summary`
+recomputes that user's row. `cached_summary` keeps what the API serves in the cache
+(utils/caching.py) until the user's inventory changes, so repeated reads cost no query.
+"""
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from utils import caching
+
+from .models import ExpirySummary, InventoryItem, InventoryVersion
+from .versioning import get_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'DEFAULT_WITHIN_DAYS': 3,
+    'MAX_WITHIN_DAYS': 365,
+    'MAX_RESULTS': 200,
+    # Upper bound of each bucket in days from today, in increasing order. Items past the
+    # last bound count as "later", items without a date as "no_date".
+    'BUCKETS': {'expired': -1, 'today': 0, 'within_3_days': 3, 'within_7_days': 7},
+}
+
+WITHIN_UNITS = {'': 1, 'd': 1, 'w': 7}
+
+# Served summaries, per user and day
+SUMMARIES = caching.Namespace('expiry-summary', ttl=24 * 60 * 60)
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'INVENTORY_EXPIRY', {}))
+    return options
+
+
+def parse_within(value, options=None):
+    """
+    Days in a `within` parameter ("3d", "2w", "5"); the default when empty. Raises ValueError.
+    """
+    options = options or get_options()
+    if value in (None, ''):
+        return options['DEFAULT_WITHIN_DAYS']
+    match = re.fullmatch(r'\s*(\d+)\s*([dw]?)\s*', str(value).lower())
+    if not match:
+        raise ValueError("Use a number of days or weeks, e.g. 3d or 2w.")
+    days = int(match.group(1)) * WITHIN_UNITS[match.group(2)]
+    if days > options['MAX_WITHIN_DAYS']:
+        raise ValueError(f"At most {options['MAX_WITHIN_DAYS']} days.")
+    return days
+
+
+def expiring_items(queryset, today, within_days, include_expired=True):
+    """
+    Items of `queryset` (one user's) expiring by `today + within_days`, soonest first.
+    """
+    queryset = queryset.filter(expiration_date__lte=today + timedelta(days=within_days))
+    if not include_expired:
+        queryset = queryset.filter(expiration_date__gte=today)
+    return queryset.order_by('expiration_date', 'id')
+
+
+def bucket_aggregates(today, buckets):
+    aggregates = {}
+    lower = None
+    for label, max_days in buckets.items():
+        condition = Q(expiration_date__lte=today + timedelta(days=max_days))
+        if lower is not None:
+            condition &= Q(expiration_date__gt=today + timedelta(days=lower))
+        aggregates[label] = Count('id', filter=condition)
+        lower = max_days
+    if lower is not None:
+        aggregates['later'] = Count('id', filter=Q(expiration_date__gt=today + timedelta(days=lower)))
+    aggregates['no_date'] = Count('id', filter=Q(expiration_date__isnull=True))
+    aggregates['next_expiration'] = Min('expiration_date', filter=Q(expiration_date__gte=today))
+    return aggregates
+
+
+def empty_buckets(buckets):
+    return {label: 0 for label in [*buckets, 'later', 'no_date']}
+
+
+def summarize(today=None, user_ids=None):
+    """
+    {user_id: {"buckets": {...}, "next_expiration": date}} for users with at least one item.
+    """
+    options = get_options()
+    today = today or timezone.localdate()
+    queryset = InventoryItem.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(added_by__in=user_ids)
+    rows = queryset.values('added_by').order_by().annotate(**bucket_aggregates(today, options['BUCKETS']))
+    summaries = {}
+    for row in rows:
+        user_id = row.pop('added_by')
+        next_expiration = row.pop('next_expiration')
+        summaries[user_id] = {"buckets": row, "next_expiration": next_expiration}
+    return summaries
+
+
+def materialize(today=None, batch_size=500):
+    """
+    Recompute and store every user's ExpirySummary; returns the number of rows written.
+    """
+    options = get_options()
+    today = today or timezone.localdate()
+    # Read versions before counting: a change in between leaves the row stale, not wrong
+    versions = dict(InventoryVersion.objects.values_list('user_id', 'version'))
+    summaries = summarize(today)
+    rows = [
+        ExpirySummary(
+            user_id=user_id,
+            computed_on=today,
+            inventory_version=versions.get(user_id, 0),
+            buckets=summaries.get(user_id, {}).get('buckets') or empty_buckets(options['BUCKETS']),
+            next_expiration=summaries.get(user_id, {}).get('next_expiration'),
+        )
+        for user_id in versions.keys() | summaries.keys()
+    ]
+    ExpirySummary.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['computed_on', 'inventory_version', 'buckets', 'next_expiration', 'updated_at'],
+    )
+    logger.info(f"Materialized expiry summaries of {len(rows)} users for {today}")
+    return len(rows)
+
+
+def get_summary(user_id, today=None):
+    """
+    The user's ExpirySummary, recomputed first when it is missing or stale.
+    """
+    today = today or timezone.localdate()
+    version = get_version(user_id)
+    summary = ExpirySummary.objects.filter(user_id=user_id).first()
+    if summary and summary.computed_on == today and summary.inventory_version == version:
+        return summary
+    computed = summarize(today, [user_id]).get(user_id, {})
+    summary, _ = ExpirySummary.objects.update_or_create(user_id=user_id, defaults={
+        'computed_on': today,
+        'inventory_version': version,
+        'buckets': computed.get('buckets') or empty_buckets(get_options()['BUCKETS']),
+        'next_expiration': computed.get('next_expiration'),
+    })
+    return summary
+
+
+def cached_summary(user_id, today=None):
+    """
+    The user's summary as the API serves it, from the cache unless the inventory changed.
+    """
+    today = today or timezone.localdate()
+
+    def compute():
+        summary = get_summary(user_id, today)
+        return {
+            "computed_on": summary.computed_on,
+            "buckets": summary.buckets,
+            "next_expiration": summary.next_expiration,
+        }
+    return SUMMARIES.get_or_set(today.isoformat(), compute, scope=user_id)
+
+
+def on_inventory_changed(sender, user_id, **kwargs):
+    if user_id is not None:
+        SUMMARIES.invalidate(scope=user_id)
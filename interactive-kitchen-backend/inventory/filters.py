@@ -0,0 +1,55 @@
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .normalization import UNIT_ALIASES, normalize_unit
+
+
+def unit_spellings(unit):
+    """
+    Every known spelling of `unit`'s canonical form ("litres" -> l, lt, liter, ...).
+    """
+    canonical = normalize_unit(unit)
+    return {canonical, *(alias for alias, target in UNIT_ALIASES.items() if target == canonical)}
+
+
+class InventoryFilter(BaseFilterBackend):
+    """
+    Server-side filters for the inventory list:
+
+    - `?name=tom`: names starting with the prefix (case-insensitive);
+    - `?unit=kg`: items in that unit, whatever its spelling ("kg", "kilos", "Kilograms");
+    - `?expiring_before=2025-04-10`: items that expire on or before the date.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        name = params.get('name', '').strip().lower()
+        if name:
+            # A range on LOWER(name) can use the (added_by, LOWER(name)) index; LIKE cannot
+            upper_bound = name[:-1] + chr(ord(name[-1]) + 1)
+            queryset = queryset.alias(lower_name=Lower('name')).filter(
+                lower_name__gte=name, lower_name__lt=upper_bound, lower_name__startswith=name,
+            )
+
+        unit = params.get('unit', '').strip()
+        if unit:
+            spellings = Q()
+            for spelling in unit_spellings(unit):
+                spellings |= Q(unit__iexact=spelling)
+            queryset = queryset.filter(spellings)
+
+        expiring_before = params.get('expiring_before')
+        if expiring_before:
+            try:
+                date = parse_date(expiring_before)
+            except ValueError:
+                date = None
+            if date is None:
+                raise ValidationError({'expiring_before': ["Enter a valid date (YYYY-MM-DD)."]})
+            queryset = queryset.filter(expiration_date__lte=date)
+
+        return queryset
@@ -0,0 +1,139 @@
+"""
+Bulk ingestion of inventory items.
+
+Every path that adds several items at once (POST of a list to /api/inventory/, confirming a
+receipt scan, resetting the inventory) goes through `ingest_items`: the whole list is
+validated first and then written in one transaction, so the number of queries does not grow
+with the number of items.
+
+By default every item becomes a new row. In merge mode items are matched on their
+normalized name and unit and their expiration bucket (see `merge_key`): quantities are
+added to the user's existing row and only items without a match are inserted. A merge
+costs one SELECT, one bulk UPDATE and one bulk INSERT regardless of the list size.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import InventoryItem
+from .normalization import normalize_name, normalize_unit
+from .serializers import InventoryItemSerializer
+from .signals import notify_inventory_changed
+
+DEFAULTS = {
+    'MERGE': False,
+    'EXPIRY_BUCKET_DAYS': 3,
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'INVENTORY_INGESTION', {}))
+    return options
+
+
+def merge_key(name, unit, expiration_date, bucket_days=None):
+    """
+    Items with the same key are merged: same normalized name and unit, and expiration dates
+    in the same `bucket_days` window. Items without an expiration date only merge with each other.
+    """
+    bucket_days = bucket_days or get_options()['EXPIRY_BUCKET_DAYS']
+    bucket = expiration_date.toordinal() // bucket_days if expiration_date else None
+    return normalize_name(name), normalize_unit(unit), bucket
+
+
+def ingest_items(user, items, context=None, merge=None):
+    """
+    Validate `items` (a list of dicts) and add them to the user's inventory.
+
+    Raises rest_framework.exceptions.ValidationError without writing anything if any item is
+    invalid. Returns the serializer, whose `.data` lists the created (and, when merging,
+    updated) items with their ids. `merge` defaults to INVENTORY_INGESTION['MERGE'].
+    """
+    merge = get_options()['MERGE'] if merge is None else merge
+    serializer = InventoryItemSerializer(data=items, many=True, context=context or {})
+    serializer.is_valid(raise_exception=True)
+    if merge:
+        serializer.instance = upsert_items(user, serializer.validated_data)
+    else:
+        serializer.save(added_by=user)
+    notify_inventory_changed(user.id)
+    return serializer
+
+
+async def aingest_items(user, items, context=None, merge=None):
+    """
+    Async version of `ingest_items` for the async views, using the async ORM.
+    """
+    merge = get_options()['MERGE'] if merge is None else merge
+    serializer = InventoryItemSerializer(data=items, many=True, context=context or {})
+    # Validation does not touch the database (the owner is read-only)
+    serializer.is_valid(raise_exception=True)
+    if merge:
+        serializer.instance = await sync_to_async(upsert_items)(user, serializer.validated_data)
+    else:
+        serializer.instance = await InventoryItem.objects.abulk_create([
+            InventoryItem(added_by=user, normalized_name=normalize_name(attrs['name']), **attrs)
+            for attrs in serializer.validated_data
+        ])
+    await sync_to_async(notify_inventory_changed)(user.id)
+    return serializer
+
+
+@transaction.atomic
+def upsert_items(user, items):
+    """
+    Merge validated item dicts into the user's inventory and return the affected rows.
+
+    Duplicates within `items` are combined first. The normalized unit is only used for
+    matching; new rows keep the unit as submitted. The merged row keeps its name and unit and
+    the earliest expiration date of the merged items.
+    """
+    bucket_days = get_options()['EXPIRY_BUCKET_DAYS']
+
+    incoming = {}
+    for attrs in items:
+        key = merge_key(attrs['name'], attrs['unit'], attrs.get('expiration_date'), bucket_days)
+        if key in incoming:
+            _combine(incoming[key], attrs['quantity'], attrs.get('expiration_date'))
+        else:
+            incoming[key] = InventoryItem(
+                name=attrs['name'],
+                normalized_name=key[0],
+                quantity=attrs['quantity'],
+                unit=attrs['unit'],
+                expiration_date=attrs.get('expiration_date'),
+                added_by=user,
+            )
+
+    existing = {}
+    candidates = (
+        InventoryItem.objects
+        .select_for_update()
+        .filter(added_by=user, normalized_name__in={key[0] for key in incoming})
+        .order_by('id')
+    )
+    for item in candidates:
+        # Rows that are already duplicates keep their history; new quantities go to the oldest one
+        existing.setdefault(merge_key(item.name, item.unit, item.expiration_date, bucket_days), item)
+
+    to_update, to_create = [], []
+    for key, item in incoming.items():
+        if key in existing:
+            target = existing[key]
+            _combine(target, item.quantity, item.expiration_date)
+            to_update.append(target)
+        else:
+            to_create.append(item)
+
+    if to_update:
+        InventoryItem.objects.bulk_update(to_update, ['quantity', 'expiration_date'])
+    if to_create:
+        InventoryItem.objects.bulk_create(to_create)
+    return to_update + to_create
+
+
+def _combine(item, quantity, expiration_date):
+    item.quantity = item.quantity + quantity
+    if expiration_date and (item.expiration_date is None or expiration_date < item.expiration_date):
+        item.expiration_date = expiration_date
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from inventory.expiry import materialize
+
+class Command(BaseCommand):
+    help = "Recompute every user's expiry summary (item counts by expiry bucket); run daily, e.g. from cron just after midnight"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day the buckets are relative to (YYYY-MM-DD); defaults to today.")
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = parse_date(options['date'])
+            except ValueError:
+                today = None
+            if today is None:
+                raise CommandError(f"Invalid date: {options['date']}")
+        count = materialize(today)
+        self.stdout.write(self.style.SUCCESS(f"Materialized expiry summaries for {count} users"))
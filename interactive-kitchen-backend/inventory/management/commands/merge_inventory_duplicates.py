@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.ingestion import get_options, merge_key
+from inventory.models import InventoryItem
+from inventory.signals import notify_inventory_changed
+
+class Command(BaseCommand):
+    help = "Merge duplicate inventory rows (same user, normalized name, unit and expiration bucket) into one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be merged without writing.")
+
+    def handle(self, *args, **options):
+        bucket_days = get_options()['EXPIRY_BUCKET_DAYS']
+        keep = {}
+        to_update = {}
+        to_delete = []
+        for item in InventoryItem.objects.order_by('added_by_id', 'id').iterator(chunk_size=2000):
+            key = (item.added_by_id,) + merge_key(item.name, item.unit, item.expiration_date, bucket_days)
+            target = keep.setdefault(key, item)
+            if target is item:
+                continue
+            target.quantity += item.quantity
+            if item.expiration_date and (target.expiration_date is None or item.expiration_date < target.expiration_date):
+                target.expiration_date = item.expiration_date
+            to_update[target.id] = target
+            to_delete.append(item.id)
+
+        if not options['dry_run'] and to_delete:
+            with transaction.atomic():
+                InventoryItem.objects.bulk_update(list(to_update.values()), ['quantity', 'expiration_date'], batch_size=500)
+                for start in range(0, len(to_delete), 500):
+                    InventoryItem.objects.filter(id__in=to_delete[start:start + 500]).delete()
+            for user_id in {item.added_by_id for item in to_update.values()}:
+                notify_inventory_changed(user_id)
+
+        verb = "Would merge" if options['dry_run'] else "Merged"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(to_delete)} duplicate rows into {len(to_update)} items"))
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:02
+
+import re
+
+from django.db import migrations, models
+
+# A frozen copy of inventory.normalization.normalize_name as of this migration, so later
+# changes to the live normalizer do not change what the backfill does.
+NON_PLURALS = {'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'brussels', 'series', 'species', 'grits'}
+
+
+def singularize(word):
+    if len(word) <= 3 or word in NON_PLURALS or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith(('sses', 'shes', 'ches', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    words = re.sub(r'[^a-z0-9\s]', ' ', (name or '').lower()).split()
+    return ' '.join(singularize(word) for word in words)
+
+
+def backfill_normalized_names(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    items = list(InventoryItem.objects.only('id', 'name'))
+    for item in items:
+        item.normalized_name = normalize_name(item.name)
+    InventoryItem.objects.bulk_update(items, ['normalized_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_alter_inventoryitem_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_normalized_names, migrations.RunPython.noop),
+    ]
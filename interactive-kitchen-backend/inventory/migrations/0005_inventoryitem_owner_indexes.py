@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:31
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventoryitem_normalized_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['added_by', 'expiration_date'], name='inventory_owner_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(models.F('added_by'), django.db.models.functions.text.Lower('name'), name='inventory_owner_lower_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['added_by', 'normalized_name'], name='inventory_owner_norm_name_idx'),
+        ),
+    ]
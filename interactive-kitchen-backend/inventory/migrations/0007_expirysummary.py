@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_inventoryversion'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='expiry_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('computed_on', models.DateField()),
+                ('inventory_version', models.PositiveBigIntegerField(default=0)),
+                ('buckets', models.JSONField(default=dict)),
+                ('next_expiration', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
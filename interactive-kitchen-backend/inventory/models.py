@@ -1,11 +1,62 @@
 from django.db import models
+from django.db.models.functions import Lower
+from .normalization import normalize_name
 
 class InventoryItem(models.Model):
     name = models.CharField(max_length=255)
+    # Canonical form of `name` used to merge duplicates (see inventory/normalization.py)
+    normalized_name = models.CharField(max_length=255, blank=True, editable=False)
     quantity = models.FloatField()
     unit = models.CharField(max_length=50)
     expiration_date = models.DateField(null=True, blank=True)
     added_by = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, related_name='inventory_items')
 
+    class Meta:
+        # Every access path is scoped to one owner; see inventory/test_query_plans.py
+        indexes = [
+            # Expiry ordering and filters (list ?ordering=expiration_date, ?expiring_before=)
+            models.Index(fields=['added_by', 'expiration_date'], name='inventory_owner_expiry_idx'),
+            # Name ordering and prefix search (list ?ordering=name, ?name=)
+            models.Index('added_by', Lower('name'), name='inventory_owner_lower_name_idx'),
+            # Duplicate lookup when merging ingested items (inventory/ingestion.py)
+            models.Index(fields=['added_by', 'normalized_name'], name='inventory_owner_norm_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} ({self.quantity} {self.unit})"
+
+
+class InventoryVersion(models.Model):
+    """
+    Per-user counter bumped on every change to the user's inventory (inventory/versioning.py).
+    List responses are tagged with it, so clients can revalidate with one primary-key lookup.
+    """
+    user = models.OneToOneField('users.CustomUser', on_delete=models.CASCADE, primary_key=True,
+                                related_name='inventory_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: v{self.version}"
+
+
+class ExpirySummary(models.Model):
+    """
+    Per-user counts of items by expiry bucket, materialized daily by `materialize_expiry_buckets`
+    (inventory/expiry.py). Stale rows are recomputed when read.
+    """
+    user = models.OneToOneField('users.CustomUser', on_delete=models.CASCADE, primary_key=True,
+                                related_name='expiry_summary')
+    # The day the buckets are relative to and the inventory version they were counted at
+    computed_on = models.DateField()
+    inventory_version = models.PositiveBigIntegerField(default=0)
+    buckets = models.JSONField(default=dict)
+    next_expiration = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.name} ({self.quantity} {self.unit})"
\ No newline at end of file
+        return f"{self.user_id} on {self.computed_on}: {self.buckets}"
@@ -0,0 +1,54 @@
+"""
+Canonical forms of item names and units, used to recognise the same grocery
+across receipts, inventory rows and recipe ingredients ("Tomatoes" / "tomato",
+"pieces" / "pcs").
+"""
+import re
+
+UNIT_ALIASES = {
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'mg': 'mg', 'milligram': 'mg', 'milligrams': 'mg',
+    'l': 'l', 'lt': 'l', 'ltr': 'l', 'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'ml': 'ml', 'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'pc': 'pcs', 'pcs': 'pcs', 'piece': 'pcs', 'pieces': 'pcs', 'ea': 'pcs', 'each': 'pcs',
+    'unit': 'pcs', 'units': 'pcs', 'item': 'pcs', 'items': 'pcs',
+    'pack': 'pack', 'packs': 'pack', 'pk': 'pack', 'pkt': 'pack', 'packet': 'pack', 'packets': 'pack',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'dozen': 'dozen', 'doz': 'dozen',
+}
+
+# Words that end in "s" but are not plurals.
+NON_PLURALS = {'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'brussels', 'series', 'species', 'grits'}
+
+
+def normalize_unit(unit):
+    """
+    Map unit spellings onto one canonical abbreviation ("Pieces" -> "pcs", "litres" -> "l").
+    Unknown units are lower-cased and returned as is.
+    """
+    cleaned = (unit or '').strip().lower().rstrip('.')
+    return UNIT_ALIASES.get(cleaned, cleaned)
+
+
+def singularize(word):
+    if len(word) <= 3 or word in NON_PLURALS or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith(('sses', 'shes', 'ches', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    """
+    Lower-case, strip punctuation and singularize every word ("Cherry Tomatoes!" -> "cherry tomato").
+    """
+    words = re.sub(r'[^a-z0-9\s]', ' ', (name or '').lower()).split()
+    return ' '.join(singularize(word) for word in words)
@@ -0,0 +1,152 @@
+"""
+Keyset (cursor) pagination for the inventory list.
+
+A page is `ORDER BY <field>, id LIMIT page_size + 1` filtered to the rows after the last row
+of the previous page, so every page costs the same no matter how deep the client has
+scrolled, and no COUNT query is run. The cursor is an opaque token holding the ordering and
+the last row's (value, id) pair.
+
+DRF's CursorPagination keys on a single field: rows that share a value across a page
+boundary, or have no expiration date, would be skipped. Here the id breaks ties and NULLs
+always sort last. Each ordering matches one of InventoryItem's (added_by, ...) indexes.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import InventoryItem
+
+DEFAULTS = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 500,
+    'ORDERING': 'id',
+}
+
+# Public sort keys and the columns behind them; "name" sorts case-insensitively
+ORDERINGS = {
+    'id': 'id',
+    'name': 'lower_name',
+    'expiration_date': 'expiration_date',
+}
+
+# Sort columns computed in SQL, as indexed (see InventoryItem.Meta.indexes)
+ANNOTATIONS = {
+    'lower_name': Lower('name'),
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'INVENTORY_LIST', {}))
+    return options
+
+
+class InventoryCursorPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Columns the paginator reads from every row, whatever fields the client asked for
+    key_fields = ('id', 'name', 'expiration_date')
+
+    def get_page_size(self, request, options):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return options['PAGE_SIZE']
+        return min(size, options['MAX_PAGE_SIZE']) if size > 0 else options['PAGE_SIZE']
+
+    def get_ordering(self, request, options):
+        """
+        (public key, column, descending) from `?ordering=name` or `?ordering=-expiration_date`.
+        """
+        ordering = request.query_params.get(self.ordering_query_param) or options['ORDERING']
+        key = ordering.lstrip('-')
+        if key not in ORDERINGS:
+            raise ValidationError({self.ordering_query_param: [
+                f"Unknown ordering '{ordering}'. Choose from: {', '.join(ORDERINGS)} (prefix '-' to reverse)."
+            ]})
+        return ordering, ORDERINGS[key], ordering.startswith('-')
+
+    def encode_cursor(self, ordering, value, pk):
+        payload = json.dumps({'o': ordering, 'v': value, 'id': pk}, separators=(',', ':'), default=str)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token, ordering, column):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            if payload['o'] != ordering:
+                raise ValueError
+            value = payload['v']
+            if value is not None and column not in ANNOTATIONS:
+                value = InventoryItem._meta.get_field(column).to_python(value)
+            return value, int(payload['id'])
+        except (binascii.Error, ValueError, TypeError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def after(column, descending, value, pk):
+        """
+        Rows that come after (value, pk) in `column, id` order with NULLs last.
+        """
+        beyond = 'lt' if descending else 'gt'
+        if column == 'id':
+            return Q(**{f'id__{beyond}': pk})
+        if value is None:
+            return Q(**{f'{column}__isnull': True, f'id__{beyond}': pk})
+        condition = Q(**{f'{column}__{beyond}': value}) | Q(**{column: value, f'id__{beyond}': pk})
+        if column not in ANNOTATIONS and InventoryItem._meta.get_field(column).null:
+            condition |= Q(**{f'{column}__isnull': True})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        options = get_options()
+        self.request = request
+        page_size = self.get_page_size(request, options)
+        ordering, column, descending = self.get_ordering(request, options)
+
+        if column in ANNOTATIONS:
+            queryset = queryset.annotate(**{column: ANNOTATIONS[column]})
+            expression = F(column).desc() if descending else F(column).asc()
+        else:
+            expression = F(column).desc(nulls_last=True) if descending else F(column).asc(nulls_last=True)
+        queryset = queryset.order_by(expression, '-id' if descending else 'id')
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            queryset = queryset.filter(self.after(column, descending, *self.decode_cursor(token, ordering, column)))
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        self.next_cursor = None
+        if len(rows) > page_size:
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(ordering, getattr(last, column), last.pk)
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -1,7 +1,93 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import InventoryItem
+from .normalization import normalize_name
+from utils import llm_output
+
+
+class InventoryItemListSerializer(serializers.ListSerializer):
+    """
+    Saves a list of items with one bulk INSERT inside a transaction instead of one INSERT per item.
+    """
+
+    def create(self, validated_data):
+        items = [InventoryItem(normalized_name=normalize_name(attrs['name']), **attrs) for attrs in validated_data]
+        with transaction.atomic():
+            return InventoryItem.objects.bulk_create(items)
+
 
 class InventoryItemSerializer(serializers.ModelSerializer):
+    """
+    `fields` limits the output to a subset of the fields (sparse fieldsets on the list endpoint).
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = InventoryItem
         fields = ['id', 'name', 'quantity', 'unit', 'expiration_date', 'added_by']
+        # The owner always comes from the authenticated user
+        read_only_fields = ['added_by']
+        list_serializer_class = InventoryItemListSerializer
+
+
+class QuantityChangeSerializer(serializers.Serializer):
+    """
+    One entry of a bulk quantity change: `delta` is added to the current quantity (negative
+    to use some up), `quantity` replaces it.
+    """
+    id = serializers.IntegerField()
+    delta = serializers.FloatField(required=False)
+    quantity = serializers.FloatField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if ('delta' in attrs) == ('quantity' in attrs):
+            raise serializers.ValidationError("Give either a delta or a quantity.")
+        return attrs
+
+
+class QuantityChangeListSerializer(serializers.ListSerializer):
+    child = QuantityChangeSerializer()
+
+    def validate(self, attrs):
+        ids = [change['id'] for change in attrs]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each id may appear only once.")
+        return attrs
+
+
+class ConsumedIngredientSerializer(serializers.Serializer):
+    """
+    A recipe ingredient to take out of the inventory. Quantities are read leniently, as
+    recipes come from the model ("2", "1.5 cups"); one that cannot be read is left as None.
+    """
+    name = serializers.CharField(max_length=255)
+    quantity = serializers.JSONField(required=False, allow_null=True, default=None)
+    unit = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True, default='')
+
+    def validate_quantity(self, value):
+        if value in (None, ''):
+            return None
+        try:
+            quantity = llm_output.number(value)
+        except ValueError:
+            return None
+        if quantity < 0:
+            raise serializers.ValidationError("Quantities cannot be negative.")
+        return quantity
+
+    def validate_unit(self, value):
+        return value or ''
+
+
+class ConsumeSerializer(serializers.Serializer):
+    """
+    A recipe as returned by the suggestion endpoints, or just its ingredients.
+    """
+    recipe = serializers.CharField(required=False, allow_blank=True)
+    ingredients = ConsumedIngredientSerializer(many=True, allow_empty=False)
+    dry_run = serializers.BooleanField(required=False, default=False)
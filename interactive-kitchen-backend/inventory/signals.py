@@ -0,0 +1,33 @@
+"""
+`inventory_changed` is sent whenever a user's inventory is modified, so caches derived from
+the inventory (recipe suggestions) can be invalidated.
+
+Single-row saves are covered by the post_save receiver below. Bulk writes (bulk_create,
+bulk_update, queryset deletes) do not send model signals, so those code paths call
+`notify_inventory_changed` themselves. There is deliberately no post_delete receiver: it
+would make Django load and signal every row of a bulk delete.
+"""
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+from .models import InventoryItem, InventoryVersion
+
+# Sent with `user_id`, the owner of the changed inventory
+inventory_changed = Signal()
+
+
+def notify_inventory_changed(user_id):
+    inventory_changed.send(sender=InventoryItem, user_id=user_id)
+
+
+@receiver(post_save, sender=InventoryItem)
+def _item_saved(sender, instance, **kwargs):
+    notify_inventory_changed(instance.added_by_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _user_created(sender, instance, created, raw=False, **kwargs):
+    # Every user has a version row, so bumping it is always a single UPDATE
+    if created and not raw:
+        InventoryVersion.objects.get_or_create(user_id=instance.pk)
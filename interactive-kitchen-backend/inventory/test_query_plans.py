@@ -0,0 +1,126 @@
+"""
+Query counts and plans of the inventory access paths.
+
+Every statement an endpoint runs against the inventory table is captured and EXPLAINed; a plan
+that reads the whole table instead of searching one of InventoryItem's indexes fails the test
+and prints the plan. PostgreSQL prefers sequential scans on small tables, so they are disabled
+there for the EXPLAIN.
+"""
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.models import InventoryItem
+from users.models import CustomUser
+
+TABLE = InventoryItem._meta.db_table
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+def full_scans(plan):
+    if connection.vendor == 'postgresql':
+        return re.findall(rf'Seq Scan on {TABLE}\b', plan)
+    # SQLite: "SCAN <table>" without an index is a full table scan
+    return re.findall(rf'^SCAN {TABLE}$', plan, re.MULTILINE)
+
+
+class QueryPlanTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", password="password123")
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        for owner in (self.user, other):
+            for n in range(30):
+                InventoryItem.objects.create(
+                    name=f"Item {n}", quantity=1, unit="pcs",
+                    expiration_date=f"2025-04-{n % 28 + 1:02d}" if n % 5 else None, added_by=owner,
+                )
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/inventory/"
+
+    def inventory_queries(self, queries):
+        return [query['sql'] for query in queries if TABLE in query['sql']]
+
+    def assertIndexed(self, queries, expected_count):
+        statements = self.inventory_queries(queries)
+        self.assertEqual(len(statements), expected_count, "\n".join(statements))
+        for sql in statements:
+            if sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                plan = explain(sql)
+                self.assertFalse(full_scans(plan), f"Full scan of {TABLE}:\n{sql}\n{plan}")
+
+    def request(self, method, url, data=None, expected=status.HTTP_200_OK):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format="json" if method != "get" else None)
+        self.assertEqual(response.status_code, expected, getattr(response, "data", None))
+        return response, queries
+
+    def test_list(self):
+        for params in ({}, {"ordering": "name"}, {"ordering": "-name"}, {"ordering": "expiration_date"},
+                       {"ordering": "-expiration_date"}, {"name": "item 1"}, {"name": "item 1", "ordering": "name"},
+                       {"expiring_before": "2025-04-10"}, {"unit": "pieces"}, {"fields": "id,name"}):
+            with self.subTest(**params):
+                response, queries = self.request("get", self.url, dict(params, page_size=10))
+                self.assertIndexed(queries, 1)
+                # A deeper page costs the same
+                if response.data["next"]:
+                    _, queries = self.request("get", response.data["next"])
+                    self.assertIndexed(queries, 1)
+
+    def test_expiring(self):
+        for params in ({"within": "7d"}, {"within": "2w", "expired": "false"}):
+            with self.subTest(**params):
+                _, queries = self.request("get", f"{self.url}expiring/", params)
+                self.assertIndexed(queries, 1)
+
+    def test_retrieve_update_destroy(self):
+        item = InventoryItem.objects.filter(added_by=self.user).first()
+        _, queries = self.request("get", f"{self.url}{item.id}/")
+        self.assertIndexed(queries, 1)
+        _, queries = self.request("patch", f"{self.url}{item.id}/", {"quantity": 3})
+        self.assertIndexed(queries, 2)
+        _, queries = self.request("delete", f"{self.url}{item.id}/", expected=status.HTTP_204_NO_CONTENT)
+        self.assertIndexed(queries, 2)
+
+    def test_delete_all(self):
+        _, queries = self.request("delete", f"{self.url}delete-all/", expected=status.HTTP_204_NO_CONTENT)
+        self.assertIndexed(queries, 1)
+        self.assertEqual(InventoryItem.objects.count(), 30)
+
+    def test_bulk_changes(self):
+        ids = list(InventoryItem.objects.filter(added_by=self.user).values_list("id", flat=True)[:10])
+        changes = [{"id": item_id, "delta": -1} for item_id in ids[:5]]
+        # SELECT ... FOR UPDATE, bulk UPDATE, SELECT the new quantities, DELETE the emptied items
+        _, queries = self.request("patch", f"{self.url}bulk/", changes)
+        self.assertIndexed(queries, 4)
+        _, queries = self.request("delete", f"{self.url}bulk/", {"ids": ids[5:]})
+        self.assertIndexed(queries, 2)
+
+    def test_consume(self):
+        ingredients = [{"name": "item 3", "quantity": 1}, {"name": "item 4", "quantity": 0.5}, {"name": "flour", "quantity": 1}]
+        # SELECT ... FOR UPDATE of the candidates, bulk UPDATE, DELETE the used-up rows
+        _, queries = self.request("post", f"{self.url}consume/", {"ingredients": ingredients})
+        self.assertIndexed(queries, 3)
+
+    def test_merge_ingestion(self):
+        items = [{"name": "item 3", "quantity": 2, "unit": "pcs", "expiration_date": "2025-04-04"},
+                 {"name": "Pears", "quantity": 4, "unit": "pcs"}]
+        _, queries = self.request("post", f"{self.url}?merge=true", items, expected=status.HTTP_201_CREATED)
+        # SELECT the candidates, bulk UPDATE, bulk INSERT
+        self.assertIndexed(queries, 3)
+
+    def test_recipe_suggestions_read_the_pantry_with_an_index(self):
+        _, queries = self.request("post", "/api/recipe/suggest/", {"engine": "local"})
+        self.assertIndexed(queries, 1)
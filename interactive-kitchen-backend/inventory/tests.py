@@ -1,9 +1,25 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 from rest_framework import status
 from users.models import CustomUser
-from inventory.models import InventoryItem
+from datetime import timedelta
+from django.utils import timezone
+from inventory.models import ExpirySummary, InventoryItem
+from inventory.signals import notify_inventory_changed
+from inventory.units import convert
+from inventory.versioning import get_version
+from utils import caching
 
 class InventoryTests(APITestCase):
 
@@ -30,8 +46,9 @@ class InventoryTests(APITestCase):
         InventoryItem.objects.create(name="Eggs", quantity=12, unit="pieces", expiration_date="2025-01-10", added_by=self.user)
         response = self.client.get(self.inventory_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], "Eggs")
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], "Eggs")
+        self.assertIsNone(response.data['next'])
 
     def test_update_inventory_item(self):
         item = InventoryItem.objects.create(name="Butter", quantity=1, unit="kg", expiration_date="2025-02-01", added_by=self.user)
@@ -57,3 +74,497 @@ class InventoryTests(APITestCase):
         response = self.client.get(self.inventory_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def bulk_post(self, count):
+        items = [{"name": f"Item {n}", "quantity": n, "unit": "pcs", "expiration_date": "2025-04-10"} for n in range(count)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.inventory_url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response, len(queries)
+
+    def test_bulk_create_uses_a_constant_number_of_queries(self):
+        # Authenticate once so both posts find the token in the cache
+        self.client.get(self.inventory_url)
+        response, few_queries = self.bulk_post(5)
+        self.assertTrue(all(item["id"] and item["added_by"] == self.user.id for item in response.data))
+        _, many_queries = self.bulk_post(100)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(InventoryItem.objects.filter(added_by=self.user).count(), 105)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        items = [{"name": "Milk", "quantity": 1, "unit": "l"}, {"name": "Eggs", "quantity": "a dozen", "unit": "pcs"}]
+        response = self.client.post(self.inventory_url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(InventoryItem.objects.count(), 0)
+
+    def test_owner_cannot_be_overridden(self):
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        self.client.post(self.inventory_url, [{"name": "Milk", "quantity": 1, "unit": "l", "added_by": other.id}], format="json")
+        self.assertEqual(InventoryItem.objects.get().added_by, self.user)
+
+    def test_reset_inventory(self):
+        InventoryItem.objects.create(name="Old", quantity=1, unit="kg", added_by=self.user)
+        response = self.client.post(f"{self.inventory_url}reset/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(InventoryItem.objects.filter(added_by=self.user).count(), 9)
+        self.assertFalse(InventoryItem.objects.filter(name="Old").exists())
+
+    def test_merge_adds_to_existing_rows(self):
+        InventoryItem.objects.create(name="Milk", quantity=1, unit="liters", expiration_date="2025-04-10", added_by=self.user)
+        items = [
+            {"name": "milk", "quantity": 2, "unit": "l", "expiration_date": "2025-04-09"},
+            {"name": "Tomatoes", "quantity": 2, "unit": "pieces", "expiration_date": "2025-04-12"},
+            {"name": "tomato", "quantity": 3, "unit": "pcs", "expiration_date": "2025-04-12"},
+            {"name": "Milk", "quantity": 1, "unit": "l", "expiration_date": "2025-05-20"},
+        ]
+        response = self.client.post(f"{self.inventory_url}?merge=true", items, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(InventoryItem.objects.count(), 3)
+        milk = InventoryItem.objects.get(unit="liters")
+        self.assertEqual((milk.quantity, str(milk.expiration_date)), (3, "2025-04-09"))
+        tomatoes = InventoryItem.objects.get(normalized_name="tomato")
+        # The normalized unit only matches rows; the new row keeps the unit as submitted
+        self.assertEqual((tomatoes.name, tomatoes.quantity, tomatoes.unit), ("Tomatoes", 5, "pieces"))
+
+    def test_merge_uses_a_bounded_number_of_queries(self):
+        def merge(numbers):
+            items = [{"name": f"Item {n}", "quantity": 1, "unit": "pcs", "expiration_date": "2025-04-10"} for n in numbers]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(f"{self.inventory_url}?merge=true", items, format="json")
+            return len(queries)
+
+        merge(range(10))
+        # Both batches update some existing rows and insert new ones
+        self.assertEqual(merge(range(5, 20)), merge(range(15, 115)))
+        self.assertEqual(InventoryItem.objects.count(), 115)
+        self.assertEqual(InventoryItem.objects.get(name="Item 15").quantity, 2)
+
+    def test_duplicates_command_merges_existing_rows(self):
+        for quantity in (1, 2, 3):
+            InventoryItem.objects.create(name="Milk", quantity=quantity, unit="liters", expiration_date="2025-04-10", added_by=self.user)
+        InventoryItem.objects.create(name="Eggs", quantity=12, unit="pcs", added_by=self.user)
+        call_command("merge_inventory_duplicates", stdout=StringIO())
+        self.assertEqual(InventoryItem.objects.count(), 2)
+        self.assertEqual(InventoryItem.objects.get(name="Milk").quantity, 6)
+
+
+class InventoryListTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/inventory/"
+
+    def add(self, count, **fields):
+        InventoryItem.objects.bulk_create(
+            InventoryItem(**{"name": f"Item {n}", "normalized_name": f"item {n}", "quantity": 1, "unit": "pcs",
+                             "added_by": self.user, **fields})
+            for n in range(count)
+        )
+
+    def walk(self, params):
+        # Follow the next links and return every item and the number of pages
+        items, pages, url = [], 0, self.url
+        while url:
+            response = self.client.get(url, params if pages == 0 else None)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            items += response.data["results"]
+            url, pages = response.data["next"], pages + 1
+        return items, pages
+
+    def test_pages_cover_every_item_once(self):
+        self.add(3, expiration_date="2025-04-10")
+        self.add(2)
+        self.add(2, expiration_date="2025-04-02")
+        items, pages = self.walk({"ordering": "expiration_date", "page_size": 2})
+
+        self.assertEqual(pages, 4)
+        self.assertEqual(sorted(item["id"] for item in items), sorted(InventoryItem.objects.values_list("id", flat=True)))
+        self.assertEqual([item["expiration_date"] for item in items],
+                         ["2025-04-02"] * 2 + ["2025-04-10"] * 3 + [None] * 2)
+
+        items, _ = self.walk({"ordering": "-name", "page_size": 3})
+        self.assertEqual([item["name"] for item in items], ["Item 2"] + ["Item 1"] * 3 + ["Item 0"] * 3)
+
+    def test_query_count_does_not_grow_with_depth(self):
+        self.add(60)
+        cursor = self.client.get(self.url, {"page_size": 10}).data["next"]
+        for _ in range(4):
+            cursor = self.client.get(cursor).data["next"]
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(self.url, {"page_size": 10})
+        with CaptureQueriesContext(connection) as deep:
+            response = self.client.get(cursor)
+        self.assertEqual(len(first), len(deep))
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertNotIn("COUNT", " ".join(query["sql"] for query in deep))
+
+    def test_filters(self):
+        InventoryItem.objects.create(name="Tomatoes", quantity=4, unit="Kilos", expiration_date="2025-04-03", added_by=self.user)
+        InventoryItem.objects.create(name="tomato paste", quantity=1, unit="pcs", expiration_date="2025-05-01", added_by=self.user)
+        InventoryItem.objects.create(name="Milk", quantity=1, unit="kg", expiration_date="2025-04-01", added_by=self.user)
+
+        def names(**params):
+            return sorted(item["name"] for item in self.client.get(self.url, params).data["results"])
+
+        self.assertEqual(names(name="tom"), ["Tomatoes", "tomato paste"])
+        self.assertEqual(names(unit="kg"), ["Milk", "Tomatoes"])
+        self.assertEqual(names(expiring_before="2025-04-03"), ["Milk", "Tomatoes"])
+        self.assertEqual(names(name="tom", expiring_before="2025-04-03"), ["Tomatoes"])
+
+    def test_sparse_fieldsets(self):
+        self.add(2, expiration_date="2025-04-10")
+        response = self.client.get(self.url, {"fields": "id,name"})
+        self.assertEqual([set(item) for item in response.data["results"]], [{"id", "name"}] * 2)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({"fields": "id,price"}, {"ordering": "quantity"}, {"expiring_before": "soon"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.assertEqual(self.client.get(self.url, {"cursor": "bogus"}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_items_are_not_listed(self):
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        InventoryItem.objects.create(name="Milk", quantity=1, unit="l", added_by=other)
+        self.assertEqual(self.client.get(self.url).data["results"], [])
+
+
+class InventoryVersionTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/inventory/"
+
+    def test_every_kind_of_change_bumps_the_version(self):
+        changes = [
+            lambda: self.client.post(self.url, {"name": "Milk", "quantity": 1, "unit": "l"}, format="json"),
+            lambda: self.client.post(self.url, [{"name": "Eggs", "quantity": 6, "unit": "pcs"}], format="json"),
+            lambda: self.client.patch(f"{self.url}{InventoryItem.objects.first().id}/", {"quantity": 2}, format="json"),
+            lambda: self.client.delete(f"{self.url}{InventoryItem.objects.first().id}/"),
+            lambda: self.client.post(f"{self.url}reset/"),
+            lambda: self.client.delete(f"{self.url}delete-all/"),
+        ]
+        for expected, change in enumerate(changes, start=1):
+            change()
+            self.assertEqual(get_version(self.user.id), expected)
+
+    def test_unchanged_inventory_is_not_modified(self):
+        InventoryItem.objects.create(name="Milk", quantity=1, unit="l", added_by=self.user)
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(InventoryItem._meta.db_table, queries[0]["sql"])
+
+        # Other pages and fieldsets are other representations
+        self.assertNotEqual(self.client.get(self.url, {"fields": "id"})["ETag"], etag)
+
+        InventoryItem.objects.create(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_versions_are_per_user(self):
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        InventoryItem.objects.create(name="Milk", quantity=1, unit="l", added_by=other)
+        self.assertEqual((get_version(self.user.id), get_version(other.id)), (0, 1))
+
+
+class ExpiryTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="testuser", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.localdate()
+        for name, days in (("Milk", -2), ("Spinach", 0), ("Eggs", 2), ("Yoghurt", 5), ("Rice", 40), ("Salt", None)):
+            InventoryItem.objects.create(
+                name=name, quantity=1, unit="pcs", added_by=self.user,
+                expiration_date=None if days is None else self.today + timedelta(days=days),
+            )
+
+    def test_expiring_items_soonest_first(self):
+        response = self.client.get("/api/inventory/expiring/", {"within": "3d"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(item["name"], item["days_left"]) for item in response.data["results"]],
+                         [("Milk", -2), ("Spinach", 0), ("Eggs", 2)])
+
+        response = self.client.get("/api/inventory/expiring/", {"within": "1w", "expired": "false", "fields": "name"})
+        self.assertEqual([item["name"] for item in response.data["results"]], ["Spinach", "Eggs", "Yoghurt"])
+        self.assertEqual(set(response.data["results"][0]), {"name", "days_left"})
+
+        self.assertEqual(self.client.get("/api/inventory/expiring/", {"within": "soon"}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_summary_is_materialized_and_refreshed_when_stale(self):
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        out = StringIO()
+        call_command("materialize_expiry_buckets", stdout=out)
+        self.assertIn("2 users", out.getvalue())
+        self.assertEqual(ExpirySummary.objects.get(user=other).buckets["later"], 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/inventory/expiring/summary/")
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.data["buckets"], {
+            "expired": 1, "today": 1, "within_3_days": 1, "within_7_days": 1, "later": 1, "no_date": 1,
+        })
+        self.assertEqual(response.data["next_expiration"], self.today)
+        # Served from the cache until the inventory changes
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/api/inventory/expiring/summary/").data, response.data)
+        self.assertEqual(len(queries), 0)
+
+        InventoryItem.objects.filter(name="Spinach").delete()
+        notify_inventory_changed(self.user.id)
+        response = self.client.get("/api/inventory/expiring/summary/")
+        self.assertEqual(response.data["buckets"]["today"], 0)
+        self.assertEqual(response.data["next_expiration"], self.today + timedelta(days=2))
+
+
+BACKENDS = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'caching-tests'},
+    'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'},
+    'fake-redis': {'BACKEND': 'utils.fake_redis.FakeRedisCache', 'LOCATION': 'redis://caching-tests/0'},
+}
+
+
+class CachingTests(SimpleTestCase):
+
+    def backends(self):
+        for name, config in BACKENDS.items():
+            with self.subTest(backend=name), tempfile.TemporaryDirectory() as directory:
+                config = dict(config, LOCATION=config.get('LOCATION', directory))
+                with self.settings(CACHES={'default': config}):
+                    caches['default'].clear()
+                    yield caching.Namespace(f'test-{name}', ttl=60)
+
+    def test_namespaced_keys_and_versioned_invalidation(self):
+        for namespace in self.backends():
+            namespace.set('a', {"n": 1})
+            namespace.set('a', [1, 2], scope=1)
+            namespace.set('a', 3, scope=2)
+            self.assertEqual(namespace.get('a'), {"n": 1})
+            self.assertEqual((namespace.get('a', scope=1), namespace.get('a', scope=2)), ([1, 2], 3))
+
+            namespace.invalidate(scope=1)
+            self.assertEqual((namespace.get('a'), namespace.get('a', scope=1), namespace.get('a', scope=2)),
+                             ({"n": 1}, None, 3))
+            namespace.invalidate()
+            self.assertEqual((namespace.get('a'), namespace.get('a', scope=2)), (None, None))
+            self.assertEqual(namespace.stats()['invalidations'], 2)
+
+    def test_lost_versions_do_not_bring_back_old_entries(self):
+        for namespace in self.backends():
+            namespace.set('a', 1, scope=1)
+            namespace.cache.delete(namespace._version_key(1))
+            self.assertIsNone(namespace.get('a', scope=1))
+
+    def test_get_or_set_computes_once_under_concurrency(self):
+        for namespace in self.backends():
+            calls = []
+
+            def compute():
+                calls.append(1)
+                time.sleep(0.05)
+                return "value"
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: namespace.get_or_set('k', compute), range(8)))
+            self.assertEqual(results, ["value"] * 8)
+            self.assertEqual(len(calls), 1)
+            stats = namespace.stats()
+            self.assertEqual((stats['computes'], stats['misses'] - stats['waits']), (1, 1))
+
+    def test_get_or_set_waits_for_another_process(self):
+        for namespace in self.backends():
+            full_key = namespace.key('k')
+            # Another process holds the compute lock and stores the value shortly
+            namespace.cache.add(f"{full_key}:lock", 1, 30)
+            timer = threading.Timer(0.1, namespace.cache.set, (full_key, "theirs", 60))
+            timer.start()
+            self.assertEqual(namespace.get_or_set('k', lambda: "ours"), "theirs")
+            timer.join()
+            self.assertEqual(namespace.stats()['waits'], 1)
+
+    def test_disabled_namespace(self):
+        namespace = caching.Namespace('test-disabled')
+        with self.settings(CACHING={'NAMESPACES': {'test-disabled': {'ENABLED': False}}}):
+            namespace.set('a', 1)
+            self.assertIsNone(namespace.get('a'))
+            self.assertEqual(namespace.get_or_set('a', lambda: 2), 2)
+
+    def test_fake_redis_behaves_like_redis(self):
+        with self.settings(CACHES={'default': BACKENDS['fake-redis']}):
+            cache = caches['default']
+            cache.clear()
+            cache.set('n', 1)
+            self.assertEqual(cache.incr('n', 5), 6)
+            self.assertTrue(cache.add('lock', 1, 1))
+            self.assertFalse(cache.add('lock', 1, 1))
+            cache.set_many({'x': 'a', 'y': ['b']}, 1)
+            self.assertEqual(cache.get_many(['x', 'y', 'z']), {'x': 'a', 'y': ['b']})
+            self.assertTrue(cache.touch('x', None))
+            time.sleep(1.1)
+            self.assertEqual(cache.get_many(['x', 'y', 'lock']), {'x': 'a'})
+            with self.assertRaises(ValueError):
+                cache.incr('missing')
+        # Another cache on the same URL sees the same server
+        with self.settings(CACHES={'default': BACKENDS['fake-redis'], 'other': BACKENDS['fake-redis']}):
+            caches['default'].set('shared', 1)
+            self.assertEqual(caches['other'].get('shared'), 1)
+
+
+class BulkChangeTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/inventory/bulk/"
+        self.eggs, self.milk, self.rice = (
+            InventoryItem.objects.create(name=name, quantity=quantity, unit=unit, added_by=self.user)
+            for name, quantity, unit in (("Eggs", 6, "pcs"), ("Milk", 1, "l"), ("Rice", 2, "kg"))
+        )
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        self.foreign = InventoryItem.objects.create(name="Milk", quantity=1, unit="l", added_by=other)
+
+    def test_quantities_change_in_one_transaction(self):
+        changes = [{"id": self.eggs.id, "delta": -2}, {"id": self.milk.id, "delta": -1},
+                   {"id": self.rice.id, "quantity": 5}, {"id": self.foreign.id, "delta": -1}]
+        version = get_version(self.user.id)
+        response = self.client.patch(self.url, changes, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [
+            {"id": self.eggs.id, "status": "updated", "quantity": 4},
+            {"id": self.milk.id, "status": "deleted"},
+            {"id": self.rice.id, "status": "updated", "quantity": 5},
+            {"id": self.foreign.id, "status": "not_found"},
+        ])
+        self.assertFalse(InventoryItem.objects.filter(id=self.milk.id).exists())
+        self.assertEqual(InventoryItem.objects.get(id=self.foreign.id).quantity, 1)
+        self.assertEqual(get_version(self.user.id), version + 1)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def patch(count):
+            items = InventoryItem.objects.bulk_create(
+                InventoryItem(name=f"Item {n}", quantity=5, unit="pcs", added_by=self.user) for n in range(count)
+            )
+            changes = [{"id": item.id, "delta": -5 if n % 2 else -1} for n, item in enumerate(items)]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.patch(self.url, changes, format="json")
+            return len(queries)
+
+        self.assertEqual(patch(4), patch(60))
+
+    def test_empty_items_can_be_kept(self):
+        response = self.client.patch(f"{self.url}?remove_empty=false", [{"id": self.milk.id, "delta": -1}], format="json")
+        self.assertEqual(response.data["results"], [{"id": self.milk.id, "status": "updated", "quantity": 0}])
+
+    def test_quantities_do_not_go_below_zero(self):
+        response = self.client.patch(f"{self.url}?remove_empty=false", [{"id": self.eggs.id, "delta": -50}], format="json")
+        self.assertEqual(response.data["results"], [{"id": self.eggs.id, "status": "updated", "quantity": 0}])
+        self.assertEqual(InventoryItem.objects.get(id=self.eggs.id).quantity, 0)
+
+    def test_invalid_changes_are_rejected_without_writing(self):
+        for changes in ([{"id": self.eggs.id}], [{"id": self.eggs.id, "delta": -1, "quantity": 2}],
+                        [{"id": self.eggs.id, "delta": -1}, {"id": self.eggs.id, "delta": -1}],
+                        [{"id": self.eggs.id, "delta": -1}, {"id": self.milk.id, "quantity": -3}],
+                        {"id": self.eggs.id, "delta": -1}):
+            response = self.client.patch(self.url, changes, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, changes)
+        self.assertEqual(InventoryItem.objects.get(id=self.eggs.id).quantity, 6)
+
+    def test_bulk_delete(self):
+        response = self.client.delete(self.url, {"ids": [self.eggs.id, self.foreign.id]}, format="json")
+        self.assertEqual(response.data["results"], [
+            {"id": self.eggs.id, "status": "deleted"}, {"id": self.foreign.id, "status": "not_found"},
+        ])
+        response = self.client.delete(f"{self.url}?ids={self.milk.id},{self.rice.id}")
+        self.assertEqual([result["status"] for result in response.data["results"]], ["deleted", "deleted"])
+        self.assertEqual(list(InventoryItem.objects.values_list("id", flat=True)), [self.foreign.id])
+        self.assertEqual(self.client.delete(self.url, {"ids": ["eggs"]}, format="json").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class UnitConversionTests(SimpleTestCase):
+
+    def test_units_of_a_dimension_convert(self):
+        self.assertEqual(convert(250, "g", "kg"), 0.25)
+        self.assertEqual(convert(1.5, "Liters", "ml"), 1500)
+        self.assertEqual(convert(2, "tablespoons", "ml"), 30)
+        self.assertEqual(convert(1, "dozen", "pieces"), 12)
+        self.assertEqual(convert(3, "", "pcs"), 3)
+        self.assertEqual(convert(2, "bag", "bags"), 2)
+
+    def test_other_units_do_not_convert(self):
+        self.assertIsNone(convert(1, "kg", "l"))
+        self.assertIsNone(convert(1, "bag", "g"))
+
+
+class ConsumeTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/inventory/consume/"
+        today = timezone.localdate()
+        self.rice = InventoryItem.objects.create(name="White Rice", quantity=1, unit="kg", added_by=self.user)
+        self.old_milk = InventoryItem.objects.create(name="Milk", quantity=0.5, unit="liters", expiration_date=today, added_by=self.user)
+        self.new_milk = InventoryItem.objects.create(name="milk", quantity=1, unit="l", expiration_date=today + timedelta(days=5), added_by=self.user)
+        self.eggs = InventoryItem.objects.create(name="Eggs", quantity=2, unit="pieces", added_by=self.user)
+        self.spinach = InventoryItem.objects.create(name="Spinach", quantity=1, unit="bag", added_by=self.user)
+
+    def consume(self, ingredients, **extra):
+        response = self.client.post(self.url, {"recipe": "Test", "ingredients": ingredients, **extra}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return {result["name"]: result for result in response.data["results"]}
+
+    def test_ingredients_are_converted_and_taken_soonest_expiring_first(self):
+        results = self.consume([
+            {"name": "Rice", "quantity": 250, "unit": "g"},
+            {"name": "Whole Milk", "quantity": "700", "unit": "ml"},
+            {"name": "Egg", "quantity": 3, "unit": ""},
+            {"name": "Fresh spinach", "quantity": 100, "unit": "g"},
+            {"name": "Saffron", "quantity": 1, "unit": "pinch"},
+            {"name": "Salt", "quantity": "to taste", "unit": ""},
+        ])
+
+        self.assertEqual(results["Rice"]["status"], "consumed")
+        self.assertEqual(InventoryItem.objects.get(id=self.rice.id).quantity, 0.75)
+        self.assertEqual(results["Whole Milk"]["status"], "consumed")
+        self.assertEqual([(used["id"], used["quantity"]) for used in results["Whole Milk"]["used"]],
+                         [(self.old_milk.id, 0.5), (self.new_milk.id, 0.2)])
+        self.assertFalse(InventoryItem.objects.filter(id=self.old_milk.id).exists())
+        self.assertEqual(InventoryItem.objects.get(id=self.new_milk.id).quantity, 0.8)
+        self.assertEqual((results["Egg"]["status"], results["Egg"]["missing"]), ("partial", 1))
+        self.assertFalse(InventoryItem.objects.filter(id=self.eggs.id).exists())
+        self.assertEqual((results["Fresh spinach"]["status"], results["Fresh spinach"]["available_units"]), ("unit_mismatch", ["bag"]))
+        self.assertEqual(results["Saffron"]["status"], "not_found")
+        self.assertEqual(InventoryItem.objects.get(id=self.spinach.id).quantity, 1)
+
+    def test_query_count_does_not_grow_with_the_recipe(self):
+        def consume(ingredients):
+            with CaptureQueriesContext(connection) as queries:
+                self.consume(ingredients)
+            return len(queries)
+
+        # Both update some rows and use others up
+        few = consume([{"name": "rice", "quantity": 100, "unit": "g"}, {"name": "egg", "quantity": 2}])
+        many = consume([{"name": "rice", "quantity": 100, "unit": "g"}, {"name": "milk", "quantity": 100, "unit": "ml"},
+                        {"name": "spinach", "quantity": 1, "unit": "bag"}, {"name": "pepper", "quantity": 1, "unit": "pcs"},
+                        {"name": "basmati rice", "quantity": 1, "unit": "cup"}])
+        self.assertEqual(few, many)
+
+    def test_dry_run_writes_nothing(self):
+        results = self.consume([{"name": "Rice", "quantity": 2, "unit": "kg"}], dry_run=True)
+        self.assertEqual((results["Rice"]["status"], results["Rice"]["missing"]), ("partial", 1))
+        self.assertEqual(InventoryItem.objects.get(id=self.rice.id).quantity, 1)
+
+    def test_an_ingredient_list_is_required(self):
+        response = self.client.post(self.url, {"ingredients": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
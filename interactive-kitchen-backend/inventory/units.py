@@ -0,0 +1,57 @@
+"""
+Conversion between the units of a dimension (mass, volume, count).
+
+Units are first mapped to their canonical spelling (normalization.normalize_unit), so
+"kilos", "Kg" and "kilograms" all convert like "kg". Units without a known dimension
+("bag", "cans", "bunch") only convert to themselves, singular or plural.
+"""
+from .normalization import normalize_unit, singularize
+
+# Canonical unit -> (dimension, size in the dimension's base unit)
+UNITS = {
+    'mg': ('mass', 0.001),
+    'g': ('mass', 1.0),
+    'kg': ('mass', 1000.0),
+    'oz': ('mass', 28.349523125),
+    'lb': ('mass', 453.59237),
+    'ml': ('volume', 1.0),
+    'l': ('volume', 1000.0),
+    'tsp': ('volume', 5.0),
+    'tbsp': ('volume', 15.0),
+    'cup': ('volume', 240.0),
+    'pcs': ('count', 1.0),
+    'dozen': ('count', 12.0),
+}
+
+# Spellings of the kitchen measures above that normalize_unit does not know
+EXTRA_ALIASES = {
+    'teaspoon': 'tsp', 'teaspoons': 'tsp', 'tsps': 'tsp',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbsps': 'tbsp', 'tbs': 'tbsp',
+    'cups': 'cup',
+}
+
+
+def canonical_unit(unit):
+    """
+    The canonical spelling of `unit`; a missing unit counts as pieces ("2 eggs").
+    """
+    unit = normalize_unit(unit)
+    unit = EXTRA_ALIASES.get(unit, unit)
+    if unit not in UNITS:
+        unit = singularize(unit)
+    return unit or 'pcs'
+
+
+def convert(quantity, from_unit, to_unit):
+    """
+    `quantity` in `from_unit` expressed in `to_unit`, or None when the units are not comparable.
+    """
+    source, target = canonical_unit(from_unit), canonical_unit(to_unit)
+    if source == target:
+        return quantity
+    if source not in UNITS or target not in UNITS:
+        return None
+    (source_dimension, source_size), (target_dimension, target_size) = UNITS[source], UNITS[target]
+    if source_dimension != target_dimension:
+        return None
+    return quantity * source_size / target_size
@@ -0,0 +1,51 @@
+"""
+Per-user inventory versions and the ETags derived from them.
+
+Every change to a user's inventory sends `inventory_changed` (inventory/signals.py), which
+bumps the user's InventoryVersion row with one UPDATE. The list endpoint tags its responses
+with an ETag built from that version and the request's query string; a client that sends
+the ETag back in `If-None-Match` gets `304 Not Modified` after a single primary-key lookup,
+without the item rows being read.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InventoryVersion
+
+
+def get_version(user_id):
+    """
+    The current inventory version of a user; 0 until their inventory first changes.
+    """
+    version = InventoryVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_version(user_id):
+    if InventoryVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            InventoryVersion.objects.create(user_id=user_id, version=1)
+    except IntegrityError:
+        # Created by a concurrent request in the meantime
+        InventoryVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def on_inventory_changed(sender, user_id, **kwargs):
+    if user_id is not None:
+        bump_version(user_id)
+
+
+def inventory_etag(request, *args, **kwargs):
+    """
+    ETag of a list response (for django.views.decorators.http.condition): the user's version
+    and the query string, since pages, filters and fieldsets are different representations.
+    """
+    if not request.user.is_authenticated:
+        return None
+    key = f"{request.user.id}:{get_version(request.user.id)}:{request.get_full_path()}"
+    return hashlib.sha1(key.encode()).hexdigest()
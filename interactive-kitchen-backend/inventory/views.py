@@ -2,10 +2,22 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from .models import InventoryItem
-from .serializers import InventoryItemSerializer
+from .serializers import ConsumeSerializer, InventoryItemSerializer, QuantityChangeListSerializer
+from .filters import InventoryFilter
+from .pagination import InventoryCursorPagination
 from rest_framework.response import Response
 from rest_framework import status
-from utils.request_utils import set_request_data_mutable
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .ingestion import ingest_items
+from .signals import notify_inventory_changed
+from .versioning import inventory_etag
+from . import bulk, consumption, expiry
+from utils.request_utils import is_truthy
 from datetime import datetime, timedelta
 
 class InventoryViewSet(viewsets.ModelViewSet):
@@ -15,43 +27,65 @@ class InventoryViewSet(viewsets.ModelViewSet):
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [InventoryFilter]
+    pagination_class = InventoryCursorPagination
 
     def get_queryset(self):
         # Return inventory items belonging to the authenticated user
-        print(self.request.user.id)  # (Debugging: print the user ID to the console..
         return self.queryset.filter(added_by=self.request.user.id)
 
+    def get_requested_fields(self):
+        # Sparse fieldsets: ?fields=id,name,quantity
+        requested = self.request.query_params.get('fields')
+        if not requested:
+            return None
+        fields = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = set(fields) - set(InventoryItemSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': [
+                f"Unknown fields: {', '.join(sorted(unknown))}. Choose from: {', '.join(InventoryItemSerializer.Meta.fields)}."
+            ]})
+        return fields
+
+    @method_decorator(condition(etag_func=inventory_etag))
+    def list(self, request, *args, **kwargs):
+        # One page of the user's items; only the requested columns are loaded.
+        # If-None-Match with the current ETag returns 304 before any item is read.
+        fields = self.get_requested_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        if fields is not None:
+            queryset = queryset.only(*fields, *self.paginator.key_fields)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True, fields=fields)
+        response = self.get_paginated_response(serializer.data)
+        # Let browsers keep the page but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
     def create(self, request, *args, **kwargs):
         # Check if the request data is a list
         if isinstance(request.data, list):
-            # Validate all items first
-            serializers = []
-            for item in request.data:
-                item['added_by'] = request.user.id  
-                serializer = self.get_serializer(data=item)
-                serializer.is_valid(raise_exception=True)
-                serializers.append(serializer)
-
-            # Save all items if all are valid
-            response_data = []
-            for serializer in serializers:
-                serializer.save(added_by=self.request.user)
-                response_data.append(serializer.data)
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            # Validate all items first, then insert (or with ?merge=true, merge) them in bulk
+            merge = request.query_params.get('merge')
+            serializer = ingest_items(
+                request.user,
+                request.data,
+                context=self.get_serializer_context(),
+                merge=None if merge is None else is_truthy(merge),
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             # Handle single object creation
-            set_request_data_mutable(request, 'added_by', request.user.id)
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             serializer.save(added_by=self.request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
-        # Update an inventory item
+        # Update an inventory item; the owner is read-only on the serializer
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        # Add the authenticated user as the owner of the inventory item
-        request.data['added_by'] = request.user.id
 
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
@@ -62,15 +96,87 @@ class InventoryViewSet(viewsets.ModelViewSet):
         # Delete an inventory item
         instance = self.get_object()
         instance.delete()
+        notify_inventory_changed(request.user.id)
         return Response({"message": "Item deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
     
+    @action(detail=False, methods=['get'], url_path='expiring')
+    def expiring(self, request):
+        # Items expiring within ?within=3d (default INVENTORY_EXPIRY['DEFAULT_WITHIN_DAYS']), soonest first
+        options = expiry.get_options()
+        try:
+            within_days = expiry.parse_within(request.query_params.get('within'), options)
+        except ValueError as e:
+            raise ValidationError({'within': [str(e)]})
+        include_expired = is_truthy(request.query_params.get('expired', 'true'))
+        fields = self.get_requested_fields()
+        today = timezone.localdate()
+
+        queryset = expiry.expiring_items(self.get_queryset(), today, within_days, include_expired)
+        if fields is not None:
+            queryset = queryset.only(*fields, 'expiration_date')
+        items = list(queryset[:options['MAX_RESULTS']])
+        results = self.get_serializer(items, many=True, fields=fields).data
+        for result, item in zip(results, items):
+            result['days_left'] = (item.expiration_date - today).days
+        return Response({"today": today, "within_days": within_days, "results": results})
+
+    @action(detail=False, methods=['get'], url_path='expiring/summary')
+    def expiring_summary(self, request):
+        # Item counts by expiry bucket, precomputed daily by `materialize_expiry_buckets`
+        return Response(expiry.cached_summary(request.user.id))
+
+    @action(detail=False, methods=['patch'], url_path='bulk')
+    def bulk_update(self, request):
+        # [{"id": 3, "delta": -2}, {"id": 5, "quantity": 1}] in one transaction; items that run
+        # out are deleted unless ?remove_empty=false
+        options = bulk.get_options()
+        if not isinstance(request.data, list) or len(request.data) > options['MAX_ITEMS']:
+            raise ValidationError({'detail': [f"Send a list of at most {options['MAX_ITEMS']} changes."]})
+        serializer = QuantityChangeListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        remove_empty = request.query_params.get('remove_empty')
+        results = bulk.change_quantities(
+            request.user,
+            serializer.validated_data,
+            remove_empty=None if remove_empty is None else is_truthy(remove_empty),
+        )
+        return Response({"results": results})
+
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request):
+        # Ids as a JSON body ({"ids": [...]} or a list) or as ?ids=1,2,3
+        options = bulk.get_options()
+        ids = request.data.get('ids') if isinstance(request.data, dict) else request.data
+        if not ids:
+            ids = request.query_params.get('ids', '')
+        if isinstance(ids, str):
+            ids = [item_id for item_id in ids.split(',') if item_id.strip()]
+        try:
+            ids = list(dict.fromkeys(int(item_id) for item_id in ids))
+        except (TypeError, ValueError):
+            raise ValidationError({'ids': ["Send a list of item ids."]})
+        if not ids or len(ids) > options['MAX_ITEMS']:
+            raise ValidationError({'ids': [f"Send between 1 and {options['MAX_ITEMS']} item ids."]})
+        return Response({"results": bulk.delete_items(request.user, ids)})
+
+    @action(detail=False, methods=['post'], url_path='consume')
+    def consume(self, request):
+        # Cook a recipe: take its ingredients out of the inventory, converting units
+        serializer = ConsumeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        results = consumption.consume(request.user, data['ingredients'], dry_run=data['dry_run'])
+        return Response({"recipe": data.get('recipe'), "dry_run": data['dry_run'], "results": results})
+
     @action(detail=False, methods=['delete'], url_path='delete-all')
     def destroy_all(self, request):
         # Delete all inventory items for the authenticated user
         InventoryItem.objects.filter(added_by=request.user.id).delete()
+        notify_inventory_changed(request.user.id)
         return Response({"message": "All items deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=False, methods=['post'], url_path='reset')
+    @transaction.atomic
     def reset_inventory(self, request):
         # Clear all inventory items for the authenticated user
         InventoryItem.objects.filter(added_by=request.user.id).delete()
@@ -93,12 +199,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
 
         # Add the predefined ingredients to the user's inventory
         for ingredient in ingredients:
-            InventoryItem.objects.create(
-            name=ingredient["name"],
-            unit=ingredient["unit"],
-            quantity=ingredient["quantity"],
-            expiration_date=expiry_date,
-            added_by=request.user
-            )
+            ingredient["expiration_date"] = expiry_date
+        ingest_items(request.user, ingredients)
 
         return Response({"message": "Inventory reset successfully with predefined ingredients."}, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -1,3 +1,15 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import ScanCacheEntry, ScanJob
+
+@admin.register(ScanCacheEntry)
+class ScanCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'prompt_version', 'hit_count', 'created_at', 'last_accessed_at')
+    list_filter = ('prompt_version',)
+
+@admin.register(ScanJob)
+class ScanJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'attempts', 'created_at', 'queue_ms', 'run_ms')
+    list_filter = ('status',)
+    exclude = ('image',)
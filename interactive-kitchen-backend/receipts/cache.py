@@ -0,0 +1,136 @@
+"""
+Content-addressed cache for receipt scans.
+
+Entries are keyed by a SHA-256 of the prompt version and the raw image bytes, so
+re-uploading the same photo returns the stored item list without another vision call.
+Expired entries and the least recently used entries beyond the size limit are evicted
+whenever a new result is stored.
+"""
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ScanCacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _config():
+    return getattr(settings, 'RECEIPT_SCAN_CACHE', {})
+
+
+def is_enabled():
+    return _config().get('ENABLED', True)
+
+
+def _ttl():
+    return timedelta(seconds=_config().get('TTL', DEFAULT_TTL_SECONDS))
+
+
+def _max_entries():
+    return _config().get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def make_key(image_bytes, prompt_version):
+    """
+    Build the cache key for an uploaded image and the prompt version used to parse it.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(prompt_version).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+def lookup(key):
+    """
+    Return the cached item list for `key`, or None on a miss or an expired entry.
+    """
+    now = timezone.now()
+    items = (
+        ScanCacheEntry.objects
+        .filter(key=key, created_at__gte=now - _ttl())
+        .values_list('items', flat=True)
+        .first()
+    )
+    if items is None:
+        _count('misses')
+        return None
+
+    ScanCacheEntry.objects.filter(key=key).update(hit_count=F('hit_count') + 1, last_accessed_at=now)
+    _count('hits')
+    return items
+
+
+def store(key, prompt_version, items):
+    """
+    Store the parsed items for `key` and evict expired or excess entries.
+    """
+    now = timezone.now()
+    ScanCacheEntry.objects.update_or_create(
+        key=key,
+        defaults={
+            'prompt_version': str(prompt_version),
+            'items': items,
+            'created_at': now,
+            'last_accessed_at': now,
+        },
+    )
+    _count('stores')
+    evict()
+
+
+def evict():
+    """
+    Delete expired entries, then the least recently used ones beyond MAX_ENTRIES.
+    Returns the number of deleted entries.
+    """
+    deleted, _ = ScanCacheEntry.objects.filter(created_at__lt=timezone.now() - _ttl()).delete()
+
+    excess_ids = list(
+        ScanCacheEntry.objects
+        .order_by('-last_accessed_at', '-id')
+        .values_list('id', flat=True)[_max_entries():]
+    )
+    if excess_ids:
+        excess_deleted, _ = ScanCacheEntry.objects.filter(id__in=excess_ids).delete()
+        deleted += excess_deleted
+
+    if deleted:
+        _count('evictions', deleted)
+        logger.info(f"Evicted {deleted} receipt scan cache entries")
+    return deleted
+
+
+def stats():
+    """
+    Return the hit/miss counters of this process together with the current entry count.
+    """
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_rate'] = snapshot['hits'] / lookups if lookups else 0.0
+    snapshot['entries'] = ScanCacheEntry.objects.count()
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
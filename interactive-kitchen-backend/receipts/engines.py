@@ -0,0 +1,319 @@
+"""
+Receipt extraction engines.
+
+`extract_items` runs the engines listed in `settings.RECEIPT_EXTRACTION['ENGINES']` in order.
+A cheap local engine (Tesseract OCR plus the line parser in `receipts.parsing`) goes first;
+its result is used when the parse confidence reaches `CONFIDENCE_THRESHOLD`, otherwise the
+next engine runs, ending with the OpenAI vision model. The result reports which engine
+produced the items and the latency of every stage.
+"""
+import asyncio
+import base64
+import io
+import logging
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from utils import async_runtime, llm_output, llm_providers
+from utils.json_stream import JSONArrayStream
+
+from .parsing import parse_receipt_text
+
+try:
+    import pytesseract
+except ImportError:  # pragma: no cover - optional dependency
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+# Bump RECEIPT_PROMPT_VERSION whenever RECEIPT_PROMPT changes so cached scans are not reused.
+RECEIPT_PROMPT_VERSION = "1"
+RECEIPT_PROMPT = '''
+                         Extract grocery items in this image. select sensibly, 3 items that would expire within next 3 days. 2 items that would expire within next 7 days and remaining items that would expire after more than 7 days.
+                         Respond ONLY with a valid JSON array. Do NOT include any explanations, descriptions, markdown, or text outside the JSON. Return the response exactly in this format:
+                            [
+                            {"name": "<item_name - cleaned name>", "quantity": <quantity>, "unit": "<unit>", "expiration_date": "<YYYY-MM-DD - assume an expiration date starting 2025-04-03>"}
+                            ]
+                        '''
+
+DEFAULT_ENGINES = [
+    'receipts.engines.TesseractEngine',
+    'receipts.engines.OpenAIVisionEngine',
+]
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+
+
+@dataclass
+class ExtractionResult:
+    items: list
+    engine: str
+    confidence: float
+    timings: dict = field(default_factory=dict)
+    attempts: list = field(default_factory=list)
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class TesseractEngine:
+    """
+    Local OCR with pytesseract followed by the receipt line parser.
+    Unavailable when pytesseract or the tesseract binary is missing.
+    """
+    name = 'tesseract'
+
+    def __init__(self, cmd=None, lang='eng', config='--psm 6 --oem 1'):
+        self.cmd = cmd
+        self.lang = lang
+        self.config = config
+        # pytesseract reads the binary path from a module global; set it once, not per scan
+        if cmd and pytesseract is not None:
+            pytesseract.pytesseract.tesseract_cmd = cmd
+
+    def is_available(self):
+        if pytesseract is None:
+            return False
+        return bool(shutil.which(self.cmd or pytesseract.pytesseract.tesseract_cmd))
+
+    def extract(self, image_bytes, mime_type, timings):
+        start = time.perf_counter()
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            text = pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+        timings[f'{self.name}.ocr'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        parsed = parse_receipt_text(text)
+        timings[f'{self.name}.parse'] = _elapsed_ms(start)
+        return parsed['items'], parsed['confidence']
+
+    async def aextract(self, image_bytes, mime_type, timings):
+        # OCR is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self.extract, image_bytes, mime_type, timings)
+
+
+class OpenAIVisionEngine:
+    """
+    Sends the image to the OpenAI vision model (through the configured LLM provider, see
+    utils/llm_providers.py) and parses the JSON array it returns.
+    """
+    name = 'openai'
+
+    def __init__(self, model='gpt-4o', max_tokens=1000):
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def is_available(self):
+        return True
+
+    def _messages(self, image_bytes, mime_type):
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        return [
+            {"role": "system", "content": "You are a helpful assistant that extracts grocery items from receipts."},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": RECEIPT_PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}}
+                ]
+            }
+        ]
+
+    def extract(self, image_bytes, mime_type, timings):
+        messages = self._messages(image_bytes, mime_type)
+
+        def complete(messages):
+            return llm_providers.get_provider().client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=self.max_tokens
+            ).choices[0].message.content
+
+        def reask(raw, error):
+            start = time.perf_counter()
+            content = complete(llm_output.reask_messages(messages, raw, error))
+            timings[f'{self.name}.reask'] = _elapsed_ms(start)
+            return content
+
+        start = time.perf_counter()
+        raw = complete(messages)
+        timings[f'{self.name}.completion'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        items = llm_output.parse_with_reask(raw, llm_output.RECEIPT_ITEM, reask)
+        timings[f'{self.name}.parse'] = _elapsed_ms(start)
+        return items, 1.0
+
+    async def aextract(self, image_bytes, mime_type, timings):
+        """
+        Same as `extract`, with the shared async client of utils/async_runtime.py, so an async
+        view does not hold a thread while the model runs.
+        """
+        messages = self._messages(image_bytes, mime_type)
+
+        async def complete(messages):
+            response = await async_runtime.get_runtime().llm.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=self.max_tokens
+            )
+            return response.choices[0].message.content
+
+        async def reask(raw, error):
+            start = time.perf_counter()
+            content = await async_runtime.run_async(complete(llm_output.reask_messages(messages, raw, error)))
+            timings[f'{self.name}.reask'] = _elapsed_ms(start)
+            return content
+
+        start = time.perf_counter()
+        raw = await async_runtime.run_async(complete(messages))
+        timings[f'{self.name}.completion'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        items = await llm_output.aparse_with_reask(raw, llm_output.RECEIPT_ITEM, reask)
+        timings[f'{self.name}.parse'] = _elapsed_ms(start)
+        return items, 1.0
+
+    def stream(self, image_bytes, mime_type, timings):
+        """
+        Stream the completion and yield every item as soon as its JSON object is complete.
+        """
+        start = time.perf_counter()
+        response = llm_providers.get_provider().client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(image_bytes, mime_type),
+            max_tokens=self.max_tokens,
+            stream=True
+        )
+        parser = JSONArrayStream()
+        dropped = malformed = 0
+        try:
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                items = parser.feed(chunk.choices[0].delta.content or '')
+                # Malformed objects are skipped like invalid ones; the rest of the stream goes on
+                for fragment in parser.invalid[malformed:]:
+                    logger.warning(f"Skipping malformed streamed receipt item: {fragment[:200]}")
+                malformed = len(parser.invalid)
+                for item in items:
+                    try:
+                        item = llm_output.RECEIPT_ITEM.clean(item)
+                    except llm_output.SchemaError as e:
+                        logger.warning(f"Skipping streamed receipt item: {e}")
+                        dropped += 1
+                        continue
+                    if f'{self.name}.first_item' not in timings:
+                        timings[f'{self.name}.first_item'] = _elapsed_ms(start)
+                    yield item
+        finally:
+            llm_output.record_dropped(llm_output.RECEIPT_ITEM, dropped + malformed)
+        timings[f'{self.name}.completion'] = _elapsed_ms(start)
+        if not parser.started:
+            raise ValueError("The model response did not contain a JSON array.")
+
+
+def _config():
+    return getattr(settings, 'RECEIPT_EXTRACTION', {})
+
+
+def confidence_threshold():
+    return _config().get('CONFIDENCE_THRESHOLD', DEFAULT_CONFIDENCE_THRESHOLD)
+
+
+_engines_lock = threading.Lock()
+_engines = {}
+
+
+def get_engines():
+    """
+    The configured engines. Entries are dotted paths, or (dotted path, kwargs) pairs for
+    engines that take options. Engines keep no per-scan state, so the instances are built
+    once per configuration and shared.
+    """
+    entries = _config().get('ENGINES', DEFAULT_ENGINES)
+    key = repr(entries)
+    with _engines_lock:
+        if key not in _engines:
+            engines = []
+            for entry in entries:
+                path, options = (entry, {}) if isinstance(entry, str) else entry
+                engines.append(import_string(path)(**options))
+            _engines[key] = engines
+        return list(_engines[key])
+
+
+def extract_items(image_bytes, mime_type, engines=None, threshold=None):
+    """
+    Run the engines in order and return the first result whose confidence reaches the
+    threshold. The last available engine is always accepted. Engine errors are logged and
+    the next engine is tried; the error of the last engine is re-raised.
+    """
+    engines = get_engines() if engines is None else engines
+    threshold = confidence_threshold() if threshold is None else threshold
+    available = [engine for engine in engines if engine.is_available()]
+    if not available:
+        raise RuntimeError("No receipt extraction engine is available.")
+
+    timings = {}
+    attempts = []
+    total_start = time.perf_counter()
+    for index, engine in enumerate(available):
+        is_last = index == len(available) - 1
+        start = time.perf_counter()
+        try:
+            items, confidence = engine.extract(image_bytes, mime_type, timings)
+        except Exception as e:
+            attempts.append({"engine": engine.name, "error": str(e), "ms": _elapsed_ms(start)})
+            if is_last:
+                raise
+            logger.warning(f"Receipt engine {engine.name} failed, falling back: {e}")
+            continue
+
+        attempts.append({"engine": engine.name, "confidence": confidence, "ms": _elapsed_ms(start)})
+        if confidence >= threshold or is_last:
+            timings['total'] = _elapsed_ms(total_start)
+            logger.info(f"Receipt extracted by {engine.name} (confidence {confidence}) in {timings['total']} ms")
+            return ExtractionResult(items=items, engine=engine.name, confidence=confidence, timings=timings, attempts=attempts)
+
+
+async def aextract_items(image_bytes, mime_type, engines=None, threshold=None):
+    """
+    Async version of `extract_items` for the async views. Engines without an `aextract`
+    method run in a worker thread.
+    """
+    engines = get_engines() if engines is None else engines
+    threshold = confidence_threshold() if threshold is None else threshold
+    available = [engine for engine in engines if engine.is_available()]
+    if not available:
+        raise RuntimeError("No receipt extraction engine is available.")
+
+    timings = {}
+    attempts = []
+    total_start = time.perf_counter()
+    for index, engine in enumerate(available):
+        is_last = index == len(available) - 1
+        start = time.perf_counter()
+        try:
+            if hasattr(engine, 'aextract'):
+                items, confidence = await engine.aextract(image_bytes, mime_type, timings)
+            else:
+                items, confidence = await asyncio.to_thread(engine.extract, image_bytes, mime_type, timings)
+        except Exception as e:
+            attempts.append({"engine": engine.name, "error": str(e), "ms": _elapsed_ms(start)})
+            if is_last:
+                raise
+            logger.warning(f"Receipt engine {engine.name} failed, falling back: {e}")
+            continue
+
+        attempts.append({"engine": engine.name, "confidence": confidence, "ms": _elapsed_ms(start)})
+        if confidence >= threshold or is_last:
+            timings['total'] = _elapsed_ms(total_start)
+            logger.info(f"Receipt extracted by {engine.name} (confidence {confidence}) in {timings['total']} ms")
+            return ExtractionResult(items=items, engine=engine.name, confidence=confidence, timings=timings, attempts=attempts)
@@ -0,0 +1,271 @@
+"""
+Database-backed queue for receipt scans.
+
+`enqueue` stores the upload as a ScanJob and wakes the worker pool. Workers claim pending
+jobs with a conditional UPDATE, so several threads or processes can share the same table,
+run the scan pipeline and record the result. Failed attempts are retried with exponential
+backoff until `MAX_ATTEMPTS` is reached. Jobs left RUNNING by a crashed worker are put back
+in the queue after `STALE_AFTER` seconds (or failed, once they used their attempts); running
+pools look for them every `REQUEUE_INTERVAL` seconds. A worker records its outcome only if the
+job was not requeued meanwhile, so a slow attempt cannot overwrite a newer one.
+
+In-process workers start on the first enqueue when `AUTOSTART` is on; dedicated worker
+processes can be run with `python manage.py run_scan_workers`.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ScanJob
+from .scanning import scan_image
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 4,
+    'AUTOSTART': True,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 2.0,
+    'BACKOFF_MAX_SECONDS': 60.0,
+    'POLL_INTERVAL': 1.0,
+    'STALE_AFTER': 300,
+    'REQUEUE_INTERVAL': 60,
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RECEIPT_SCAN_QUEUE', {}))
+    return options
+
+
+def _ms_between(start, end):
+    return round((end - start).total_seconds() * 1000, 1)
+
+
+def backoff_delay(attempts, options=None):
+    """
+    Seconds to wait before retrying a job that has failed `attempts` times.
+    """
+    options = options or get_options()
+    return min(options['BACKOFF_SECONDS'] * 2 ** (attempts - 1), options['BACKOFF_MAX_SECONDS'])
+
+
+def enqueue(user, image_bytes, filename, use_cache=True):
+    """
+    Persist an upload as a pending job and wake the workers.
+    """
+    job = ScanJob.objects.create(
+        user=user,
+        image=image_bytes,
+        filename=filename or '',
+        use_cache=use_cache,
+        max_attempts=get_options()['MAX_ATTEMPTS'],
+    )
+    if get_options()['AUTOSTART']:
+        start_workers()
+    _wakeup.set()
+    return job
+
+
+def record_cached(user, filename, items):
+    """
+    Store a scan served from the cache as a succeeded job, so it can be polled and confirmed
+    like any other.
+    """
+    now = timezone.now()
+    return ScanJob.objects.create(
+        user=user,
+        filename=filename or '',
+        status=ScanJob.SUCCEEDED,
+        max_attempts=get_options()['MAX_ATTEMPTS'],
+        result={"items": items, "cached": True, "engine": "cache"},
+        created_at=now,
+        available_at=now,
+        started_at=now,
+        finished_at=now,
+        queue_ms=0.0,
+        run_ms=0.0,
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Put jobs whose worker died mid-scan back in the queue. Jobs that already used all their
+    attempts are marked FAILED instead, so a scan that keeps killing its worker is not retried
+    forever.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=get_options()['STALE_AFTER'])
+    stale = ScanJob.objects.filter(status=ScanJob.RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=ScanJob.FAILED, error="The worker running this scan stopped responding.", finished_at=now
+    )
+    if failed:
+        logger.error(f"Failed {failed} stale receipt scan jobs that ran out of attempts")
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(status=ScanJob.PENDING, available_at=now)
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale receipt scan jobs")
+    return requeued
+
+
+def claim_next():
+    """
+    Atomically move the oldest runnable job to RUNNING and return it, or None.
+    """
+    now = timezone.now()
+    candidates = (
+        ScanJob.objects
+        .filter(status=ScanJob.PENDING, available_at__lte=now)
+        .order_by('available_at')
+        .values_list('id', flat=True)[:5]
+    )
+    for job_id in candidates:
+        claimed = ScanJob.objects.filter(id=job_id, status=ScanJob.PENDING).update(
+            status=ScanJob.RUNNING, started_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ScanJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """
+    Run the scan pipeline for a claimed job and record the outcome.
+    """
+    options = get_options()
+    if job.queue_ms is None:
+        job.queue_ms = _ms_between(job.created_at, job.started_at)
+    try:
+        result = scan_image(bytes(job.image), job.filename, use_cache=job.use_cache)
+    except Exception as e:
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.run_ms = _ms_between(job.started_at, job.finished_at)
+        if job.attempts < job.max_attempts:
+            delay = backoff_delay(job.attempts, options)
+            job.status = ScanJob.PENDING
+            job.available_at = job.finished_at + timedelta(seconds=delay)
+            logger.warning(f"Receipt scan job {job.id} failed (attempt {job.attempts}), retrying in {delay}s: {e}")
+        else:
+            job.status = ScanJob.FAILED
+            logger.error(f"Receipt scan job {job.id} failed after {job.attempts} attempts: {e}")
+        _save_outcome(job, ['status', 'error', 'available_at', 'finished_at', 'queue_ms', 'run_ms'])
+        return job
+
+    job.status = ScanJob.SUCCEEDED
+    job.result = result
+    job.error = ''
+    job.image = None  # the upload is no longer needed once the items are extracted
+    job.finished_at = timezone.now()
+    job.run_ms = _ms_between(job.started_at, job.finished_at)
+    _save_outcome(job, ['status', 'result', 'error', 'image', 'finished_at', 'queue_ms', 'run_ms'])
+    return job
+
+
+def _save_outcome(job, fields):
+    """
+    Save the outcome of this attempt unless the job was requeued as stale meanwhile: another
+    worker may have claimed it again, and its attempt owns the row now.
+    """
+    saved = ScanJob.objects.filter(id=job.id, status=ScanJob.RUNNING, started_at=job.started_at).update(
+        **{name: getattr(job, name) for name in fields}
+    )
+    if not saved:
+        logger.warning(f"Receipt scan job {job.id} was requeued while attempt {job.attempts} ran; dropping its outcome")
+
+
+def run_pending(limit=None):
+    """
+    Process runnable jobs in the calling thread until the queue is empty (or `limit` jobs ran).
+    Returns the number of jobs processed.
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+class WorkerPool:
+    """
+    A fixed number of daemon threads polling the job table.
+    """
+
+    def __init__(self, workers, poll_interval, requeue_interval=None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.requeue_interval = requeue_interval or get_options()['REQUEUE_INTERVAL']
+        self.threads = []
+        self.stopping = threading.Event()
+        self._requeue_lock = threading.Lock()
+        self._next_requeue = 0.0
+
+    def start(self):
+        self.requeue_if_due()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"scan-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {self.workers} receipt scan workers")
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        _wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def requeue_if_due(self):
+        """
+        Requeue stale jobs if no thread of the pool has done so in the last `requeue_interval` seconds.
+        """
+        with self._requeue_lock:
+            now = time.monotonic()
+            if now < self._next_requeue:
+                return 0
+            self._next_requeue = now + self.requeue_interval
+        return requeue_stale_jobs()
+
+    def _loop(self):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    self.requeue_if_due()
+                    job = claim_next()
+                    if job is not None:
+                        run_job(job)
+                        continue
+                except Exception:
+                    logger.exception("Receipt scan worker error")
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+        finally:
+            connection.close()
+
+
+_wakeup = threading.Event()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_workers(workers=None):
+    """
+    Start the in-process worker pool once per process and return it.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            options = get_options()
+            _pool = WorkerPool(workers or options['WORKERS'], options['POLL_INTERVAL'])
+            _pool.start()
+        return _pool
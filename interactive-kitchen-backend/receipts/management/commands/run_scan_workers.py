@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from receipts import jobs
+
+class Command(BaseCommand):
+    help = "Run receipt scan workers in this process until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Number of worker threads (defaults to RECEIPT_SCAN_QUEUE['WORKERS']).")
+        parser.add_argument('--once', action='store_true', help="Process the runnable jobs in this thread and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} receipt scan jobs"))
+            return
+
+        pool = jobs.start_workers(options['workers'])
+        self.stdout.write(self.style.SUCCESS(f"Running {pool.workers} receipt scan workers, press Ctrl+C to stop"))
+        try:
+            for thread in pool.threads:
+                thread.join()
+        except KeyboardInterrupt:
+            pool.stop(timeout=5)
@@ -1,3 +1,62 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+
+class ScanCacheEntry(models.Model):
+    """
+    Parsed result of a receipt scan, keyed by a hash of the image bytes and the prompt version.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    prompt_version = models.CharField(max_length=32)
+    items = models.JSONField(default=list)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} (v{self.prompt_version}, {self.hit_count} hits)"
+
+
+class ScanJob(models.Model):
+    """
+    A queued receipt scan. The upload is stored with the job and processed by the
+    workers in receipts/jobs.py; clients poll the job for its status and result.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, related_name='scan_jobs')
+    image = models.BinaryField(null=True)
+    filename = models.CharField(max_length=255, blank=True)
+    use_cache = models.BooleanField(default=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    queue_ms = models.FloatField(null=True, blank=True)
+    run_ms = models.FloatField(null=True, blank=True)
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='scanjob_status_available_idx'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.id} ({self.status})"
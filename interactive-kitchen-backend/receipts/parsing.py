@@ -0,0 +1,210 @@
+"""
+Line parser for OCR'd grocery receipts.
+
+Turns the plain text produced by Tesseract into item dicts shaped like the ones the
+vision model returns (`name`, `quantity`, `unit`, `expiration_date`) plus the line
+`price`, and scores how much of the receipt it could account for. Units come out in the
+canonical form of `inventory.normalization` ("2L" -> "l", "12PK" -> "pack").
+"""
+import re
+from datetime import date, timedelta
+
+from inventory.normalization import normalize_unit
+
+PRICE = r'-?\$?\d{1,4}[.,]\d{2}'
+
+# A line ending in a price, optionally followed by a tax flag such as "F", "T" or "*".
+PRICED_LINE_RE = re.compile(rf'^(?P<body>.*?)\s*(?P<price>{PRICE})\s*(?:[A-Z*]{{1,2}})?$')
+# "2 x 1.50", "2 @ $1.50", "3 @ 2/1.00" (3 bought at 2 for $1.00) style quantity lines.
+MULTIPLIER_RE = re.compile(
+    rf'^(?P<qty>\d+(?:\.\d+)?)\s*(?:x|@|X)\s*(?:\d+\s*/\s*)?(?P<unit_price>{PRICE})(?:\s*(?:ea|each|EA))?$'
+)
+# "0.442 kg @ $2.99/kg" style weighed lines.
+WEIGHT_RE = re.compile(
+    rf'^(?P<qty>\d+(?:[.,]\d+)?)\s*(?P<unit>kg|g|lb|lbs|oz)\s*(?:@|x|X)\s*(?P<unit_price>{PRICE})\s*(?:/\s*[a-zA-Z]+)?$',
+    re.IGNORECASE,
+)
+# Quantity at the start of the name: "2 x MILK", "2 MILK", "2@ MILK".
+LEADING_QTY_RE = re.compile(r'^(?P<qty>\d{1,3})\s*(?:x|X|@)?\s+(?P<name>[A-Za-z].*)$')
+# Pack size at the end of the name: "MILK 2L", "BANANAS 1.2KG", "EGGS 12PK".
+TRAILING_SIZE_RE = re.compile(
+    r'^(?P<name>.*?[A-Za-z].*?)\s+(?P<qty>\d+(?:[.,]\d+)?)\s*(?P<unit>kg|g|l|lt|ltr|ml|pk|pack|ea|pcs|lb|oz)$',
+    re.IGNORECASE,
+)
+
+NOISE_WORDS = (
+    'total', 'subtotal', 'sub total', 'tax', 'gst', 'vat', 'change', 'cash', 'card', 'visa',
+    'mastercard', 'eftpos', 'balance', 'tender', 'savings', 'you saved', 'discount', 'rounding',
+    'thank', 'receipt', 'invoice', 'tel', 'phone', 'abn', 'store', 'cashier', 'member', 'points',
+    'approved', 'auth', 'ref', 'terminal',
+)
+TOTAL_RE = re.compile(rf'^(?!.*sav)(?:sub\s*total|subtotal|total)\b[^0-9$-]*(?P<price>{PRICE})', re.IGNORECASE)
+DATE_OR_TIME_RE = re.compile(r'\d{1,2}[/:-]\d{1,2}(?:[/:-]\d{2,4})?')
+
+# Rough shelf life used to fill in `expiration_date` for locally parsed items.
+SHELF_LIFE_DAYS = (
+    (('fish', 'salmon', 'prawn', 'shrimp', 'chicken', 'beef', 'pork', 'mince', 'lamb', 'sausage'), 3),
+    (('berry', 'berries', 'lettuce', 'spinach', 'salad', 'herb', 'coriander', 'basil'), 4),
+    (('bread', 'bun', 'roll', 'banana', 'avocado', 'mushroom', 'tomato'), 5),
+    (('milk', 'cream', 'yogurt', 'yoghurt'), 7),
+    (('cheese', 'butter', 'carrot', 'apple', 'orange', 'lemon', 'cabbage'), 14),
+    (('egg',), 21),
+    (('rice', 'pasta', 'flour', 'sugar', 'salt', 'oil', 'can', 'canned', 'coffee', 'tea'), 180),
+)
+DEFAULT_SHELF_LIFE_DAYS = 10
+
+
+def _to_float(value):
+    return float(value.replace('$', '').replace(',', '.'))
+
+
+def clean_name(name):
+    name = re.sub(r'[^A-Za-z0-9&%\'\s-]', ' ', name)
+    name = re.sub(r'\s+', ' ', name).strip(' -')
+    return name.title()
+
+
+def estimate_expiration_date(name, today=None):
+    """
+    Guess an expiration date from the item name using a small shelf-life table.
+    """
+    today = today or date.today()
+    lowered = name.lower()
+    for keywords, days in SHELF_LIFE_DAYS:
+        if any(keyword in lowered for keyword in keywords):
+            return today + timedelta(days=days)
+    return today + timedelta(days=DEFAULT_SHELF_LIFE_DAYS)
+
+
+def _is_noise(line):
+    lowered = line.lower()
+    if any(re.search(rf'\b{re.escape(word)}\b', lowered) for word in NOISE_WORDS):
+        return True
+    letters = sum(ch.isalpha() for ch in line)
+    if letters or not DATE_OR_TIME_RE.search(line):
+        return False
+    # "3 @ 2/1.00 1.50" has no letters either, and "2/1" looks like a date
+    priced = PRICED_LINE_RE.match(line)
+    return not (priced and MULTIPLIER_RE.match(priced.group('body').strip()))
+
+
+def _name_quality(name):
+    """
+    Fraction of letters in the name; OCR garbage scores low.
+    """
+    compact = name.replace(' ', '')
+    if len(compact) < 2:
+        return 0.0
+    return sum(ch.isalpha() for ch in compact) / len(compact)
+
+
+def _split_name(body):
+    """
+    Pull a leading quantity or trailing pack size out of an item description.
+    Returns (name, quantity, unit).
+    """
+    body = body.strip()
+    match = LEADING_QTY_RE.match(body)
+    if match:
+        return match.group('name'), float(match.group('qty')), 'pcs'
+    match = TRAILING_SIZE_RE.match(body)
+    if match:
+        return match.group('name'), _to_float(match.group('qty')), normalize_unit(match.group('unit'))
+    return body, 1.0, 'pcs'
+
+
+def _make_item(name, quantity, unit, price, today):
+    name = clean_name(name)
+    return {
+        'name': name,
+        'quantity': round(quantity, 3),
+        'unit': unit,
+        'price': round(price, 2),
+        'expiration_date': estimate_expiration_date(name, today).isoformat(),
+    }
+
+
+def parse_receipt_text(text, today=None):
+    """
+    Parse OCR text into receipt items.
+
+    Handles single-line items ("MILK 2L 3.49"), leading quantities ("2 x BREAD 5.00"),
+    and items whose quantity, weight or price is printed on the following line:
+
+        BANANAS CAVENDISH
+        0.442 kg @ $2.99/kg        1.32
+
+    Returns a dict with `items`, `confidence` (0-1), `total` (the printed subtotal/total,
+    if any) and `candidate_lines`.
+    """
+    items = []
+    qualities = []
+    candidate_lines = 0
+    printed_total = None
+    pending_name = None
+
+    for raw_line in text.splitlines():
+        line = re.sub(r'\s+', ' ', raw_line).strip()
+        if not line:
+            continue
+
+        total_match = TOTAL_RE.match(line)
+        if total_match:
+            if printed_total is None:
+                printed_total = _to_float(total_match.group('price'))
+            pending_name = None
+            continue
+        if _is_noise(line):
+            pending_name = None
+            continue
+
+        priced = PRICED_LINE_RE.match(line)
+        if not priced:
+            # A description without a price; its quantity and price may follow on the next line.
+            if sum(ch.isalpha() for ch in line) >= 3:
+                pending_name = line
+            continue
+
+        candidate_lines += 1
+        body = priced.group('body').strip()
+        price = _to_float(priced.group('price'))
+
+        weighed = WEIGHT_RE.match(body)
+        multiplied = MULTIPLIER_RE.match(body)
+        if (weighed or multiplied or not body) and pending_name:
+            if weighed:
+                quantity, unit = _to_float(weighed.group('qty')), normalize_unit(weighed.group('unit'))
+            elif multiplied:
+                quantity, unit = float(multiplied.group('qty')), 'pcs'
+            else:
+                quantity, unit = 1.0, 'pcs'
+            name = pending_name
+        elif weighed or multiplied or not body:
+            # Quantity line with nothing to attach it to.
+            pending_name = None
+            continue
+        else:
+            name, quantity, unit = _split_name(body)
+
+        pending_name = None
+        if price < 0 or _name_quality(name) < 0.5:
+            continue
+        items.append(_make_item(name, quantity, unit, price, today))
+        qualities.append(_name_quality(name))
+
+    confidence = 0.0
+    if items and candidate_lines:
+        confidence = (len(items) / candidate_lines) * (sum(qualities) / len(qualities))
+        if printed_total is not None:
+            parsed_total = sum(item['price'] for item in items)
+            if abs(parsed_total - printed_total) <= 0.05:
+                confidence = max(confidence, 0.95)
+            else:
+                confidence *= 0.6
+
+    return {
+        'items': items,
+        'confidence': round(confidence, 3),
+        'total': printed_total,
+        'candidate_lines': candidate_lines,
+    }
@@ -0,0 +1,219 @@
+"""
+Image preprocessing for receipt scans.
+
+Phone photos are several megabytes of colour pixels, most of them table top. Before any
+OCR or vision call the image is auto-oriented from its EXIF data, converted to grayscale,
+cropped to the bright paper area, deskewed, downscaled to the configured DPI for a
+receipt-width strip of paper and re-encoded. Every step works on Pillow images only.
+"""
+import io
+import logging
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from PIL import Image, ImageFilter, ImageOps, ImageStat, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'GRAYSCALE': True,
+    'CROP': True,
+    'DESKEW': True,
+    'MAX_SKEW_DEGREES': 5.0,
+    'SKEW_STEP_DEGREES': 0.5,
+    'TARGET_DPI': 300,
+    'RECEIPT_WIDTH_MM': 80,
+    'FORMAT': 'JPEG',
+    'JPEG_QUALITY': 80,
+}
+
+# Size of the thumbnail used to find the receipt outline and the skew angle.
+ANALYSIS_SIZE = 600
+MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+EXIF_ORIENTATION = 0x0112
+
+
+@dataclass
+class PreprocessResult:
+    image_bytes: bytes
+    mime_type: str
+    original_bytes: int
+    elapsed_ms: float = 0.0
+    steps: list = field(default_factory=list)
+    size: tuple = None
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - len(self.image_bytes)
+
+    def as_dict(self):
+        return {
+            "original_bytes": self.original_bytes,
+            "bytes": len(self.image_bytes),
+            "bytes_saved": self.bytes_saved,
+            "ms": self.elapsed_ms,
+            "steps": self.steps,
+            "size": list(self.size) if self.size else None,
+        }
+
+
+def get_options(overrides=None):
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RECEIPT_PREPROCESSING', {}))
+    options.update(overrides or {})
+    return options
+
+
+def find_receipt_box(gray):
+    """
+    Return the bounding box of the bright paper in a grayscale image, or None when the
+    bright area is too small or already fills the frame.
+    """
+    thumb = gray.copy()
+    thumb.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    threshold = ImageStat.Stat(thumb).mean[0] + 10
+    mask = thumb.point(lambda p: 255 if p > threshold else 0).filter(ImageFilter.MinFilter(5))
+    box = mask.getbbox()
+    if not box:
+        return None
+
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    coverage = area / float(thumb.width * thumb.height)
+    if coverage < 0.2 or coverage > 0.95:
+        return None
+
+    scale_x = gray.width / float(thumb.width)
+    scale_y = gray.height / float(thumb.height)
+    margin = 4
+    return (
+        max(0, int((box[0] - margin) * scale_x)),
+        max(0, int((box[1] - margin) * scale_y)),
+        min(gray.width, int((box[2] + margin) * scale_x)),
+        min(gray.height, int((box[3] + margin) * scale_y)),
+    )
+
+
+def _row_profile_score(ink):
+    """
+    Variance of the row sums; text lines aligned with the pixel rows give the sharpest profile.
+    """
+    rows = list(ink.resize((1, ink.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((value - mean) ** 2 for value in rows) / len(rows)
+
+
+def estimate_skew(gray, max_degrees=5.0, step=0.5):
+    """
+    Estimate the rotation (degrees, counter-clockwise) that makes the text lines horizontal.
+    """
+    thumb = gray.copy()
+    thumb.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    threshold = ImageStat.Stat(thumb).mean[0] - 30
+    ink = thumb.point(lambda p: 255 if p < threshold else 0)
+
+    best_angle, best_score = 0.0, _row_profile_score(ink)
+    steps = int(max_degrees / step)
+    for index in range(-steps, steps + 1):
+        angle = index * step
+        if angle == 0:
+            continue
+        score = _row_profile_score(ink.rotate(angle, resample=Image.BILINEAR, fillcolor=0))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def target_width(options):
+    return int(round(options['RECEIPT_WIDTH_MM'] / 25.4 * options['TARGET_DPI']))
+
+
+def preprocess_image(image_bytes, overrides=None):
+    """
+    Prepare an uploaded receipt photo for OCR or the vision model.
+
+    Returns a PreprocessResult with the re-encoded bytes, their MIME type, the bytes saved and
+    the time spent. Images Pillow cannot decode are passed through unchanged.
+    """
+    options = get_options(overrides)
+    start = time.perf_counter()
+    original_size = len(image_bytes)
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        if image.format == 'JPEG':
+            # Let the JPEG decoder skip detail we would throw away when downscaling anyway;
+            # keep three times the target width so a receipt that fills only part of the
+            # photo still has the target DPI after cropping.
+            draft_size = 3 * target_width(options)
+            image.draft('L' if options['GRAYSCALE'] else 'RGB', (draft_size, draft_size))
+        image.load()
+        source_mime_type = Image.MIME.get(image.format)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Skipping receipt preprocessing, image could not be decoded: {e}")
+        return PreprocessResult(image_bytes, None, original_size, steps=['undecodable'])
+
+    steps = []
+    geometry_changed = False
+
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+        steps.append('orient')
+        geometry_changed = True
+
+    if options['GRAYSCALE']:
+        image = image.convert('L')
+        steps.append('grayscale')
+    gray = image if image.mode == 'L' else image.convert('L')
+
+    if options['CROP']:
+        box = find_receipt_box(gray)
+        if box:
+            image = image.crop(box)
+            gray = gray.crop(box)
+            steps.append('crop')
+            geometry_changed = True
+
+    if options['DESKEW']:
+        angle = estimate_skew(gray, options['MAX_SKEW_DEGREES'], options['SKEW_STEP_DEGREES'])
+        if angle:
+            fill = 255 if image.mode == 'L' else (255,) * len(image.getbands())
+            image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+            steps.append(f'deskew:{angle:g}')
+            geometry_changed = True
+
+    width = target_width(options)
+    if image.width > width:
+        height = max(1, int(round(image.height * width / float(image.width))))
+        image = image.resize((width, height), Image.LANCZOS)
+        steps.append('downscale')
+
+    image_format = options['FORMAT'].upper()
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        image.save(buffer, format='JPEG', quality=options['JPEG_QUALITY'], optimize=True)
+    else:
+        image.save(buffer, format=image_format, optimize=True)
+    processed = buffer.getvalue()
+
+    if len(processed) >= original_size and not geometry_changed:
+        # Re-encoding a small, upright photo made it bigger; keep the original bytes.
+        processed = image_bytes
+        mime_type = source_mime_type
+        steps.append('kept-original')
+    else:
+        mime_type = MIME_TYPES.get(image_format, f'image/{image_format.lower()}')
+
+    result = PreprocessResult(
+        image_bytes=processed,
+        mime_type=mime_type,
+        original_bytes=original_size,
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 1),
+        steps=steps,
+        size=image.size,
+    )
+    logger.info(f"Preprocessed receipt {original_size} -> {len(processed)} bytes in {result.elapsed_ms} ms ({', '.join(steps)})")
+    return result
@@ -0,0 +1,283 @@
+"""
+The receipt scan pipeline shared by the scan endpoints and the job workers:
+cache lookup, image preprocessing, extraction engines and cache store.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mimetypes import guess_type
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from inventory.normalization import normalize_name, normalize_unit
+
+from . import cache as scan_cache
+from .engines import RECEIPT_PROMPT_VERSION, aextract_items, confidence_threshold, extract_items, get_engines
+from .preprocessing import get_options as get_preprocessing_options, preprocess_image
+
+logger = logging.getLogger(__name__)
+
+BATCH_DEFAULTS = {
+    'MAX_IMAGES': 10,
+    'CONCURRENCY': 4,
+}
+
+
+def scan_image(image_bytes, filename, use_cache=True):
+    """
+    Extract the grocery items from one receipt image.
+
+    Returns a dict with `items`, `cached`, `engine`, `confidence`, `timings` and `preprocessing`.
+    `use_cache=False` skips the cache lookup but still refreshes the cached entry.
+    """
+    cache_key = scan_cache.make_key(image_bytes, RECEIPT_PROMPT_VERSION)
+    if use_cache and scan_cache.is_enabled():
+        cached_items = scan_cache.lookup(cache_key)
+        if cached_items is not None:
+            return {"items": cached_items, "cached": True, "engine": "cache"}
+
+    # Get MIME type (e.g., image/jpeg)
+    mime_type = guess_type(filename or '')[0] or 'image/jpeg'
+
+    # Orient, crop, deskew and downscale the photo before any OCR or vision call
+    preprocessing = None
+    if get_preprocessing_options()['ENABLED']:
+        preprocessing = preprocess_image(image_bytes)
+        image_bytes = preprocessing.image_bytes
+        mime_type = preprocessing.mime_type or mime_type
+
+    result = extract_items(image_bytes, mime_type)
+    if preprocessing:
+        result.timings['preprocess'] = preprocessing.elapsed_ms
+
+    if scan_cache.is_enabled():
+        scan_cache.store(cache_key, RECEIPT_PROMPT_VERSION, result.items)
+
+    return {
+        "items": result.items,
+        "cached": False,
+        "engine": result.engine,
+        "confidence": result.confidence,
+        "timings": result.timings,
+        "preprocessing": preprocessing.as_dict() if preprocessing else None,
+    }
+
+
+async def ascan_image(image_bytes, filename, use_cache=True):
+    """
+    Async version of `scan_image` for the async views: the cache goes through the async ORM
+    wrappers, preprocessing runs in a worker thread and the vision call awaits the shared
+    async client, so no thread is held while the model runs.
+    """
+    cache_key = scan_cache.make_key(image_bytes, RECEIPT_PROMPT_VERSION)
+    if use_cache and scan_cache.is_enabled():
+        cached_items = await sync_to_async(scan_cache.lookup)(cache_key)
+        if cached_items is not None:
+            return {"items": cached_items, "cached": True, "engine": "cache"}
+
+    mime_type = guess_type(filename or '')[0] or 'image/jpeg'
+
+    preprocessing = None
+    if get_preprocessing_options()['ENABLED']:
+        preprocessing = await asyncio.to_thread(preprocess_image, image_bytes)
+        image_bytes = preprocessing.image_bytes
+        mime_type = preprocessing.mime_type or mime_type
+
+    result = await aextract_items(image_bytes, mime_type)
+    if preprocessing:
+        result.timings['preprocess'] = preprocessing.elapsed_ms
+
+    if scan_cache.is_enabled():
+        await sync_to_async(scan_cache.store)(cache_key, RECEIPT_PROMPT_VERSION, result.items)
+
+    return {
+        "items": result.items,
+        "cached": False,
+        "engine": result.engine,
+        "confidence": result.confidence,
+        "timings": result.timings,
+        "preprocessing": preprocessing.as_dict() if preprocessing else None,
+    }
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def stream_scan(image_bytes, filename, use_cache=True):
+    """
+    Scan one receipt and yield `(event, data)` pairs as the items become available:
+    an `item` event per item, then one `summary` event (or an `error` event).
+
+    Engines with a `stream()` method (the OpenAI vision engine) emit every item as soon as its
+    JSON object is complete; other engines emit all their items at once and are accepted when
+    their confidence reaches the threshold, as in `extract_items`.
+    """
+    start = time.perf_counter()
+    timings = {}
+    cache_key = scan_cache.make_key(image_bytes, RECEIPT_PROMPT_VERSION)
+    if use_cache and scan_cache.is_enabled():
+        cached_items = scan_cache.lookup(cache_key)
+        if cached_items is not None:
+            for item in cached_items:
+                yield 'item', item
+            timings['total'] = _elapsed_ms(start)
+            yield 'summary', {"items": cached_items, "count": len(cached_items), "cached": True,
+                              "engine": "cache", "timings": timings}
+            return
+
+    mime_type = guess_type(filename or '')[0] or 'image/jpeg'
+    if get_preprocessing_options()['ENABLED']:
+        preprocessing = preprocess_image(image_bytes)
+        image_bytes = preprocessing.image_bytes
+        mime_type = preprocessing.mime_type or mime_type
+        timings['preprocess'] = preprocessing.elapsed_ms
+
+    available = [engine for engine in get_engines() if engine.is_available()]
+    if not available:
+        yield 'error', {"error": "No receipt extraction engine is available."}
+        return
+
+    items = []
+    for index, engine in enumerate(available):
+        is_last = index == len(available) - 1
+        try:
+            if hasattr(engine, 'stream'):
+                confidence = 1.0
+                for item in engine.stream(image_bytes, mime_type, timings):
+                    if not items:
+                        timings['first_item'] = _elapsed_ms(start)
+                    items.append(item)
+                    yield 'item', item
+            else:
+                extracted, confidence = engine.extract(image_bytes, mime_type, timings)
+                if confidence < confidence_threshold() and not is_last:
+                    continue
+                if extracted:
+                    timings['first_item'] = _elapsed_ms(start)
+                items = list(extracted)
+                for item in items:
+                    yield 'item', item
+        except Exception as e:
+            logger.warning(f"Streaming receipt engine {engine.name} failed: {e}")
+            # Items already sent cannot be taken back, so only fall back before the first one
+            if is_last or items:
+                yield 'error', {"error": str(e), "engine": engine.name, "count": len(items)}
+                return
+            continue
+        break
+
+    if scan_cache.is_enabled():
+        scan_cache.store(cache_key, RECEIPT_PROMPT_VERSION, items)
+    timings['total'] = _elapsed_ms(start)
+    logger.info(f"Streamed {len(items)} receipt items from {engine.name}, first after {timings.get('first_item')} ms")
+    yield 'summary', {"items": items, "count": len(items), "cached": False, "engine": engine.name,
+                      "confidence": confidence, "timings": timings}
+
+
+_batch_slots = None
+_batch_slots_lock = threading.Lock()
+
+
+def get_batch_options():
+    options = dict(BATCH_DEFAULTS)
+    options.update(getattr(settings, 'RECEIPT_BATCH', {}))
+    return options
+
+
+def _slots():
+    """
+    Process-wide semaphore bounding the batch scans that run at the same time, so
+    concurrent batch requests cannot multiply the number of in-flight vision calls.
+    """
+    global _batch_slots
+    with _batch_slots_lock:
+        if _batch_slots is None:
+            _batch_slots = threading.BoundedSemaphore(get_batch_options()['CONCURRENCY'])
+        return _batch_slots
+
+
+def _scan_one(index, filename, image_bytes, use_cache):
+    start = time.perf_counter()
+    try:
+        with _slots():
+            result = scan_image(image_bytes, filename, use_cache=use_cache)
+        return {"index": index, "filename": filename, "status": "succeeded", **result, "ms": _elapsed_ms(start)}
+    except Exception as e:
+        logger.warning(f"Batch scan of {filename} failed: {e}")
+        return {"index": index, "filename": filename, "status": "failed", "error": str(e), "items": [],
+                "ms": _elapsed_ms(start)}
+    finally:
+        # Each pool thread has its own database connection
+        connection.close()
+
+
+def scan_batch(images, use_cache=True):
+    """
+    Scan several receipt images concurrently.
+
+    `images` is a list of (filename, bytes). Identical uploads are scanned once and reported
+    with `duplicate_of`. Returns the per-image results in upload order, the merged item list
+    and the wall-clock and summed scan times.
+    """
+    start = time.perf_counter()
+    results = [None] * len(images)
+    first_by_digest = {}
+    unique = []
+    for index, (filename, image_bytes) in enumerate(images):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        if digest in first_by_digest:
+            results[index] = {"index": index, "filename": filename, "status": "duplicate",
+                              "duplicate_of": first_by_digest[digest], "items": []}
+            continue
+        first_by_digest[digest] = index
+        unique.append((index, filename, image_bytes))
+
+    if unique:
+        workers = min(len(unique), get_batch_options()['CONCURRENCY'])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='receipt-batch') as executor:
+            futures = [executor.submit(_scan_one, index, filename, image_bytes, use_cache)
+                       for index, filename, image_bytes in unique]
+            for future in futures:
+                result = future.result()
+                results[result["index"]] = result
+
+    scanned = [result for result in results if result["status"] != "duplicate"]
+    return {
+        "results": results,
+        "items": merge_items(result["items"] for result in scanned),
+        "timings": {
+            "wall_ms": _elapsed_ms(start),
+            "slowest_ms": max((result["ms"] for result in scanned), default=0),
+            "sum_ms": round(sum(result["ms"] for result in scanned), 1),
+        },
+    }
+
+
+def merge_items(item_lists):
+    """
+    Merge items from several receipts. Items with the same normalized name and unit are
+    combined: quantities (and prices) are added up and the earliest expiration date is kept.
+    """
+    merged = {}
+    for items in item_lists:
+        for item in items:
+            key = (normalize_name(item.get("name")), normalize_unit(item.get("unit")))
+            if key not in merged:
+                merged[key] = dict(item)
+                continue
+            existing = merged[key]
+            try:
+                existing["quantity"] = round(float(existing.get("quantity") or 0) + float(item.get("quantity") or 0), 3)
+            except (TypeError, ValueError):
+                pass
+            if "price" in existing or "price" in item:
+                existing["price"] = round(float(existing.get("price") or 0) + float(item.get("price") or 0), 2)
+            dates = [date for date in (existing.get("expiration_date"), item.get("expiration_date")) if date]
+            existing["expiration_date"] = min(dates) if dates else None
+    return list(merged.values())
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from .models import ScanJob
+
+class ScanJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    items = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ScanJob
+        fields = [
+            'job_id', 'status', 'items', 'result', 'error', 'attempts', 'max_attempts',
+            'created_at', 'started_at', 'finished_at', 'queue_ms', 'run_ms', 'confirmed_at',
+        ]
+
+    def get_items(self, job):
+        return job.result.get('items', []) if job.result else None
@@ -1,3 +1,617 @@
-from django.test import TestCase
+import io
+import json
+import random
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from rest_framework.test import APITestCase, APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework import status
+from users.models import CustomUser
+from inventory.models import InventoryItem
+from receipts import cache as scan_cache
+from receipts import engines, jobs, scanning
+from receipts.models import ScanCacheEntry, ScanJob
+from receipts.parsing import parse_receipt_text
+from receipts.preprocessing import preprocess_image
+from utils import async_runtime, llm_output, llm_providers
+from utils.json_stream import JSONArrayStream
+
+# Tests run against the in-process provider so they need no API key; they patch its clients
+FAKE_PROVIDER = {"BACKEND": "fake", "FAKE_LATENCY": {"DISTRIBUTION": "constant", "MS": 0}}
+
+ITEMS_JSON = '[{"name": "Milk", "quantity": 1, "unit": "liters", "expiration_date": "2025-04-06"}]'
+
+
+def fake_completion(content=ITEMS_JSON):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@override_settings(
+    LLM_PROVIDER=FAKE_PROVIDER,
+    RECEIPT_EXTRACTION={"ENGINES": ["receipts.engines.OpenAIVisionEngine"]},
+    RECEIPT_SCAN_QUEUE={"AUTOSTART": False, "BACKOFF_SECONDS": 0},
+)
+class ScanReceiptTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.scan_url = "/api/receipts/scan_receipt/"
+        scan_cache.reset_stats()
+
+    def scan(self, image_bytes=b"receipt-bytes", **extra):
+        data = {"image": SimpleUploadedFile("receipt.jpg", image_bytes, content_type="image/jpeg")}
+        data.update(extra)
+        return self.client.post(self.scan_url, data, format="multipart")
+
+    def scan_and_process(self, **extra):
+        response = self.scan(**extra)
+        jobs.run_pending()
+        return response
+
+    def test_upload_is_queued_and_polled(self):
+        response = self.scan()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], ScanJob.PENDING)
+        status_url = f"/api/receipts/scan_jobs/{response.data['job_id']}/"
+        self.assertEqual(self.client.get(status_url).data["status"], ScanJob.PENDING)
+
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_completion()):
+            self.assertEqual(jobs.run_pending(), 1)
+
+        job = self.client.get(status_url).data
+        self.assertEqual(job["status"], ScanJob.SUCCEEDED)
+        self.assertEqual(job["items"][0]["name"], "Milk")
+        self.assertEqual(job["attempts"], 1)
+        self.assertIsNotNone(job["queue_ms"])
+        self.assertIsNotNone(job["run_ms"])
+        self.assertIsNone(ScanJob.objects.get().image)
+
+    def test_jobs_are_private_to_their_owner(self):
+        job_id = self.scan().data["job_id"]
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f"/api/receipts/scan_jobs/{job_id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        self.scan()
+        side_effect = [RuntimeError("rate limited"), fake_completion()]
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", side_effect=side_effect):
+            jobs.run_pending()
+
+        job = ScanJob.objects.get()
+        self.assertEqual(job.status, ScanJob.SUCCEEDED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(RECEIPT_SCAN_QUEUE={"AUTOSTART": False, "MAX_ATTEMPTS": 2, "BACKOFF_SECONDS": 0})
+    def test_jobs_fail_after_max_attempts(self):
+        self.scan()
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", side_effect=RuntimeError("down")):
+            jobs.run_pending()
+
+        job = ScanJob.objects.get()
+        self.assertEqual(job.status, ScanJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.error, "down")
+
+    def test_confirming_a_scan_adds_its_items_once(self):
+        job_id = self.scan().data["job_id"]
+        confirm_url = f"/api/receipts/scan_jobs/{job_id}/confirm/"
+        self.assertEqual(self.client.post(confirm_url).status_code, status.HTTP_409_CONFLICT)
+
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_completion()):
+            jobs.run_pending()
+        edited = [{"name": "Oat Milk", "quantity": 2, "unit": "l", "expiration_date": "2025-04-06"}]
+        response = self.client.post(confirm_url, {"items": edited}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(list(InventoryItem.objects.filter(added_by=self.user).values_list("name", flat=True)), ["Oat Milk"])
+        self.assertEqual(self.client.post(confirm_url).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(InventoryItem.objects.count(), 1)
+
+    def test_invalid_items_leave_the_scan_unconfirmed(self):
+        job_id = self.scan().data["job_id"]
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_completion()):
+            jobs.run_pending()
+        confirm_url = f"/api/receipts/scan_jobs/{job_id}/confirm/"
+        response = self.client.post(confirm_url, {"items": [{"name": "Milk", "quantity": "lots"}]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(confirm_url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(InventoryItem.objects.get().name, "Milk")
+
+    def test_running_pools_requeue_stale_jobs(self):
+        job_id = self.scan().data["job_id"]
+        ScanJob.objects.filter(id=job_id).update(status=ScanJob.RUNNING, started_at=timezone.now() - timedelta(hours=1))
+        pool = jobs.WorkerPool(workers=1, poll_interval=0, requeue_interval=60)
+        self.assertEqual(pool.requeue_if_due(), 1)
+        self.assertEqual(ScanJob.objects.get().status, ScanJob.PENDING)
+        # Checked at most once per interval, whichever worker thread gets there first
+        ScanJob.objects.filter(id=job_id).update(status=ScanJob.RUNNING, started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(pool.requeue_if_due(), 0)
+
+    def test_stale_jobs_out_of_attempts_fail(self):
+        job_id = self.scan().data["job_id"]
+        ScanJob.objects.filter(id=job_id).update(
+            status=ScanJob.RUNNING, attempts=3, started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+        job = ScanJob.objects.get()
+        self.assertEqual(job.status, ScanJob.FAILED)
+        self.assertTrue(job.error)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_abandoned_attempts_do_not_overwrite_a_reclaimed_job(self):
+        self.scan()
+        job = jobs.claim_next()
+        ScanJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale_jobs()
+        reclaimed = jobs.claim_next()
+        with mock.patch.object(jobs, "scan_image", side_effect=RuntimeError("slow scan gave up")):
+            jobs.run_job(job)
+        self.assertEqual(ScanJob.objects.get().status, ScanJob.RUNNING)
+        with mock.patch.object(jobs, "scan_image", return_value={"items": [], "cached": False, "engine": "fake"}):
+            jobs.run_job(reclaimed)
+        self.assertEqual(ScanJob.objects.get().status, ScanJob.SUCCEEDED)
+
+    def test_backoff_grows_exponentially_up_to_the_cap(self):
+        options = {"BACKOFF_SECONDS": 2, "BACKOFF_MAX_SECONDS": 10}
+        self.assertEqual([jobs.backoff_delay(n, options) for n in (1, 2, 3, 4)], [2, 4, 8, 10])
+
+    def test_repeated_upload_is_served_from_cache(self):
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_completion()) as create:
+            first = self.scan_and_process()
+            second = self.scan_and_process()
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.data["status"], ScanJob.SUCCEEDED)
+        cached = ScanJob.objects.get(id=second.data["job_id"])
+        self.assertTrue(cached.result["cached"])
+        self.assertEqual(cached.result["items"], ScanJob.objects.get(id=first.data["job_id"]).result["items"])
+        self.assertEqual(create.call_count, 1)
+        # A cached scan is confirmed like any other
+        response = self.client.post(f"/api/receipts/scan_jobs/{cached.id}/confirm/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(InventoryItem.objects.get().name, "Milk")
+        self.assertEqual(ScanCacheEntry.objects.get().hit_count, 1)
+        # The upload and the worker both look the image up before it is cached.
+        stats = scan_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_no_cache_flag_bypasses_lookup(self):
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_completion()) as create:
+            self.scan_and_process()
+            response = self.scan_and_process(no_cache="true")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(create.call_count, 2)
+
+    def test_prompt_version_is_part_of_the_key(self):
+        self.assertNotEqual(scan_cache.make_key(b"abc", "1"), scan_cache.make_key(b"abc", "2"))
+        self.assertEqual(scan_cache.make_key(b"abc", "1"), scan_cache.make_key(b"abc", "1"))
+
+    @override_settings(RECEIPT_SCAN_CACHE={"TTL": 60})
+    def test_expired_entries_are_misses(self):
+        scan_cache.store("expired", "1", [])
+        ScanCacheEntry.objects.update(created_at=timezone.now() - timedelta(seconds=120))
+        self.assertIsNone(scan_cache.lookup("expired"))
+
+    @override_settings(RECEIPT_SCAN_CACHE={"MAX_ENTRIES": 2})
+    def test_least_recently_used_entries_are_evicted(self):
+        scan_cache.store("a", "1", [])
+        scan_cache.store("b", "1", [])
+        ScanCacheEntry.objects.filter(key="a").update(last_accessed_at=timezone.now() + timedelta(seconds=1))
+        scan_cache.store("c", "1", [])
+        self.assertEqual(set(ScanCacheEntry.objects.values_list("key", flat=True)), {"a", "c"})
+
+
+def fake_stream(*pieces):
+    return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))]) for piece in pieces])
+
+
+def parse_events(response):
+    body = b"".join(response.streaming_content).decode()
+    events = []
+    for message in body.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@override_settings(
+    LLM_PROVIDER=FAKE_PROVIDER,
+    RECEIPT_EXTRACTION={"ENGINES": ["receipts.engines.OpenAIVisionEngine"]},
+    RECEIPT_PREPROCESSING={"ENABLED": False},
+)
+class ScanReceiptStreamTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/receipts/scan_receipt/stream/"
+
+    def scan(self, image_bytes=b"receipt-bytes"):
+        data = {"image": SimpleUploadedFile("receipt.jpg", image_bytes, content_type="image/jpeg")}
+        return self.client.post(self.url, data, format="multipart", HTTP_ACCEPT="text/event-stream")
+
+    def test_items_are_streamed_before_the_summary(self):
+        pieces = ['```json\n[{"name": "Milk", "quan', 'tity": 1, "unit": "l"}, {"name": "Eggs {free range}",',
+                  ' "quantity": 12, "unit": "pcs"}', ']\n```']
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_stream(*pieces)) as create:
+            response = self.scan()
+
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            events = parse_events(response)
+
+        self.assertTrue(create.call_args.kwargs["stream"])
+        self.assertEqual([event for event, _ in events], ["item", "item", "summary"])
+        self.assertEqual(events[1][1]["name"], "Eggs {free range}")
+        summary = events[-1][1]
+        self.assertEqual((summary["count"], summary["engine"], summary["cached"]), (2, "openai", False))
+        self.assertIn("first_item", summary["timings"])
+
+        # The streamed result is cached like a regular scan
+        self.assertEqual(parse_events(self.scan())[-1][1]["engine"], "cache")
+
+    def test_malformed_items_are_skipped(self):
+        llm_output.reset_stats()
+        pieces = ['[{"name": "Milk", "quantity": 1,, "unit": "l"}, {"name": "Bread", "quantity": }, ',
+                  '{"name": "Eggs", "quantity": 12, "unit": "pcs"}]']
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fake_stream(*pieces)):
+            events = parse_events(self.scan())
+        self.assertEqual([event for event, _ in events], ["item", "summary"])
+        self.assertEqual(events[0][1]["name"], "Eggs")
+        self.assertEqual(llm_output.stats(llm_output.RECEIPT_ITEM.name)["dropped"], 2)
+
+    def test_errors_are_sent_as_an_event(self):
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", side_effect=RuntimeError("down")):
+            events = parse_events(self.scan())
+        self.assertEqual(events, [("error", {"error": "down", "engine": "openai", "count": 0})])
+
+    def test_missing_image_is_rejected(self):
+        response = self.client.post(self.url, {}, format="multipart", HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.content.startswith(b"event: error\n"))
+
+
+@override_settings(
+    LLM_PROVIDER=FAKE_PROVIDER,
+    RECEIPT_EXTRACTION={"ENGINES": ["receipts.engines.OpenAIVisionEngine"]},
+    RECEIPT_PREPROCESSING={"ENABLED": False},
+)
+class AsyncScanReceiptTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.token = Token.objects.create(user=self.user)
+        self.url = "/api/receipts/scan_receipt/async/"
+
+    async def scan(self, token=None, **extra):
+        data = {"image": SimpleUploadedFile("receipt.jpg", b"receipt-bytes", content_type="image/jpeg"), **extra}
+        headers = {"Authorization": f"Token {token or self.token.key}"}
+        return await self.async_client.post(self.url, data, headers=headers)
+
+    def patch_vision(self, **kwargs):
+        return mock.patch.object(async_runtime.get_runtime().llm.chat.completions, "create",
+                                 new_callable=mock.AsyncMock, **kwargs)
+
+    async def test_scan_is_awaited_and_saved_to_the_inventory(self):
+        with self.patch_vision(return_value=fake_completion()) as create:
+            response = await self.scan(add_to_inventory="true")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = response.json()
+        self.assertEqual((body["engine"], body["items"][0]["name"]), ("openai", "Milk"))
+        self.assertEqual(body["inventory"][0]["added_by"], self.user.id)
+        self.assertEqual(create.await_count, 1)
+        self.assertEqual(await InventoryItem.objects.filter(added_by=self.user).acount(), 1)
+
+    async def test_scan_without_saving(self):
+        with self.patch_vision(return_value=fake_completion()):
+            response = await self.scan()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(await InventoryItem.objects.acount(), 0)
+
+    async def test_invalid_token_is_rejected(self):
+        response = await self.scan(token="not-a-token")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class JSONArrayStreamTests(SimpleTestCase):
+
+    def test_objects_are_returned_as_soon_as_they_close(self):
+        parser = JSONArrayStream()
+        self.assertEqual(parser.feed('Here you go: [{"name": "a\\"}'), [])
+        self.assertEqual(parser.feed('", "tags": ["x]"]}, {"n'), [{"name": 'a"}', "tags": ["x]"]}])
+        self.assertEqual(parser.feed('ame": "b"}] trailing {"name": "c"}'), [{"name": "b"}])
+        self.assertTrue(parser.finished)
+        self.assertEqual(parser.count, 2)
+
+    def test_malformed_objects_are_skipped(self):
+        parser = JSONArrayStream()
+        self.assertEqual(parser.feed('[{"name": "a",}, {"name": "b"}]'), [{"name": "b"}])
+        self.assertEqual(parser.invalid, ['{"name": "a",}'])
+        self.assertEqual(parser.count, 1)
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+class LLMOutputTests(SimpleTestCase):
+
+    def setUp(self):
+        llm_output.reset_stats()
+
+    def test_common_slips_are_repaired_locally(self):
+        answers = {
+            ITEMS_JSON: "direct",
+            f"Here are the items:\n```json\n{ITEMS_JSON}\n```\nLet me know!": "extracted",
+            '[{"name": "Milk", "quantity": 1, "unit": "liters", "expiration_date": "2025-04-06",},]': "repaired",
+            "[{'name': 'Milk', 'quantity': 1, 'unit': 'liters', 'expiration_date': '2025-04-06'}]": "repaired",
+            '{"items": [{"name": "Milk", "quantity": "1 l", "unit": "liters", "expiration_date": "2025/04/06"}]}': "direct",
+        }
+        for raw, method in answers.items():
+            with self.subTest(raw=raw):
+                self.assertEqual(llm_output.extract_json(raw)[1], method)
+                items = llm_output.parse(raw, llm_output.RECEIPT_ITEM)
+                self.assertEqual(items, [{"name": "Milk", "quantity": 1, "unit": "liters", "expiration_date": "2025-04-06"}])
+        stats = llm_output.stats("receipt_item")
+        self.assertEqual((stats["direct"], stats["repaired"], stats["success_rate"]), (2, 2, 1.0))
+
+    def test_truncated_array_keeps_complete_items(self):
+        raw = '[{"name": "Milk", "quantity": 1}, {"name": "Eggs", "quantity": 12, "unit": "pc'
+        items = llm_output.parse(raw, llm_output.RECEIPT_ITEM)
+        self.assertEqual([item["name"] for item in items], ["Milk", "Eggs"])
+
+    def test_invalid_items_are_dropped(self):
+        items = llm_output.parse('[{"name": "Milk"}, {"quantity": 2}, "Bread"]', llm_output.RECEIPT_ITEM)
+        self.assertEqual(items, [{"name": "Milk", "quantity": 1, "unit": "", "expiration_date": None}])
+        self.assertEqual(llm_output.stats("receipt_item")["dropped"], 2)
+
+    def test_the_model_is_asked_again_only_as_a_last_resort(self):
+        reask = mock.Mock(return_value=ITEMS_JSON)
+        items = llm_output.parse_with_reask("I cannot read this receipt.", llm_output.RECEIPT_ITEM, reask)
+        self.assertEqual(items[0]["name"], "Milk")
+        self.assertIn("no JSON", reask.call_args.args[1])
+        llm_output.parse_with_reask(ITEMS_JSON, llm_output.RECEIPT_ITEM, reask)
+        self.assertEqual(reask.call_count, 1)
+
+        reask.return_value = "Still no."
+        with self.assertRaises(llm_output.ParseError):
+            llm_output.parse_with_reask("No.", llm_output.RECEIPT_ITEM, reask, attempts=1)
+        stats = llm_output.stats("receipt_item")
+        self.assertEqual((stats["reasked"], stats["direct"], stats["failed"]), (1, 1, 1))
+
+    def test_vision_answer_in_a_fence_is_parsed(self):
+        fenced = fake_completion(f"```json\n{ITEMS_JSON}\n```")
+        with mock.patch.object(llm_providers.get_provider().client.chat.completions, "create", return_value=fenced) as create:
+            items, _ = engines.OpenAIVisionEngine().extract(b"img", "image/jpeg", {})
+        self.assertEqual(items[0]["name"], "Milk")
+        self.assertEqual(create.call_count, 1)
+
+
+def fake_scan(delays, items_by_name):
+    """
+    A scan_image replacement that sleeps for `delays[filename]` seconds and returns canned items.
+    """
+    def scan_image(image_bytes, filename, use_cache=True):
+        time.sleep(delays.get(filename, 0))
+        if filename not in items_by_name:
+            raise RuntimeError("vision call failed")
+        return {"items": items_by_name[filename], "cached": False, "engine": "fake"}
+    return scan_image
+
+
+@override_settings(RECEIPT_BATCH={"MAX_IMAGES": 3, "CONCURRENCY": 4})
+class ScanBatchTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/receipts/scan_batch/"
+
+    def post(self, *files):
+        images = [SimpleUploadedFile(name, content, content_type="image/jpeg") for name, content in files]
+        return self.client.post(self.url, {"images": images}, format="multipart")
+
+    def test_images_are_scanned_concurrently_and_merged(self):
+        items = {
+            "a.jpg": [{"name": "Tomatoes", "quantity": 2, "unit": "pcs", "expiration_date": "2025-04-10"}],
+            "b.jpg": [
+                {"name": "tomato", "quantity": 3, "unit": "pieces", "expiration_date": "2025-04-08"},
+                {"name": "Milk", "quantity": 1, "unit": "l", "expiration_date": "2025-04-06"},
+            ],
+        }
+        with mock.patch.object(scanning, "scan_image", fake_scan({"a.jpg": 0.3, "b.jpg": 0.3}, items)):
+            response = self.post(("a.jpg", b"first"), ("b.jpg", b"second"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["status"] for result in response.data["results"]], ["succeeded", "succeeded"])
+        merged = {item["name"]: item for item in response.data["items"]}
+        self.assertEqual(merged["Tomatoes"]["quantity"], 5)
+        self.assertEqual(merged["Tomatoes"]["expiration_date"], "2025-04-08")
+        self.assertIn("Milk", merged)
+        timings = response.data["timings"]
+        self.assertLess(timings["wall_ms"], timings["sum_ms"])
+
+    def test_identical_images_are_scanned_once(self):
+        scan = mock.Mock(side_effect=fake_scan({}, {"a.jpg": [{"name": "Eggs", "quantity": 12, "unit": "pcs"}]}))
+        with mock.patch.object(scanning, "scan_image", scan):
+            response = self.post(("a.jpg", b"same"), ("copy.jpg", b"same"))
+
+        self.assertEqual(scan.call_count, 1)
+        duplicate = response.data["results"][1]
+        self.assertEqual((duplicate["status"], duplicate["duplicate_of"]), ("duplicate", 0))
+        self.assertEqual(response.data["items"][0]["quantity"], 12)
+
+    def test_failed_images_do_not_fail_the_batch(self):
+        with mock.patch.object(scanning, "scan_image", fake_scan({}, {"a.jpg": [{"name": "Eggs", "quantity": 6, "unit": "pcs"}]})):
+            response = self.post(("a.jpg", b"first"), ("broken.jpg", b"second"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        failed = response.data["results"][1]
+        self.assertEqual((failed["status"], failed["error"]), ("failed", "vision call failed"))
+        self.assertEqual(len(response.data["items"]), 1)
+
+    def test_batch_size_is_limited(self):
+        response = self.post(*[(f"{n}.jpg", bytes([n])) for n in range(4)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post().status_code, status.HTTP_400_BAD_REQUEST)
+
+
+SAMPLE_RECEIPT = """FRESH MART
+TEL 02 9999 9999
+12/04/2025 10:31
+MILK FULL CREAM 2L 3.49
+2 x WHITE BREAD 7.00 F
+BANANAS CAVENDISH
+0.442 kg @ $2.99/kg 1.32
+CHICKEN BREAST
+2 @ 5.00 10.00
+SUBTOTAL 21.81
+VISA 21.81
+"""
+
+
+class ReceiptParsingTests(SimpleTestCase):
+
+    def test_parses_quantities_units_and_multi_line_items(self):
+        parsed = parse_receipt_text(SAMPLE_RECEIPT)
+        items = {item["name"]: item for item in parsed["items"]}
+
+        self.assertEqual(set(items), {"Milk Full Cream", "White Bread", "Bananas Cavendish", "Chicken Breast"})
+        self.assertEqual((items["Milk Full Cream"]["quantity"], items["Milk Full Cream"]["unit"]), (2, "l"))
+        self.assertEqual(items["White Bread"]["quantity"], 2)
+        self.assertEqual((items["Bananas Cavendish"]["quantity"], items["Bananas Cavendish"]["unit"]), (0.442, "kg"))
+        self.assertEqual(items["Chicken Breast"]["price"], 10.00)
+        self.assertEqual(parsed["total"], 21.81)
+        self.assertGreaterEqual(parsed["confidence"], 0.95)
+
+    def test_n_for_price_quantity_lines(self):
+        parsed = parse_receipt_text("LIMES\n3 @ 2/1.00 1.50\nTOTAL 1.50")
+        self.assertEqual([(item["name"], item["quantity"], item["price"]) for item in parsed["items"]], [("Limes", 3, 1.50)])
+
+    def test_units_match_the_inventory_normalization(self):
+        parsed = parse_receipt_text("EGGS 12PK 6.00\nMUESLI 2 PACK 9.00\nJUICE 2LTR 4.00")
+        self.assertEqual([item["unit"] for item in parsed["items"]], ["pack", "pack", "l"])
+
+    def test_garbled_text_has_low_confidence(self):
+        parsed = parse_receipt_text("~~ ;;; 3.49\n#### 12.00\nTOTAL 99.99")
+        self.assertLess(parsed["confidence"], 0.5)
+
+
+class FakeEngine:
+
+    def __init__(self, name, confidence=1.0, error=None):
+        self.name = name
+        self.confidence = confidence
+        self.error = error
+        self.calls = 0
+
+    def is_available(self):
+        return True
+
+    def extract(self, image_bytes, mime_type, timings):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        timings[f"{self.name}.stage"] = 1.0
+        return [{"name": self.name}], self.confidence
+
+
+class ExtractionEngineTests(SimpleTestCase):
+
+    def test_confident_local_parse_skips_the_llm(self):
+        local, llm = FakeEngine("local", 0.9), FakeEngine("llm")
+        result = engines.extract_items(b"img", "image/jpeg", engines=[local, llm], threshold=0.8)
+        self.assertEqual(result.engine, "local")
+        self.assertEqual(llm.calls, 0)
+        self.assertIn("local.stage", result.timings)
+        self.assertIn("total", result.timings)
+
+    def test_low_confidence_falls_back_to_the_llm(self):
+        local, llm = FakeEngine("local", 0.3), FakeEngine("llm")
+        result = engines.extract_items(b"img", "image/jpeg", engines=[local, llm], threshold=0.8)
+        self.assertEqual(result.engine, "llm")
+        self.assertEqual([attempt["engine"] for attempt in result.attempts], ["local", "llm"])
+
+    def test_local_errors_fall_back_to_the_llm(self):
+        local, llm = FakeEngine("local", error=RuntimeError("tesseract crashed")), FakeEngine("llm")
+        result = engines.extract_items(b"img", "image/jpeg", engines=[local, llm], threshold=0.8)
+        self.assertEqual(result.engine, "llm")
+        self.assertIn("error", result.attempts[0])
+
+    @override_settings(RECEIPT_EXTRACTION={"ENGINES": [
+        ("receipts.engines.TesseractEngine", {"cmd": "/opt/tesseract/bin/tesseract"}),
+    ]})
+    def test_engines_are_built_once_per_configuration(self):
+        default_cmd = engines.pytesseract.pytesseract.tesseract_cmd
+        self.addCleanup(setattr, engines.pytesseract.pytesseract, "tesseract_cmd", default_cmd)
+        first = engines.get_engines()
+        self.assertEqual(engines.pytesseract.pytesseract.tesseract_cmd, "/opt/tesseract/bin/tesseract")
+        self.assertIs(engines.get_engines()[0], first[0])
+
+
+def receipt_photo(skew=0, orientation=None):
+    """
+    A large colour photo of a lined "receipt" on a dark table.
+    """
+    rng = random.Random(7)
+    paper = Image.new("RGB", (1200, 2800), (250, 250, 245))
+    draw = ImageDraw.Draw(paper)
+    for y in range(100, 2700, 60):
+        draw.rectangle((80, y, 80 + rng.randint(500, 1000), y + 20), fill=(20, 20, 20))
+    if skew:
+        paper = paper.rotate(skew, expand=True, fillcolor=(60, 50, 40))
+    photo = Image.new("RGB", (3024, 4032), (60, 50, 40))
+    photo.paste(paper, (800, 400))
+
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    photo.save(buffer, "JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+class ReceiptPreprocessingTests(SimpleTestCase):
+
+    def test_photo_is_cropped_grayscaled_and_downscaled(self):
+        raw = receipt_photo()
+        result = preprocess_image(raw, {"TARGET_DPI": 200, "RECEIPT_WIDTH_MM": 80})
+
+        self.assertLess(len(result.image_bytes), len(raw))
+        self.assertEqual(result.bytes_saved, len(raw) - len(result.image_bytes))
+        self.assertEqual(result.mime_type, "image/jpeg")
+        self.assertIn("crop", result.steps)
+        with Image.open(io.BytesIO(result.image_bytes)) as image:
+            self.assertEqual(image.mode, "L")
+            self.assertEqual(image.width, 630)
+            self.assertGreater(image.height, image.width)
+
+    def test_skewed_receipt_is_straightened(self):
+        result = preprocess_image(receipt_photo(skew=3))
+        angles = [float(step.split(":")[1]) for step in result.steps if step.startswith("deskew:")]
+        self.assertEqual(len(angles), 1)
+        self.assertAlmostEqual(angles[0], -3, delta=1)
+
+    def test_exif_orientation_is_applied(self):
+        result = preprocess_image(receipt_photo(orientation=6), {"CROP": False, "DESKEW": False})
+        self.assertIn("orient", result.steps)
+        with Image.open(io.BytesIO(result.image_bytes)) as image:
+            self.assertGreater(image.width, image.height)
+
+    def test_undecodable_upload_is_passed_through(self):
+        result = preprocess_image(b"not an image")
+        self.assertEqual(result.image_bytes, b"not an image")
+        self.assertEqual(result.bytes_saved, 0)
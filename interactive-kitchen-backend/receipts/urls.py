@@ -3,4 +3,10 @@ from . import views
 
 urlpatterns = [
     path('scan_receipt/', views.scan_receipt, name='scan_receipt'),
-]
\ No newline at end of file
+    path('scan_receipt/async/', views.scan_receipt_async, name='scan_receipt_async'),
+    path('scan_receipt/stream/', views.scan_receipt_stream, name='scan_receipt_stream'),
+    path('scan_batch/', views.scan_batch, name='scan_batch'),
+    path('scan_jobs/<uuid:job_id>/', views.scan_job_detail, name='scan_job_detail'),
+    path('scan_jobs/<uuid:job_id>/confirm/', views.confirm_scan, name='confirm_scan'),
+    path('scan_cache/stats/', views.scan_cache_stats, name='scan_cache_stats'),
+]
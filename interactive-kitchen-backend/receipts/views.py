@@ -1,48 +1,59 @@
-from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
-from openai import OpenAI
 from users.models import CustomUser
 from inventory.models import InventoryItem
-import os
+from inventory.ingestion import aingest_items, ingest_items
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import ValidationError
+from users.authentication import async_token_required
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from . import cache as scan_cache
+from . import jobs
+from .engines import RECEIPT_PROMPT_VERSION
+from .models import ScanJob
+from .scanning import ascan_image, get_batch_options, scan_batch as scan_batch_images, stream_scan
+from utils import llm_output
+from utils.request_utils import is_truthy
+from utils.sse import EventStreamRenderer, event_stream_response
+from .serializers import ScanJobSerializer
 import datetime
-import json
-import base64
-from mimetypes import guess_type
-import re
 
-api_key = os.getenv("OPENAI_API_KEY")
-openai = OpenAI(api_key=api_key)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
 def scan_receipt(request):
     '''
-    Handles the upload of a receipt image, processes it using an OpenAI model to extract grocery items, 
-    and saves the extracted items to the inventory.
+    Accepts the upload of a receipt image and queues it for extraction, returning a job id immediately
+    so the request does not hold a worker for the duration of the OCR / vision call.
+    Extraction tries local Tesseract OCR first and only calls the OpenAI vision model when the local parse
+    confidence is below RECEIPT_EXTRACTION['CONFIDENCE_THRESHOLD'] (see receipts/engines.py).
+    Results are cached by a hash of the image bytes and the prompt version, so re-uploading the same
+    receipt skips the queue and the vision call. Send `no_cache=true` to bypass the cache lookup and refresh the entry.
     Args: 
         request (HttpRequest): The HTTP request object containing the uploaded image file and user information.
     Returns:
         Response: 
-            - HTTP 201 Created: If the receipt is successfully processed and items are added to the inventory.
-              Returns a JSON response with the added items.
+            - HTTP 202 Accepted: The scan was queued. Returns the `job_id` and the `status_url` to poll
+              (see scan_job_detail). When the same image was scanned before, the job has already
+              succeeded with the cached items.
             - HTTP 400 Bad Request: If the image file is missing in the request.
               Returns a JSON response with an error message.
-            - HTTP 500 Internal Server Error: If an unexpected error occurs during processing.
+            - HTTP 500 Internal Server Error: If an unexpected error occurs while queueing.
               Returns a JSON response with the error message.
-    Raises:
-        json.JSONDecodeError: If the extracted JSON data from the OpenAI response cannot be parsed.
-        Exception: For any other unexpected errors during processing.
     Process:
         1. Validates that an image file is included in the request.
-        2. Reads and encodes the image file to Base64 format.
-        3. Sends the encoded image to the OpenAI Vision API with a prompt to extract grocery items.
-        4. Parses the JSON response from the OpenAI API to extract item details.
-        5. Saves the extracted items to the inventory database.
-        6. Returns a response with the added items or an appropriate error message.
+        2. Reads the image; if the same image was scanned before, records a succeeded ScanJob with the cached items.
+        3. Otherwise stores the upload as a ScanJob and wakes the scan workers.
+        4. A worker preprocesses the image (EXIF orientation, grayscale, crop, deskew, downscale), runs the
+           extraction engines, caches the items and records them on the job with its timing fields.
     Example cURL:
         curl -X POST http://127.0.0.1:8000/api/scan-receipt/ \
         -H "Authorization: Bearer <your_token>" \
@@ -54,66 +65,204 @@ def scan_receipt(request):
 
     image_file = request.FILES['image']
     user = request.user
+    use_cache = not is_truthy(request.data.get('no_cache', ''))
 
     try:
-        # Read and encode the image
+        # Read the image and serve a previous scan of the same bytes if we have one
         image_bytes = image_file.read()
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
-
-        # Get MIME type (e.g., image/jpeg)
-        mime_type = guess_type(image_file.name)[0] or 'image/jpeg'
-
-        # Send image to OpenAI Vision API with a prompt
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts grocery items from receipts."},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", 
-                         "text": 
-                         ''' 
-                         Extract grocery items in this image. select sensibly, 3 items that would expire within next 3 days. 2 items that would expire within next 7 days and remaining items that would expire after more than 7 days.
-                         Respond ONLY with a valid JSON array. Do NOT include any explanations, descriptions, markdown, or text outside the JSON. Return the response exactly in this format:
-                            [
-                            {"name": "<item_name - cleaned name>", "quantity": <quantity>, "unit": "<unit>", "expiration_date": "<YYYY-MM-DD - assume an expiration date starting 2025-04-03>"}
-                            ]
-                        '''},
-                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}}
-                    ]
-                }
-            ],
-            max_tokens=1000
-        )
-        raw_response = response.choices[0].message.content
-        # Extract JSON array from markdown block
-        match = re.search(r"```json\\s*(\\[.*?\\])\\s*```", raw_response, re.DOTALL)
-        if match:
-            json_data = match.group(1)
-        else:
-            # Fallback: try extracting JSON-looking part from whole response
-            json_data = raw_response.strip().split("```json")[-1].split("```")[0].strip()
-
-        try:
-            items = json.loads(json_data)
-        except json.JSONDecodeError as e:
-            print("Failed to parse cleaned JSON:")
-            print(json_data)
-            raise e
-
-        # added_items = []
-        # for item in items:
-        #     inv_item = InventoryItem.objects.create(
-        #         name=item["name"],
-        #         quantity=item["quantity"],
-        #         unit=item["unit"],
-        #         expiration_date=datetime.datetime.strptime(item["expiration_date"], "%Y-%m-%d").date() if item["expiration_date"] else None,
-        #         added_by=user
-        #     )
-        #     added_items.append({"id": inv_item.id, "name": inv_item.name})
-
-        return Response({"items": items}, status=status.HTTP_201_CREATED)
+        job = None
+        if use_cache and scan_cache.is_enabled():
+            cached_items = scan_cache.lookup(scan_cache.make_key(image_bytes, RECEIPT_PROMPT_VERSION))
+            if cached_items is not None:
+                # Recorded as an already succeeded job, so it is polled and confirmed like the others
+                job = jobs.record_cached(user, image_file.name, cached_items)
+        if job is None:
+            # Queue the scan; the workers in receipts/jobs.py run the extraction
+            job = jobs.enqueue(user, image_bytes, image_file.name, use_cache=use_cache)
+        return Response({
+            "job_id": str(job.id),
+            "status": job.status,
+            "status_url": reverse('scan_job_detail', args=[job.id], request=request),
+        }, status=status.HTTP_202_ACCEPTED)
 
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_POST
+@async_token_required
+async def scan_receipt_async(request):
+    '''
+    Async-native receipt scan. Instead of queueing a job, the view awaits the scan itself: preprocessing
+    runs in a worker thread and the vision call awaits the shared async OpenAI client, so under an ASGI
+    server one process can have many scans in flight without a thread per request.
+    Args:
+        request (HttpRequest): Multipart request with the `image` file, and optional flags `no_cache`,
+            `add_to_inventory` (save the items straight away) and `merge` (see INVENTORY_INGESTION).
+    Returns:
+        JsonResponse:
+            - HTTP 200 OK: `items`, `cached`, `engine`, `confidence`, `timings` and `preprocessing`.
+            - HTTP 201 Created: With `add_to_inventory`, the same plus the saved rows in `inventory`.
+            - HTTP 400 Bad Request: If the image is missing or an extracted item is invalid.
+            - HTTP 500 Internal Server Error: If extraction failed.
+    Example cURL:
+        curl -X POST http://127.0.0.1:8000/api/receipts/scan_receipt/async/ \
+        -H "Authorization: Token <your_token>" \
+        -F "image=@/path/to/your/receipt.jpg"
+    '''
+    if 'image' not in request.FILES:
+        return JsonResponse({"error": "Image file is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    image_file = request.FILES['image']
+    use_cache = not is_truthy(request.POST.get('no_cache', ''))
+    try:
+        result = await ascan_image(image_file.read(), image_file.name, use_cache=use_cache)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if not is_truthy(request.POST.get('add_to_inventory', '')):
+        return JsonResponse(result, status=status.HTTP_200_OK)
+
+    merge = request.POST.get('merge')
+    try:
+        serializer = await aingest_items(request.user, result['items'], merge=None if merge is None else is_truthy(merge))
+    except ValidationError as e:
+        return JsonResponse({"error": e.detail, "items": result['items']}, status=status.HTTP_400_BAD_REQUEST)
+    return JsonResponse({**result, "inventory": serializer.data}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def scan_receipt_stream(request):
+    '''
+    Scans a receipt image and streams the items back as Server-Sent Events while the vision model is
+    still generating, so the first item shows up long before the whole completion is done.
+    The scan runs in the request instead of the job queue.
+    Args:
+        request (HttpRequest): Multipart request with the `image` file and an optional `no_cache` flag.
+    Returns:
+        StreamingHttpResponse (text/event-stream):
+            - `item` events: one per extracted item, as soon as its JSON object is complete.
+            - `summary` event: all items, the engine, `cached` and the timings (`first_item`, `total`).
+            - `error` event: if extraction failed; items already sent stay valid.
+        Response:
+            - HTTP 400 Bad Request: If the image file is missing in the request.
+    Example cURL:
+        curl -N -X POST http://127.0.0.1:8000/api/receipts/scan_receipt/stream/ \
+        -H "Authorization: Token <your_token>" \
+        -F "image=@/path/to/your/receipt.jpg"
+    '''
+    if 'image' not in request.FILES:
+        return Response({"error": "Image file is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    image_file = request.FILES['image']
+    use_cache = not is_truthy(request.data.get('no_cache', ''))
+    return event_stream_response(stream_scan(image_file.read(), image_file.name, use_cache=use_cache))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def scan_batch(request):
+    '''
+    Scans several receipt images in one request. The images are processed concurrently (bounded by
+    RECEIPT_BATCH['CONCURRENCY']), so the wall time is close to the slowest single image.
+    Args:
+        request (HttpRequest): Multipart request with one or more `images` files and an optional `no_cache` flag.
+    Returns:
+        Response:
+            - HTTP 200 OK: `results` per image (in upload order), the merged and de-duplicated `items`
+              across all receipts, and `timings` (wall_ms, slowest_ms, sum_ms).
+            - HTTP 400 Bad Request: If no images, or more than RECEIPT_BATCH['MAX_IMAGES'], were uploaded.
+    Example cURL:
+        curl -X POST http://127.0.0.1:8000/api/receipts/scan_batch/ \
+        -H "Authorization: Token <your_token>" \
+        -F "images=@/path/to/receipt1.jpg" \
+        -F "images=@/path/to/receipt2.jpg"
+    '''
+    image_files = request.FILES.getlist('images')
+    if not image_files:
+        return Response({"error": "At least one file in 'images' is required."}, status=status.HTTP_400_BAD_REQUEST)
+    max_images = get_batch_options()['MAX_IMAGES']
+    if len(image_files) > max_images:
+        return Response({"error": f"At most {max_images} images can be scanned at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+    use_cache = not is_truthy(request.data.get('no_cache', ''))
+    images = [(image_file.name, image_file.read()) for image_file in image_files]
+    return Response(scan_batch_images(images, use_cache=use_cache), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def scan_job_detail(request, job_id):
+    '''
+    Returns the status of a queued receipt scan, and the extracted items once it has succeeded.
+    Args:
+        request (HttpRequest): The HTTP request object.
+        job_id (UUID): The id returned by the scan_receipt endpoint.
+    Returns:
+        Response:
+            - HTTP 200 OK: The job status, timing fields, and `items`/`result` when finished.
+            - HTTP 404 Not Found: If the job does not exist or belongs to another user.
+    Example cURL:
+        curl http://127.0.0.1:8000/api/receipts/scan_jobs/<job_id>/ \
+        -H "Authorization: Token <your_token>"
+    '''
+    job = ScanJob.objects.defer('image').filter(id=job_id, user=request.user).first()
+    if job is None:
+        return Response({"error": "Scan job not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ScanJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirm_scan(request, job_id):
+    '''
+    Adds the items of a finished scan to the user's inventory, once.
+    Args:
+        request (HttpRequest): JSON body with an optional `items` list, the items as reviewed by the user.
+            Without it the items extracted by the scan are added as they are. `merge` overrides
+            INVENTORY_INGESTION['MERGE'] (merge into existing rows instead of adding new ones).
+        job_id (UUID): The id returned by the scan_receipt endpoint.
+    Returns:
+        Response:
+            - HTTP 201 Created: The created inventory items.
+            - HTTP 400 Bad Request: If an item is invalid; nothing is added.
+            - HTTP 404 Not Found: If the job does not exist or belongs to another user.
+            - HTTP 409 Conflict: If the scan has not succeeded or was already confirmed.
+    Example cURL:
+        curl -X POST http://127.0.0.1:8000/api/receipts/scan_jobs/<job_id>/confirm/ \
+        -H "Authorization: Token <your_token>" \
+        -H "Content-Type: application/json" \
+        -d '{"items": [{"name": "Milk", "quantity": 1, "unit": "l", "expiration_date": "2025-04-06"}]}'
+    '''
+    job = ScanJob.objects.defer('image').filter(id=job_id, user=request.user).first()
+    if job is None:
+        return Response({"error": "Scan job not found."}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != ScanJob.SUCCEEDED:
+        return Response({"error": f"Scan job is {job.status}."}, status=status.HTTP_409_CONFLICT)
+
+    items = request.data.get('items') if isinstance(request.data, dict) else None
+    if items is None:
+        items = job.result.get('items', [])
+
+    with transaction.atomic():
+        # Claim the confirmation first so two concurrent requests cannot both add the items
+        claimed = ScanJob.objects.filter(id=job.id, confirmed_at__isnull=True).update(confirmed_at=timezone.now())
+        if not claimed:
+            return Response({"error": "Scan job was already confirmed."}, status=status.HTTP_409_CONFLICT)
+        merge = request.data.get('merge') if isinstance(request.data, dict) else None
+        serializer = ingest_items(request.user, items, merge=None if merge is None else is_truthy(merge))
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def scan_cache_stats(request):
+    '''
+    Returns the receipt scan cache hit/miss counters of this process and the number of stored entries,
+    plus the parse outcomes of the vision model's answers under "parsing" (see utils/llm_output.py).
+    '''
+    return Response(dict(scan_cache.stats(), parsing=llm_output.stats(llm_output.RECEIPT_ITEM.name)), status=status.HTTP_200_OK)
@@ -1,3 +1,15 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import Recipe, RecipeCacheEntry
+
+@admin.register(RecipeCacheEntry)
+class RecipeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'key', 'hit_count', 'created_at', 'last_accessed_at')
+
+
+@admin.register(Recipe)
+class RecipeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'cuisine', 'spicy_level', 'cooking_time', 'updated_at')
+    list_filter = ('cuisine', 'spicy_level')
+    search_fields = ('name',)
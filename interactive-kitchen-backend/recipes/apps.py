@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from inventory.signals import inventory_changed
+        from . import cache
+        inventory_changed.connect(cache.on_inventory_changed, dispatch_uid='recipes.cache.invalidate')
@@ -0,0 +1,217 @@
+"""
+Cache for recipe suggestions.
+
+Entries are keyed per user by a canonical fingerprint of the request: the ingredient names
+and units in normalized form, sorted, with quantities and expiration dates reduced to
+coarse buckets, plus the cuisine, spicy level, cooking time and prompt version. Requests that
+would send the model an equivalent pantry get the stored suggestions back without a call.
+
+A user's entries are dropped when their inventory changes (`inventory_changed` signal).
+Expired entries and the least recently used entries beyond the size limit are evicted
+whenever a new result is stored.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import math
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from inventory.normalization import normalize_name, normalize_unit
+
+from .models import RecipeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+# Upper bounds (in days) of the expiry buckets; later dates fall in the last bucket
+EXPIRY_BUCKETS = (0, 2, 7, 30)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+
+def _config():
+    return getattr(settings, 'RECIPE_CACHE', {})
+
+
+def is_enabled():
+    return _config().get('ENABLED', True)
+
+
+def _ttl():
+    return timedelta(seconds=_config().get('TTL', DEFAULT_TTL_SECONDS))
+
+
+def _max_entries():
+    return _config().get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def quantity_bucket(quantity):
+    """
+    Half-octave buckets: 1 and 1.2 match, 1 and 2 do not. Unknown quantities are -1.
+    """
+    try:
+        quantity = float(quantity)
+    except (TypeError, ValueError):
+        return -1
+    if quantity <= 0:
+        return 0
+    return math.floor(math.log2(quantity) * 2)
+
+
+def expiry_bucket(expiration_date, today):
+    """
+    Index of the EXPIRY_BUCKETS range the days until expiry fall in; -1 without a date.
+    """
+    if not expiration_date:
+        return -1
+    if isinstance(expiration_date, str):
+        try:
+            expiration_date = datetime.date.fromisoformat(expiration_date[:10])
+        except ValueError:
+            return -1
+    days = (expiration_date - today).days
+    for index, limit in enumerate(EXPIRY_BUCKETS):
+        if days <= limit:
+            return index
+    return len(EXPIRY_BUCKETS)
+
+
+def _preference(value):
+    return ' '.join(str(value).lower().split())
+
+
+def fingerprint(ingredients, cuisine, spicy_level, cooking_time, prompt_version, today=None):
+    """
+    Canonical, JSON-serializable form of a suggestion request.
+    """
+    today = today or timezone.localdate()
+    canonical = sorted(
+        (
+            normalize_name(item.get('name')),
+            normalize_unit(item.get('unit')),
+            quantity_bucket(item.get('quantity')),
+            expiry_bucket(item.get('expiration_date'), today),
+        )
+        for item in (entry if isinstance(entry, dict) else {'name': str(entry)} for entry in ingredients)
+    )
+    return {
+        "ingredients": [list(item) for item in canonical],
+        "cuisine": _preference(cuisine),
+        "spicy_level": _preference(spicy_level),
+        "cooking_time": _preference(cooking_time),
+        "prompt_version": str(prompt_version),
+    }
+
+
+def make_key(fingerprint):
+    encoded = json.dumps(fingerprint, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def lookup(user, key):
+    """
+    Return the cached recipes for the user and `key`, or None on a miss or an expired entry.
+    """
+    now = timezone.now()
+    recipes = (
+        RecipeCacheEntry.objects
+        .filter(user=user, key=key, created_at__gte=now - _ttl())
+        .values_list('recipes', flat=True)
+        .first()
+    )
+    if recipes is None:
+        _count('misses')
+        return None
+
+    RecipeCacheEntry.objects.filter(user=user, key=key).update(hit_count=F('hit_count') + 1, last_accessed_at=now)
+    _count('hits')
+    return recipes
+
+
+def store(user, key, fingerprint, recipes):
+    """
+    Store the generated recipes and evict expired or excess entries.
+    """
+    now = timezone.now()
+    RecipeCacheEntry.objects.update_or_create(
+        user=user,
+        key=key,
+        defaults={
+            'fingerprint': fingerprint,
+            'recipes': recipes,
+            'hit_count': 0,
+            'created_at': now,
+            'last_accessed_at': now,
+        },
+    )
+    _count('stores')
+    evict()
+
+
+def invalidate(user_id):
+    """
+    Drop every cached suggestion of a user. Returns the number of deleted entries.
+    """
+    deleted, _ = RecipeCacheEntry.objects.filter(user_id=user_id).delete()
+    if deleted:
+        _count('invalidations', deleted)
+    return deleted
+
+
+def evict():
+    """
+    Delete expired entries, then the least recently used ones beyond MAX_ENTRIES.
+    Returns the number of deleted entries.
+    """
+    deleted, _ = RecipeCacheEntry.objects.filter(created_at__lt=timezone.now() - _ttl()).delete()
+
+    excess_ids = list(
+        RecipeCacheEntry.objects
+        .order_by('-last_accessed_at', '-id')
+        .values_list('id', flat=True)[_max_entries():]
+    )
+    if excess_ids:
+        excess_deleted, _ = RecipeCacheEntry.objects.filter(id__in=excess_ids).delete()
+        deleted += excess_deleted
+
+    if deleted:
+        _count('evictions', deleted)
+        logger.info(f"Evicted {deleted} recipe cache entries")
+    return deleted
+
+
+def on_inventory_changed(sender, user_id, **kwargs):
+    if user_id is not None:
+        invalidate(user_id)
+
+
+def stats():
+    """
+    Return the counters of this process together with the current entry count.
+    """
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_rate'] = snapshot['hits'] / lookups if lookups else 0.0
+    snapshot['entries'] = RecipeCacheEntry.objects.count()
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,43 @@
+"""
+Loading the bundled recipe collection (recipes/data/recipes.json) into the Recipe table.
+"""
+import json
+from pathlib import Path
+
+from django.utils import timezone
+
+DATASET_PATH = Path(__file__).resolve().parent / 'data' / 'recipes.json'
+
+FIELDS = ('cuisine', 'spicy_level', 'cooking_time', 'overview', 'instructions', 'ingredients')
+
+
+def read_dataset(path=None):
+    with open(path or DATASET_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_recipes(Recipe, records):
+    """
+    Insert or update `records` by name, with one query per batch rather than per recipe.
+    `Recipe` is passed in so data migrations can use their historical model.
+    Returns (created, updated).
+    """
+    existing = {recipe.name: recipe for recipe in Recipe.objects.filter(name__in=[r['name'] for r in records])}
+    to_create, to_update = [], []
+    for record in records:
+        values = {field: record.get(field, '') for field in FIELDS}
+        recipe = existing.get(record['name'])
+        if recipe is None:
+            to_create.append(Recipe(name=record['name'], **values))
+            continue
+        for field, value in values.items():
+            setattr(recipe, field, value)
+        to_update.append(recipe)
+    Recipe.objects.bulk_create(to_create, batch_size=100)
+    # bulk_update skips auto_now, so bump updated_at explicitly for the matcher's index check
+    if to_update:
+        now = timezone.now()
+        for recipe in to_update:
+            recipe.updated_at = now
+        Recipe.objects.bulk_update(to_update, FIELDS + ('updated_at',), batch_size=100)
+    return len(to_create), len(to_update)
@@ -0,0 +1,173 @@
+import asyncio
+import io
+import json
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from inventory.models import InventoryItem
+from inventory.normalization import normalize_name
+from users.models import CustomUser
+from utils import llm_providers
+
+PANTRY = [
+    ("Eggs", 12, "pcs"), ("Spinach", 1, "bag"), ("Milk", 1, "l"), ("Tomatoes", 4, "pcs"),
+    ("Pasta", 500, "g"), ("Garlic", 1, "pcs"), ("Chicken Breast", 400, "g"), ("Rice", 1, "kg"),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and latency of our LLM code paths against the in-process fake provider "
+        "(no API key or network needed)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['suggest', 'suggest-async', 'scan'], default='suggest')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--latency-ms', type=float, default=800, help="Median latency of the fake provider.")
+        parser.add_argument('--distribution', choices=['constant', 'uniform', 'lognormal'], default='lognormal')
+        parser.add_argument('--sigma', type=float, default=0.5, help="Spread of the lognormal distribution.")
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--body', default='{}', help="Extra JSON fields for suggest requests, e.g. '{\"fanout\": 3}'.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON (for CI).")
+
+    def handle(self, *args, **options):
+        median = options['latency_ms']
+        latency = {
+            'constant': {'DISTRIBUTION': 'constant', 'MS': median},
+            'uniform': {'DISTRIBUTION': 'uniform', 'LOW_MS': median / 2, 'HIGH_MS': median * 1.5},
+            'lognormal': {'DISTRIBUTION': 'lognormal', 'MEDIAN_MS': median, 'SIGMA': options['sigma']},
+        }[options['distribution']]
+        fake = {
+            'BACKEND': 'fake',
+            'FAKE_LATENCY': latency,
+            'FAKE_ERROR_RATE': options['error_rate'],
+            'FAKE_SEED': options['seed'],
+        }
+        # Caches would turn most requests into lookups; measure the full path
+        with override_settings(LLM_PROVIDER=fake, RECIPE_CACHE={'ENABLED': False},
+                               RECEIPT_SCAN_CACHE={'ENABLED': False}, ALLOWED_HOSTS=['testserver']):
+            user = CustomUser.objects.create_user(
+                username=f"benchmark-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex}@benchmark.invalid"
+            )
+            try:
+                InventoryItem.objects.bulk_create(
+                    InventoryItem(name=name, normalized_name=normalize_name(name), quantity=quantity, unit=unit, added_by=user)
+                    for name, quantity, unit in PANTRY
+                )
+                token = Token.objects.create(user=user).key
+                runner = {
+                    'suggest': self.run_suggest,
+                    'suggest-async': self.run_suggest_async,
+                    'scan': self.run_scan,
+                }[options['target']]
+                started = time.perf_counter()
+                samples = runner(token, options)
+                wall = time.perf_counter() - started
+            finally:
+                user.delete()
+            report = self.report(options, samples, wall, llm_providers.get_provider().calls)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['target']}: {report['requests']} requests, concurrency {report['concurrency']}, "
+            f"{report['errors']} errors, {report['throughput']} req/s, {report['provider_calls']} provider calls"
+        ))
+        self.stdout.write(
+            f"latency ms  p50 {report['p50_ms']}  p90 {report['p90_ms']}  p99 {report['p99_ms']}  max {report['max_ms']}"
+            f"  (provider median {median})"
+        )
+
+    def report(self, options, samples, wall, provider_calls):
+        latencies = [ms for ms, ok in samples if ok]
+        return {
+            "target": options['target'],
+            "requests": len(samples),
+            "concurrency": options['concurrency'],
+            "errors": sum(not ok for _, ok in samples),
+            "wall_s": round(wall, 3),
+            "throughput": round(len(samples) / wall, 1) if wall else None,
+            "provider_calls": provider_calls,
+            "mean_ms": round(statistics.fmean(latencies), 1) if latencies else None,
+            **{f"p{pct}_ms": percentile(latencies, pct) for pct in (50, 90, 99)},
+            "max_ms": max(latencies) if latencies else None,
+        }
+
+    def timed(self, call):
+        start = time.perf_counter()
+        try:
+            ok = call()
+        except Exception as e:
+            self.stderr.write(f"Request failed: {e}")
+            ok = False
+        return round((time.perf_counter() - start) * 1000, 1), ok
+
+    def run_threads(self, options, call):
+        def one(_):
+            try:
+                return self.timed(call)
+            finally:
+                close_old_connections()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            return list(pool.map(one, range(options['requests'])))
+
+    def run_suggest(self, token, options):
+        body = json.loads(options['body'])
+
+        def call():
+            response = Client().post('/api/recipe/suggest/', body, content_type='application/json',
+                                     HTTP_AUTHORIZATION=f"Token {token}")
+            return response.status_code == 200
+        return self.run_threads(options, call)
+
+    def run_suggest_async(self, token, options):
+        body = json.loads(options['body'])
+
+        async def main():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def one():
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post('/api/recipe/suggest/async/', body, content_type='application/json',
+                                                     headers={"Authorization": f"Token {token}"})
+                        ok = response.status_code == 200
+                    except Exception as e:
+                        self.stderr.write(f"Request failed: {e}")
+                        ok = False
+                    return round((time.perf_counter() - start) * 1000, 1), ok
+            return await asyncio.gather(*(one() for _ in range(options['requests'])))
+        return asyncio.run(main())
+
+    def run_scan(self, token, options):
+        from receipts.scanning import scan_image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 900), 'white').save(buffer, format='PNG')
+        image_bytes = buffer.getvalue()
+
+        def call():
+            return bool(scan_image(image_bytes, 'receipt.png', use_cache=False)['items'])
+        return self.run_threads(options, call)
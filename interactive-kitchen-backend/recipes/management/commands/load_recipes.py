@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from recipes.dataset import DATASET_PATH, load_recipes, read_dataset
+from recipes.models import Recipe
+
+class Command(BaseCommand):
+    help = "Load or refresh the recipe collection used by the local matcher from a JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DATASET_PATH), help="JSON file (defaults to the bundled recipes/data/recipes.json).")
+
+    def handle(self, *args, **options):
+        created, updated = load_recipes(Recipe, read_dataset(options['path']))
+        self.stdout.write(self.style.SUCCESS(f"Loaded recipes: {created} created, {updated} updated"))
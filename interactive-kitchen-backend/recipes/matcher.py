@@ -0,0 +1,230 @@
+"""
+Offline recipe matching over the bundled collection (the Recipe table).
+
+The index is built once per process and kept in memory:
+- every distinct required ingredient (normalized, see inventory/normalization.py) gets a bit;
+- each recipe is the bitset of its required ingredients;
+- the inverted index maps each ingredient bit to the bitset of recipes that need it, and each
+  cuisine to the bitset of its recipes.
+
+A pantry becomes two bitsets: everything on hand and what expires within `URGENT_DAYS`.
+Candidate recipes are the OR of the pantry's postings (recipes sharing at least one
+ingredient), ANDed with the cuisine's bitset. Each candidate is then scored with popcounts:
+
+    coverage = |recipe & pantry| / |recipe|
+    score    = coverage + URGENCY_WEIGHT * |recipe & urgent| / |recipe|
+
+so recipes that use up what is about to expire rank higher among equally covered ones. Python
+ints are arbitrary-precision bitsets, so AND/OR/popcount run in C over whole machine words.
+
+The index is rebuilt when the table changes: the count and latest `updated_at` of the
+recipes are checked with one aggregate query per lookup.
+"""
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from inventory.normalization import normalize_name
+from .models import Recipe
+from .utils.prompt_builder import merge_ingredients
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'DEFAULT_ENGINE': 'gpt',
+    'TOP_K': 3,
+    'MIN_COVERAGE': 0.5,
+    'URGENT_DAYS': 3,
+    'URGENCY_WEIGHT': 0.5,
+    'PREFILTER_K': 5,
+}
+
+ENGINES = ('gpt', 'local', 'hybrid')
+
+RECIPE_FIELDS = ('id', 'name', 'cuisine', 'spicy_level', 'cooking_time', 'overview', 'instructions', 'ingredients')
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RECIPE_MATCHER', {}))
+    return options
+
+
+def _iter_bits(bits):
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def parse_minutes(cooking_time):
+    """
+    The number of minutes in a cooking time preference ("30", "45 minutes", 20), or None for "any".
+    """
+    if isinstance(cooking_time, (int, float)):
+        return int(cooking_time)
+    match = re.search(r'\d+', str(cooking_time or ''))
+    return int(match.group()) if match else None
+
+
+class RecipeIndex:
+    """
+    Bitset index over a list of recipe dicts (see RECIPE_FIELDS).
+    """
+
+    def __init__(self, recipes, stamp=None):
+        self.recipes = recipes
+        self.stamp = stamp
+        self.vocabulary = {}
+        self.postings = []
+        self.masks = []
+        self.sizes = []
+        self.cuisines = {}
+        for position, recipe in enumerate(recipes):
+            mask = 0
+            for ingredient in recipe['ingredients']:
+                if ingredient.get('optional'):
+                    continue
+                name = normalize_name(ingredient['name'])
+                if name not in self.vocabulary:
+                    self.vocabulary[name] = len(self.postings)
+                    self.postings.append(0)
+                bit = self.vocabulary[name]
+                mask |= 1 << bit
+                self.postings[bit] |= 1 << position
+            self.masks.append(mask)
+            self.sizes.append(mask.bit_count())
+            cuisine = recipe['cuisine'].strip().lower()
+            self.cuisines[cuisine] = self.cuisines.get(cuisine, 0) | 1 << position
+        self.all_recipes = (1 << len(recipes)) - 1
+
+    def lookup(self, name):
+        """
+        The bit of a pantry item: its normalized name, or else its longest known trailing
+        phrase ("fresh baby spinach" -> "spinach"). None when the ingredient is unknown.
+        """
+        words = normalize_name(name).split()
+        for start in range(len(words)):
+            bit = self.vocabulary.get(' '.join(words[start:]))
+            if bit is not None:
+                return bit
+        return None
+
+    def search(self, pantry, cuisine='any', cooking_time='any', k=3, min_coverage=0.0,
+               urgent_days=3, urgency_weight=0.5, today=None):
+        """
+        Score the recipes for `pantry` (ingredient dicts or names) and return the best `k` as
+        (score, coverage, position, found) tuples, where `found` maps bits to pantry items.
+        """
+        today = today or timezone.localdate()
+        found = {}
+        for item in merge_ingredients(pantry):
+            bit = self.lookup(item['name'])
+            if bit is None:
+                continue
+            previous = found.get(bit)
+            if previous is None or (item['expiration_date'] and (
+                    previous['expiration_date'] is None or item['expiration_date'] < previous['expiration_date'])):
+                found[bit] = item
+
+        on_hand = urgent = candidates = 0
+        for bit, item in found.items():
+            on_hand |= 1 << bit
+            candidates |= self.postings[bit]
+            if item['expiration_date'] is not None and (item['expiration_date'] - today).days <= urgent_days:
+                urgent |= 1 << bit
+
+        if cuisine and str(cuisine).strip().lower() != 'any':
+            candidates &= self.cuisines.get(str(cuisine).strip().lower(), 0)
+        max_minutes = parse_minutes(cooking_time)
+
+        scored = []
+        for position in _iter_bits(candidates):
+            if max_minutes is not None and self.recipes[position]['cooking_time'] > max_minutes:
+                continue
+            mask, size = self.masks[position], self.sizes[position]
+            coverage = (mask & on_hand).bit_count() / size
+            if coverage < min_coverage:
+                continue
+            score = coverage + urgency_weight * (mask & urgent).bit_count() / size
+            scored.append((score, coverage, position))
+        scored.sort(key=lambda entry: (-entry[0], -entry[1], self.recipes[entry[2]]['cooking_time']))
+        return [(score, coverage, position, found) for score, coverage, position in scored[:k]]
+
+    def render(self, match):
+        """
+        A match in the same shape as the model's suggestions, plus a `match` summary.
+        """
+        score, coverage, position, found = match
+        recipe = self.recipes[position]
+        ingredients, missing = [], []
+        for ingredient in recipe['ingredients']:
+            bit = self.vocabulary.get(normalize_name(ingredient['name']))
+            item = found.get(bit) if bit is not None else None
+            ingredients.append({
+                "name": ingredient['name'],
+                "quantity": ingredient.get('quantity'),
+                "unit": ingredient.get('unit', ''),
+                "expiration_date": item['expiration_date'] if item else None,
+                "optional": bool(ingredient.get('optional')),
+                "available": item is not None,
+            })
+            if item is None and not ingredient.get('optional'):
+                missing.append(ingredient['name'])
+        return {
+            "recipe": recipe['name'],
+            "ingredients": ingredients,
+            "cuisine": recipe['cuisine'],
+            "spicy_level": recipe['spicy_level'],
+            "cooking_time": recipe['cooking_time'],
+            "overview": recipe['overview'],
+            "instructions": recipe['instructions'],
+            "match": {"score": round(score, 3), "coverage": round(coverage, 3), "missing": missing},
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _stamp():
+    summary = Recipe.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return summary['count'], summary['updated']
+
+
+def get_index():
+    """
+    Return the process-wide index, rebuilding it when the Recipe table has changed.
+    """
+    global _index
+    stamp = _stamp()
+    with _index_lock:
+        if _index is None or _index.stamp != stamp:
+            _index = RecipeIndex(list(Recipe.objects.order_by('id').values(*RECIPE_FIELDS)), stamp)
+            logger.info(f"Built recipe index: {len(_index.recipes)} recipes, {len(_index.vocabulary)} ingredients")
+        return _index
+
+
+def suggest(ingredients, cuisine='any', spicy_level='any', cooking_time='any', k=None, min_coverage=None, today=None):
+    """
+    The top `k` recipes from the collection for `ingredients`, best first, in the same shape
+    as the model's suggestions. `spicy_level` is accepted for symmetry but does not filter:
+    the collection's levels are only approximate.
+    """
+    options = get_options()
+    index = get_index()
+    matches = index.search(
+        ingredients,
+        cuisine=cuisine,
+        cooking_time=cooking_time,
+        k=options['TOP_K'] if k is None else k,
+        min_coverage=options['MIN_COVERAGE'] if min_coverage is None else min_coverage,
+        urgent_days=options['URGENT_DAYS'],
+        urgency_weight=options['URGENCY_WEIGHT'],
+        today=today,
+    )
+    return [index.render(match) for match in matches]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('cuisine', models.CharField(blank=True, max_length=50)),
+                ('spicy_level', models.CharField(blank=True, max_length=20)),
+                ('cooking_time', models.PositiveIntegerField(help_text='Minutes')),
+                ('overview', models.TextField(blank=True)),
+                ('instructions', models.TextField()),
+                ('ingredients', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
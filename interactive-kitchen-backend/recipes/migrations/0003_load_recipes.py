@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:12
+
+from django.db import migrations
+
+from recipes.dataset import load_recipes, read_dataset
+
+
+def load_bundled_recipes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    load_recipes(Recipe, read_dataset())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_bundled_recipes, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,43 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class RecipeCacheEntry(models.Model):
+    """
+    Recipe suggestions for one user, keyed by a fingerprint of the ingredients and preferences
+    they were generated for (see recipes/cache.py).
+    """
+    user = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, related_name='recipe_cache_entries')
+    key = models.CharField(max_length=64)
+    fingerprint = models.JSONField(default=dict)
+    recipes = models.JSONField(default=list)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='recipecache_user_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key[:12]} ({self.hit_count} hits)"
+
+
+class Recipe(models.Model):
+    """
+    A recipe from the bundled collection (recipes/data/recipes.json), served by the local
+    matcher in recipes/matcher.py. `ingredients` holds `{"name", "quantity", "unit"}` objects;
+    ingredients flagged `"optional": true` are not required for a match.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    cuisine = models.CharField(max_length=50, blank=True)
+    spicy_level = models.CharField(max_length=20, blank=True)
+    cooking_time = models.PositiveIntegerField(help_text="Minutes")
+    overview = models.TextField(blank=True)
+    instructions = models.TextField()
+    ingredients = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
@@ -1,7 +1,7 @@
 from rest_framework import serializers
-from .models import RecipeItem
+from .models import Recipe
 
-class RecipeItemSerializer(serializers.ModelSerializer):
+class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
-        model = RecipeItem
+        model = Recipe
         fields = '__all__'
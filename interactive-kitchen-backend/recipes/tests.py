@@ -1,3 +1,452 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+from users.models import CustomUser
+from inventory.models import InventoryItem
+from utils import async_runtime, llm_providers
+from recipes import cache as recipe_cache
+from recipes import matcher
+from recipes.models import Recipe, RecipeCacheEntry
+from recipes.utils import prompt_builder
+import datetime
+
+# Tests run against the in-process provider so they need no API key; they patch its clients
+FAKE_PROVIDER = {"BACKEND": "fake", "FAKE_LATENCY": {"DISTRIBUTION": "constant", "MS": 0}}
+
+RECIPES = [{"recipe": "Omelette", "ingredients": [{"name": "Eggs", "quantity": 2, "unit": "pcs"}]}]
+
+
+def fake_completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def patch_completions(**kwargs):
+    """
+    Patch the pooled (fake provider) client used by gpt_utils; `create` is awaited on the runtime loop.
+    """
+    return mock.patch.object(async_runtime.get_runtime().llm.chat.completions, "create", new_callable=mock.AsyncMock, **kwargs)
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+class SuggestRecipeTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/recipe/suggest/"
+
+    def test_recipes_are_generated_from_the_inventory(self):
+        InventoryItem.objects.create(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+        with patch_completions(return_value=fake_completion(json.dumps(RECIPES))) as create:
+            response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"], RECIPES)
+        prompt = create.call_args.kwargs["messages"][1]["content"]
+        self.assertIn("Eggs", prompt)
+
+
+    def test_malformed_answers_are_repaired_before_asking_again(self):
+        InventoryItem.objects.create(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+        answer = 'Sure! [{"name": "Omelette", "cooking_time": "15 minutes", "instructions": ["Whisk", "Fry"],}]'
+        with patch_completions(return_value=fake_completion(answer)) as create:
+            response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"], [{"recipe": "Omelette", "cooking_time": 15, "instructions": "1. Whisk\n2. Fry"}])
+        self.assertEqual(create.await_count, 1)
+
+    def test_unusable_answers_are_a_bad_gateway(self):
+        InventoryItem.objects.create(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+        with patch_completions(return_value=fake_completion("I'm sorry, I can't help with that.")) as create:
+            response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(create.await_count, 2)
+        retry_messages = create.call_args.kwargs["messages"]
+        self.assertEqual(retry_messages[-2]["content"], "I'm sorry, I can't help with that.")
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+class RecipeCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/recipe/suggest/"
+        InventoryItem.objects.create(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+        recipe_cache.reset_stats()
+
+    def suggest(self, **data):
+        with patch_completions(return_value=fake_completion(json.dumps(RECIPES))) as create:
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, create.await_count
+
+    def test_unchanged_pantry_is_served_from_cache(self):
+        first, first_calls = self.suggest(cuisine="Italian")
+        second, second_calls = self.suggest(cuisine=" italian ")
+        self.assertEqual((first["cached"], first_calls), (False, 1))
+        self.assertEqual((second["cached"], second_calls), (True, 0))
+        self.assertEqual(second["recipe"], RECIPES)
+        stats = recipe_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_preferences_are_part_of_the_key(self):
+        self.suggest(cuisine="Italian")
+        _, calls = self.suggest(cuisine="Mexican")
+        self.assertEqual(calls, 1)
+
+    def test_regenerate_bypasses_the_cache(self):
+        self.suggest()
+        data, calls = self.suggest(regenerate=True)
+        self.assertEqual((data["cached"], calls), (False, 1))
+
+    def test_inventory_changes_invalidate_the_users_entries(self):
+        self.suggest()
+        self.client.post("/api/inventory/", [{"name": "Milk", "quantity": 1, "unit": "l"}], format="json")
+        self.assertEqual(RecipeCacheEntry.objects.count(), 0)
+        self.suggest()
+        self.client.delete(f"/api/inventory/{InventoryItem.objects.get(name='Milk').id}/")
+        self.assertEqual(RecipeCacheEntry.objects.count(), 0)
+        self.assertEqual(recipe_cache.stats()["invalidations"], 2)
+
+    def test_fingerprint_ignores_order_spelling_and_small_quantity_changes(self):
+        today = datetime.date(2025, 4, 1)
+        first = recipe_cache.fingerprint(
+            [{"name": "Tomatoes", "unit": "pieces", "quantity": 4, "expiration_date": "2025-04-02"},
+             {"name": "Milk", "unit": "l", "quantity": 1}], "Any", "medium", "any", "1", today)
+        second = recipe_cache.fingerprint(
+            [{"name": "milk", "unit": "liters", "quantity": 1.1},
+             {"name": "tomato", "unit": "pcs", "quantity": 5, "expiration_date": datetime.date(2025, 4, 3)}], "any", "Medium", "any", "1", today)
+        self.assertEqual(recipe_cache.make_key(first), recipe_cache.make_key(second))
+        later = recipe_cache.fingerprint(
+            [{"name": "tomato", "unit": "pcs", "quantity": 5, "expiration_date": "2025-04-20"},
+             {"name": "milk", "unit": "l", "quantity": 1}], "any", "medium", "any", "1", today)
+        self.assertNotEqual(recipe_cache.make_key(first), recipe_cache.make_key(later))
+
+    @override_settings(RECIPE_CACHE={"MAX_ENTRIES": 1})
+    def test_least_recently_used_entries_are_evicted(self):
+        recipe_cache.store(self.user, "a", {}, [])
+        recipe_cache.store(self.user, "b", {}, [])
+        self.assertEqual(list(RecipeCacheEntry.objects.values_list("key", flat=True)), ["b"])
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+class RecipeMatcherTests(TestCase):
+    today = datetime.date(2025, 4, 1)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/recipe/suggest/"
+
+    def index(self):
+        def recipe(name, cuisine, minutes, *ingredients):
+            return {"name": name, "cuisine": cuisine, "spicy_level": "low", "cooking_time": minutes, "overview": "",
+                    "instructions": "", "ingredients": [{"name": n, "quantity": 1, "unit": "pcs"} for n in ingredients]
+                    + [{"name": "salt", "quantity": 1, "unit": "pinch", "optional": True}]}
+        return matcher.RecipeIndex([
+            recipe("Omelette", "French", 10, "egg", "butter"),
+            recipe("Spinach Omelette", "French", 15, "egg", "spinach"),
+            recipe("Pasta", "Italian", 25, "pasta", "tomato", "garlic"),
+            recipe("Bolognese", "Italian", 60, "pasta", "tomato", "ground beef"),
+        ])
+
+    def names(self, index, pantry, **kwargs):
+        return [index.recipes[position]["name"] for _, _, position, _ in index.search(pantry, today=self.today, **kwargs)]
+
+    def test_bundled_collection_is_loaded(self):
+        self.assertEqual(Recipe.objects.count(), 40)
+        self.assertGreater(len(matcher.get_index().vocabulary), 50)
+
+    def test_recipes_rank_by_coverage_then_urgency(self):
+        index = self.index()
+        self.assertEqual(self.names(index, ["Eggs", "butter", "fresh baby spinach"], k=2), ["Omelette", "Spinach Omelette"])
+        urgent_spinach = ["Eggs", "butter", {"name": "spinach", "expiration_date": "2025-04-02"}]
+        self.assertEqual(self.names(index, urgent_spinach, k=2), ["Spinach Omelette", "Omelette"])
+        self.assertEqual(self.names(index, ["pasta"], min_coverage=0.5), [])
+
+    def test_cuisine_and_cooking_time_filter_candidates(self):
+        index = self.index()
+        pantry = ["egg", "pasta", "tomato"]
+        self.assertEqual(self.names(index, pantry, cuisine="italian", k=5), ["Pasta", "Bolognese"])
+        self.assertEqual(self.names(index, pantry, cuisine="Italian", cooking_time="30 minutes", k=5), ["Pasta"])
+
+    def test_index_is_rebuilt_when_recipes_change(self):
+        first = matcher.get_index()
+        self.assertIs(matcher.get_index(), first)
+        Recipe.objects.create(name="Toast", cooking_time=5, instructions="Toast it.", ingredients=[{"name": "bread"}])
+        self.assertEqual(len(matcher.get_index().recipes), len(first.recipes) + 1)
+
+    def test_local_engine_answers_without_the_model(self):
+        for name in ("Eggs", "Spinach", "Feta"):
+            InventoryItem.objects.create(name=name, quantity=1, unit="pcs", added_by=self.user,
+                                         expiration_date=datetime.date.today() + datetime.timedelta(days=1))
+        with patch_completions() as create:
+            response = self.client.post(self.url, {"engine": "local"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        create.assert_not_awaited()
+        self.assertEqual((response.data["engine"], response.data["cached"]), ("local", False))
+        best = response.data["recipe"][0]
+        self.assertEqual(best["recipe"], "Spinach and Feta Omelette")
+        self.assertEqual((best["match"]["coverage"], best["match"]["missing"]), (1.0, []))
+        self.assertEqual(RecipeCacheEntry.objects.count(), 0)
+
+    def test_hybrid_engine_lists_local_candidates_in_the_prompt(self):
+        for name in ("Pasta", "Tomatoes", "Garlic", "Basil"):
+            InventoryItem.objects.create(name=name, quantity=1, unit="pcs", added_by=self.user)
+        with patch_completions(return_value=fake_completion(json.dumps(RECIPES))) as create:
+            response = self.client.post(self.url, {"engine": "hybrid"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"], RECIPES)
+        prompt = create.call_args.kwargs["messages"][1]["content"]
+        self.assertIn("Recipes from our collection", prompt)
+        self.assertIn("- Tomato Basil Pasta", prompt)
+
+    def test_unknown_engine_is_rejected(self):
+        response = self.client.post(self.url, {"engine": "magic", "ingredients": ["egg"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER, RECIPE_FANOUT={"CALL_TIMEOUT": 0.5, "DEADLINE": 0.5})
+class RecipeFanoutTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/recipe/suggest/"
+        today = datetime.date.today()
+        for days, name in enumerate(("Eggs", "Milk", "Rice")):
+            InventoryItem.objects.create(name=name, quantity=1, unit="pcs", added_by=self.user,
+                                         expiration_date=today + datetime.timedelta(days=days + 1))
+
+    def completions(self, slow=()):
+        async def create(**kwargs):
+            prompt = kwargs["messages"][1]["content"]
+            focus = prompt.rsplit("Focus on a dish built around ", 1)[1].rstrip(".")
+            if focus in slow:
+                await asyncio.sleep(5)
+            return fake_completion(json.dumps([{"recipe": f"{focus} dish"}]))
+        return patch_completions(side_effect=create)
+
+    def test_calls_run_concurrently_with_their_own_focus(self):
+        with self.completions() as create:
+            response = self.client.post(self.url, {"fanout": True}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["recipe"] for r in response.data["recipe"]], ["Eggs dish", "Milk dish", "Rice dish"])
+        self.assertFalse(response.data["partial"])
+        self.assertEqual(create.await_count, 3)
+        self.assertEqual(create.call_args.kwargs["max_tokens"], 900)
+        self.assertIn("Suggest one recipe", create.call_args.kwargs["messages"][1]["content"])
+        self.assertEqual(RecipeCacheEntry.objects.count(), 1)
+
+    def test_deadline_returns_whatever_finished(self):
+        started = time.monotonic()
+        with self.completions(slow={"Milk"}):
+            response = self.client.post(self.url, {"fanout": 3}, format="json")
+
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["partial"])
+        self.assertEqual([r["recipe"] for r in response.data["recipe"]], ["Eggs dish", "Rice dish"])
+        calls = response.data["fanout"]["calls"]
+        self.assertEqual([c["status"] for c in calls], ["succeeded", "timed_out", "succeeded"])
+        self.assertGreaterEqual(calls[1]["latency_ms"], 400)
+        self.assertEqual(RecipeCacheEntry.objects.count(), 0)
+
+    def test_nothing_finished_is_a_gateway_timeout(self):
+        with self.completions(slow={"Eggs", "Milk"}):
+            response = self.client.post(self.url, {"fanout": 2}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+        self.assertEqual(len(response.data["fanout"]["calls"]), 2)
+
+    def test_focuses_prefer_candidates_then_urgent_ingredients(self):
+        focuses = prompt_builder.fanout_focuses(
+            [{"name": "rice"}, {"name": "milk", "expiration_date": "2025-04-02"}, {"name": "salt"}],
+            4, candidates=[{"recipe": "Rice Pudding"}], today=datetime.date(2025, 4, 1),
+        )
+        self.assertEqual(focuses, ['an adaptation of "Rice Pudding"', "a dish built around milk", "a dish built around rice", None])
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+class SuggestRecipeAsyncTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}"}
+        self.url = "/api/recipe/suggest/async/"
+
+    async def test_recipes_are_generated_from_the_inventory(self):
+        await InventoryItem.objects.acreate(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+        with patch_completions(return_value=fake_completion(json.dumps(RECIPES))) as create:
+            response = await self.async_client.post(self.url, {"cuisine": "French"}, content_type="application/json", headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["recipe"], RECIPES)
+        prompt = create.call_args.kwargs["messages"][1]["content"]
+        self.assertIn("Eggs", prompt)
+        self.assertIn("French", prompt)
+
+    async def test_empty_inventory_is_rejected(self):
+        response = await self.async_client.post(self.url, {}, content_type="application/json", headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_authentication_is_required(self):
+        response = await self.async_client.post(self.url, {}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+class AsyncRuntimeTests(SimpleTestCase):
+
+    def test_calls_share_one_loop_and_client(self):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        runtime = async_runtime.get_runtime()
+        self.assertIs(async_runtime.run(current_loop()), async_runtime.run(current_loop()))
+        self.assertIs(async_runtime.run(current_loop()), runtime.loop)
+        self.assertIs(runtime.llm, async_runtime.get_runtime().llm)
+
+    def test_coroutines_from_another_loop_run_on_the_runtime(self):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        async def caller():
+            return await async_runtime.run_async(current_loop())
+
+        self.assertIs(asyncio.run(caller()), async_runtime.get_runtime().loop)
+
+    @override_settings(OPENAI_CLIENT={"MAX_CONNECTIONS": 7, "MAX_KEEPALIVE_CONNECTIONS": 3, "READ_TIMEOUT": 12})
+    def test_pool_limits_and_timeouts_come_from_settings(self):
+        with mock.patch("utils.async_runtime.httpx.AsyncClient") as client_class:
+            async_runtime.build_http_client()
+        kwargs = client_class.call_args.kwargs
+        self.assertEqual((kwargs["limits"].max_connections, kwargs["limits"].max_keepalive_connections), (7, 3))
+        self.assertEqual(kwargs["timeout"].read, 12)
+
+
+class PromptBuilderTests(SimpleTestCase):
+    today = datetime.date(2025, 4, 1)
+
+    def build(self, ingredients, **kwargs):
+        return prompt_builder.build_prompt(ingredients, "Italian", "mild", "30 minutes", today=self.today, **kwargs)
+
+    def test_large_pantry_stays_within_budget(self):
+        pantry = [
+            {"name": f"item {i}", "quantity": i % 5 + 1, "unit": "pcs", "expiration_date": self.today + datetime.timedelta(days=i % 40)}
+            for i in range(300)
+        ]
+        small = self.build(pantry[:10], max_tokens=200)
+        large = self.build(pantry, max_tokens=200)
+        self.assertEqual((small.included, small.aggregated), (10, 0))
+        self.assertGreater(large.aggregated, 0)
+        self.assertEqual(large.included + large.aggregated, 300)
+        self.assertLess(large.tokens - small.tokens, 220)
+        legacy = prompt_builder.legacy_prompt(pantry, "Italian", "mild", "30 minutes")
+        self.assertLess(large.tokens, prompt_builder.count_tokens(legacy) / 5)
+        self.assertIn(" more", large.text)
+
+    def test_legacy_size_is_only_measured_for_debug_logging(self):
+        pantry = [{"name": "milk", "quantity": 1, "unit": "l"}]
+        self.assertIsNone(self.build(pantry).tokens_before)
+        with self.assertLogs(prompt_builder.logger, level="DEBUG"):
+            self.assertGreater(self.build(pantry).tokens_before, 0)
+
+    def test_most_urgent_items_come_first(self):
+        prompt = self.build([
+            {"name": "rice", "quantity": 1, "unit": "kg"},
+            {"name": "milk", "quantity": 2, "unit": "litres", "expiration_date": "2025-04-03"},
+            {"name": "spinach", "quantity": 1, "unit": "bag", "expiration_date": self.today},
+        ])
+        lines = prompt.text.split("Ingredients:\n")[1].splitlines()
+        self.assertEqual(lines, ["spinach 1 bag, 0d", "milk 2 l, 2d", "rice 1 kg"])
+
+    def test_duplicates_are_merged_and_staples_aggregated(self):
+        prompt = self.build([
+            {"name": "Tomatoes", "quantity": 2, "unit": "pcs", "expiration_date": "2025-04-05"},
+            {"name": "tomato", "quantity": 3, "unit": "pieces", "expiration_date": "2025-04-03"},
+            {"name": "Salt", "quantity": 1, "unit": "kg"},
+            "olive oil",
+        ])
+        self.assertIn("Tomatoes 5 pcs, 2d", prompt.text)
+        self.assertIn("Staples: Salt, olive oil", prompt.text)
+        self.assertEqual((prompt.included, len(prompt.staples)), (1, 2))
+
+    def test_overflow_falls_back_to_a_count(self):
+        pantry = [{"name": f"long ingredient name {i}", "quantity": 1} for i in range(20)]
+        prompt = self.build(pantry, max_tokens=0)
+        self.assertEqual(prompt.included, 0)
+        self.assertIn("20 more items not listed", prompt.text)
+
+
+class FakeProviderTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        InventoryItem.objects.create(name="Eggs", quantity=6, unit="pcs", added_by=self.user)
+
+    @override_settings(LLM_PROVIDER=FAKE_PROVIDER)
+    def test_suggestions_need_no_api_key(self):
+        with mock.patch.dict("os.environ", {"OPENAI_API_KEY": ""}):
+            response = self.client.post("/api/recipe/suggest/", {"use_cache": False}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"][0]["recipe"], "Spinach Omelette")
+        self.assertEqual(llm_providers.get_provider().calls, 1)
+
+    @override_settings(LLM_PROVIDER=dict(FAKE_PROVIDER, FAKE_ERROR_RATE=1.0))
+    def test_injected_errors_surface_as_api_errors(self):
+        provider = llm_providers.get_provider()
+        with self.assertRaises(llm_providers.openai.APIConnectionError):
+            provider.client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "hi"}])
+
+    def test_seeded_latencies_are_reproducible(self):
+        latency = {"DISTRIBUTION": "lognormal", "MEDIAN_MS": 800, "SIGMA": 0.5}
+        first, second = (llm_providers.FakeProvider(latency=latency, seed=7) for _ in range(2))
+        samples = [first.sample_latency() for _ in range(50)]
+        self.assertEqual(samples, [second.sample_latency() for _ in range(50)])
+        self.assertAlmostEqual(sorted(samples)[25], 0.8, delta=0.25)
+
+    def test_image_requests_get_receipt_answers(self):
+        provider = llm_providers.FakeProvider(latency={"DISTRIBUTION": "constant", "MS": 0})
+        image = [{"type": "image_url", "image_url": {"url": "data:image/png;base64,AA=="}}]
+        content, _ = provider.answer([{"role": "user", "content": image}])
+        self.assertEqual(json.loads(content), llm_providers.FAKE_RESPONSES["receipt"])
+        chunks = list(provider.client.chat.completions.create(messages=[{"role": "user", "content": "hi"}], stream=True))
+        self.assertEqual(json.loads("".join(c.choices[0].delta.content for c in chunks)), llm_providers.FAKE_RESPONSES["recipe"])
+
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    """
+    The benchmark serves requests from other threads, which need its data committed.
+    """
+
+    def test_benchmark_reports_latency_percentiles(self):
+        out = StringIO()
+        call_command("benchmark_llm", target="suggest-async", requests=6, concurrency=3, latency_ms=0,
+                     distribution="constant", json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report["requests"], report["errors"], report["provider_calls"]), (6, 0, 6))
+        self.assertIsNotNone(report["p99_ms"])
+        self.assertFalse(CustomUser.objects.filter(username__startswith="benchmark-").exists())
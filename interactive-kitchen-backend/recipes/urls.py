@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('suggest/', views.suggest_recipe, name='suggest_recipe'),
+    path('suggest/async/', views.suggest_recipe_async, name='suggest_recipe_async'),
+    path('cache/stats/', views.recipe_cache_stats, name='recipe_cache_stats'),
 ]
\ No newline at end of file
@@ -1,49 +1,135 @@
-import openai
 import asyncio
-import os
+import openai
 from dotenv import load_dotenv
 import logging
-import json
+import time
+from django.conf import settings
+from utils import async_runtime, llm_output, llm_providers
+from recipes.utils import prompt_builder
 load_dotenv()
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Load API Key
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Bump whenever the prompt or model changes so cached suggestions are not reused.
+RECIPE_PROMPT_VERSION = "2"
+
+FANOUT_DEFAULTS = {
+    'ENABLED': False,
+    'CALLS': 3,
+    'MAX_CALLS': 5,
+    'CALL_TIMEOUT': 20.0,
+    'DEADLINE': 25.0,
+    'MAX_TOKENS': 900,
+}
+
 
-if not OPENAI_API_KEY:
-    logger.error("OpenAI API Key not found. Ensure it's set in the environment variables.")
+def get_fanout_options():
+    options = dict(FANOUT_DEFAULTS)
+    options.update(getattr(settings, 'RECIPE_FANOUT', {}))
+    return options
 
-aclient = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+async def _complete(prompt_text, max_tokens=None):
+    """
+    Ask the model and parse its answer with the recipe schema (utils/llm_output.py); the model
+    is asked again only when the answer cannot be repaired locally.
+    """
+    aclient = async_runtime.get_runtime().llm
+    extra = {'max_tokens': max_tokens} if max_tokens else {}
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant specializing in recipe suggestions."},
+        {"role": "user", "content": prompt_text}
+    ]
+
+    async def create(messages):
+        response = await aclient.chat.completions.create(model="gpt-3.5-turbo", messages=messages, **extra)
+        logger.debug(f"OpenAI recipe response: {response}")
+        return response.choices[0].message.content
+
+    async def reask(raw, error):
+        return await create(llm_output.reask_messages(messages, raw, error))
+
+    return await llm_output.aparse_with_reask(await create(messages), llm_output.RECIPE, reask)
+
+def is_configured():
+    """
+    Whether the LLM provider can serve requests (the OpenAI one needs OPENAI_API_KEY).
+    """
+    return llm_providers.get_provider().is_configured()
 
 # Helper Function to Call OpenAI API
-async def generate_recipe_async(ingredients, cuisine, spicy_level, cooking_time):
+async def generate_recipe_async(ingredients, cuisine, spicy_level, cooking_time, candidates=None):
     """
     Asynchronously generates a recipe suggestion using OpenAI API.
+    Must run on the async runtime loop, which owns the pooled client (see utils/async_runtime.py).
+    The ingredient list is compacted to the RECIPE_PROMPT token budget (see prompt_builder.py).
+    `candidates` are recipes pre-selected by the local matcher, suggested to the model as a starting point.
     """
-    prompt = (
-            f"You are a recipe assistant API. Based on the following ingredients: {ingredients}, prioritize ingredients that are close to expiration and "
-            f"suggest upto 3 recipes. Ensure that all main (non-optional) ingredients in the recipes are selected only from the provided ingredient list. "
-            f"The recipes should match the cuisine: {cuisine} (if any, then reflect in the output based on the recipe), have a spicy level: {spicy_level}, "
-            f"and take approximately {cooking_time} to cook. Provide detailed instructions and ingredient quantities in this format:\n" +
-            "[{{\"recipe\": \"<recipe_name>\", \"ingredients\": [{{\"name\": \"<ingredient_name>\", \"quantity\": <quantity>, \"unit\": \"<unit>\", \"expiration_date\": \"<date>\"}}], \"cuisine\": \"<cuisine of suggested recipe>\", \"spicy_level\": \"<spicy_level of suggested recipe>\", \"cooking_time\": <time_in_minutes of suggested recipe>, \"overview\": \"<overview>\", \"instructions\": \"<instructions>\"}}]"
-    )
+    prompt = prompt_builder.build_prompt(ingredients, cuisine, spicy_level, cooking_time, candidates=candidates)
 
     try:
-        response = await aclient.chat.completions.create(model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant specializing in recipe suggestions."},
-            {"role": "user", "content": prompt}
-        ])
-        print(response)
-        return json.loads(response.choices[0].message.content)
+        return await _complete(prompt.text)
     except openai.OpenAIError as e:
         logger.error(f"OpenAI API Error: {e}")
         raise e
 
 def generate_recipe(*args, **kwargs):
     """
-    Synchronously wraps the async recipe generation function.
+    Synchronously wraps the async recipe generation function. The coroutine runs on the
+    long-lived runtime loop, so the client's keep-alive connections survive between requests.
+    """
+    return async_runtime.run(generate_recipe_async(*args, **kwargs))
+
+async def generate_recipes_fanout_async(ingredients, cuisine, spicy_level, cooking_time, calls=None,
+                                        candidates=None, call_timeout=None, deadline=None):
+    """
+    Ask for one recipe per completion, `calls` completions at once, each focused on a different
+    candidate recipe or urgent ingredient (prompt_builder.fanout_focuses). Short completions
+    finish sooner than one long one, and the request takes at most `deadline` seconds: calls
+    still running then are cancelled and whatever finished is returned.
+
+    Returns {"recipes": [...], "calls": [{"focus", "status", "latency_ms", "error"}], "wall_ms"}
+    where status is "succeeded", "failed" or "timed_out". Must run on the async runtime loop.
+    """
+    options = get_fanout_options()
+    calls = calls or options['CALLS']
+    call_timeout = options['CALL_TIMEOUT'] if call_timeout is None else call_timeout
+    deadline = options['DEADLINE'] if deadline is None else deadline
+
+    prompt = prompt_builder.build_prompt(ingredients, cuisine, spicy_level, cooking_time, count=1)
+    focuses = prompt_builder.fanout_focuses(ingredients, calls, candidates)
+    started = time.monotonic()
+
+    async def one(focus):
+        call_started = time.monotonic()
+        result = {"focus": focus, "status": "succeeded", "latency_ms": 0, "error": None, "recipes": []}
+        try:
+            timeout = max(0.0, min(call_timeout, deadline - (call_started - started)))
+            recipes = await asyncio.wait_for(
+                _complete(prompt.text + prompt_builder.focus_section(focus), options['MAX_TOKENS']), timeout
+            )
+            result["recipes"] = recipes if isinstance(recipes, list) else [recipes]
+        except asyncio.TimeoutError:
+            result["status"] = "timed_out"
+        except (openai.OpenAIError, ValueError) as e:
+            logger.warning(f"Recipe fan-out call ({focus or 'no focus'}) failed: {e}")
+            result.update(status="failed", error=str(e))
+        result["latency_ms"] = round((time.monotonic() - call_started) * 1000)
+        return result
+
+    results = await asyncio.gather(*(one(focus) for focus in focuses))
+    recipes = [recipe for result in results for recipe in result.pop("recipes")]
+    wall_ms = round((time.monotonic() - started) * 1000)
+    logger.info(
+        f"Recipe fan-out: {sum(r['status'] == 'succeeded' for r in results)}/{len(results)} calls succeeded "
+        f"in {wall_ms} ms (slowest {max(r['latency_ms'] for r in results)} ms)"
+    )
+    return {"recipes": recipes, "calls": results, "wall_ms": wall_ms}
+
+
+def generate_recipes_fanout(*args, **kwargs):
+    """
+    Synchronous wrapper for `generate_recipes_fanout_async`, run on the shared runtime loop.
     """
-    return asyncio.run(generate_recipe_async(*args, **kwargs))
\ No newline at end of file
+    return async_runtime.run(generate_recipes_fanout_async(*args, **kwargs))
@@ -0,0 +1,294 @@
+"""
+Builds the recipe prompt within a token budget.
+
+The ingredient list used to be interpolated as the `repr` of a list of dicts, so every item
+cost a few dozen tokens (`'expiration_date': datetime.date(2025, 4, 3)`) and the prompt grew
+with the pantry. Here ingredients are:
+
+1. merged on normalized name and unit (quantities added, earliest expiry kept);
+2. ranked by expiry urgency, then by relevance: staples such as salt, oil or spices are
+   listed by name only at the end, since nearly every recipe can assume them;
+3. written one per line as `name qty unit, Nd` (N = days until expiry);
+4. cut off at `MAX_INGREDIENT_TOKENS`: the remaining items are aggregated into a single
+   "also available" line with as many names as still fit and a count of the rest.
+
+Token counts use tiktoken when it is installed and a four-characters-per-token estimate
+otherwise. The size of the legacy prompt (`tokens_before`) is only measured when DEBUG
+logging is on for this module, so requests do not pay for a prompt they never send.
+"""
+import datetime
+import logging
+from dataclasses import dataclass, field
+from typing import Union
+
+from django.conf import settings
+from django.utils import timezone
+
+from inventory.normalization import normalize_name, normalize_unit
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_INGREDIENT_TOKENS': 600,
+    'MODEL': 'gpt-3.5-turbo',
+}
+
+STAPLES = {
+    'salt', 'pepper', 'black pepper', 'sugar', 'water', 'oil', 'olive oil', 'vegetable oil',
+    'flour', 'butter', 'vinegar', 'baking soda', 'baking powder', 'soy sauce', 'garlic powder',
+    'paprika', 'cumin', 'chili powder', 'oregano', 'cinnamon',
+}
+
+INSTRUCTIONS = (
+    "You are a recipe assistant API. Suggest {count} using the ingredients below. "
+    "Each ingredient line is `name quantity unit, days until expiry`; they are listed most urgent first, "
+    "so prioritize the ones near the top. Ensure that all main (non-optional) ingredients in the recipes "
+    "are selected only from the provided ingredients; staples may be assumed.\n"
+    "The recipes should match the cuisine: {cuisine} (if any, then reflect in the output based on the recipe), "
+    "have a spicy level: {spicy_level}, and take approximately {cooking_time} to cook. "
+    "Provide detailed instructions and ingredient quantities. Respond only with JSON in this format:\n"
+    '[{{"recipe": "<recipe_name>", "ingredients": [{{"name": "<ingredient_name>", "quantity": <quantity>, '
+    '"unit": "<unit>", "expiration_date": "<date>"}}], "cuisine": "<cuisine of suggested recipe>", '
+    '"spicy_level": "<spicy_level of suggested recipe>", "cooking_time": <time_in_minutes of suggested recipe>, '
+    '"overview": "<overview>", "instructions": "<instructions>"}}]\n\n'
+    "Ingredients:\n{ingredients}"
+)
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RECIPE_PROMPT', {}))
+    return options
+
+
+_encodings = {}
+
+
+def count_tokens(text, model=None):
+    """
+    Number of tokens in `text` for `model`, or an estimate when tiktoken is not installed.
+    """
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    model = model or get_options()['MODEL']
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding('cl100k_base')
+    return len(_encodings[model].encode(text))
+
+
+@dataclass
+class RecipePrompt:
+    text: str
+    tokens: int
+    tokens_before: Union[int, None]  # None unless DEBUG logging is on
+    included: int
+    aggregated: int
+    staples: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            "tokens": self.tokens,
+            "tokens_before": self.tokens_before,
+            "included": self.included,
+            "aggregated": self.aggregated,
+            "staples": len(self.staples),
+        }
+
+
+def _as_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return datetime.date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _format_quantity(quantity):
+    try:
+        quantity = float(quantity)
+    except (TypeError, ValueError):
+        return ''
+    return f"{quantity:g}"
+
+
+def merge_ingredients(ingredients):
+    """
+    Combine entries with the same normalized name and unit. Plain strings are accepted as names.
+    """
+    merged = {}
+    for entry in ingredients:
+        item = entry if isinstance(entry, dict) else {'name': str(entry)}
+        name = str(item.get('name') or '').strip()
+        if not name:
+            continue
+        key = (normalize_name(name), normalize_unit(item.get('unit')))
+        expiration_date = _as_date(item.get('expiration_date'))
+        try:
+            quantity = float(item.get('quantity'))
+        except (TypeError, ValueError):
+            quantity = None
+        if key not in merged:
+            merged[key] = {'name': name, 'unit': key[1], 'quantity': quantity, 'expiration_date': expiration_date}
+            continue
+        existing = merged[key]
+        if quantity is not None:
+            existing['quantity'] = (existing['quantity'] or 0) + quantity
+        if expiration_date and (existing['expiration_date'] is None or expiration_date < existing['expiration_date']):
+            existing['expiration_date'] = expiration_date
+    return list(merged.values())
+
+
+def _line(item, today):
+    parts = [item['name']]
+    quantity = _format_quantity(item['quantity'])
+    if quantity:
+        parts.append(f"{quantity}{item['unit'] and ' ' + item['unit']}")
+    line = ' '.join(parts)
+    if item['expiration_date']:
+        line += f", {(item['expiration_date'] - today).days}d"
+    return line
+
+
+def _urgency(item, today):
+    # Items without a date sort after every dated item
+    if item['expiration_date'] is None:
+        return (1, 0)
+    return (0, (item['expiration_date'] - today).days)
+
+
+def rank_ingredients(ingredients, today):
+    """
+    Merge `ingredients` and split them into (ranked items, staple names), most urgent first.
+    """
+    items = merge_ingredients(ingredients)
+    staples = sorted(item['name'] for item in items if normalize_name(item['name']) in STAPLES)
+    ranked = sorted(
+        (item for item in items if normalize_name(item['name']) not in STAPLES),
+        key=lambda item: _urgency(item, today) + (-(item['quantity'] or 0),),
+    )
+    return ranked, staples
+
+
+def fanout_focuses(ingredients, calls, candidates=None, today=None):
+    """
+    One focus per concurrent completion: local candidate recipes first, then the most urgent
+    ingredients. None (no particular focus) fills up the rest.
+    """
+    focuses = [f'an adaptation of "{candidate["recipe"]}"' for candidate in candidates or []]
+    ranked, _ = rank_ingredients(ingredients, today or timezone.localdate())
+    focuses += [f"a dish built around {item['name']}" for item in ranked]
+    focuses = focuses[:calls]
+    return focuses + [None] * (calls - len(focuses))
+
+
+def focus_section(focus):
+    return f"\n\nFocus on {focus}." if focus else ''
+
+
+def candidates_section(candidates):
+    """
+    Describe recipes pre-selected by the local matcher (recipes/matcher.py) for the model.
+    """
+    lines = []
+    for candidate in candidates:
+        missing = candidate.get('match', {}).get('missing') or []
+        lines.append(f"- {candidate['recipe']}" + (f" (missing: {', '.join(missing)})" if missing else ''))
+    return (
+        "\n\nRecipes from our collection that fit these ingredients; prefer them, adapting as needed:\n"
+        + '\n'.join(lines)
+    )
+
+
+def build_prompt(ingredients, cuisine, spicy_level, cooking_time, max_tokens=None, today=None, candidates=None, count=3):
+    """
+    Return a RecipePrompt asking for up to `count` recipes whose ingredient section fits
+    `max_tokens` (RECIPE_PROMPT['MAX_INGREDIENT_TOKENS'] by default). `candidates` are local
+    matches listed after the ingredients as a starting point for the model.
+    """
+    options = get_options()
+    max_tokens = options['MAX_INGREDIENT_TOKENS'] if max_tokens is None else max_tokens
+    today = today or timezone.localdate()
+
+    ranked, staples = rank_ingredients(ingredients, today)
+
+    lines = []
+    used = 0
+    staples_line = f"Staples: {', '.join(staples)}" if staples else ''
+    reserved = count_tokens(staples_line) if staples_line else 0
+    for item in ranked:
+        line = _line(item, today)
+        cost = count_tokens(line + '\n')
+        if used + cost + reserved > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+    included = len(lines)
+
+    rest = ranked[included:]
+    if rest:
+        # Name the remaining items while they fit, then just count them
+        names = []
+        for item in rest:
+            candidate = f"Also available: {', '.join(names + [item['name']])} and {len(rest)} more"
+            if used + count_tokens(candidate) + reserved > max_tokens:
+                break
+            names.append(item['name'])
+        remaining = len(rest) - len(names)
+        if names:
+            lines.append(f"Also available: {', '.join(names)}" + (f" and {remaining} more" if remaining else ''))
+        else:
+            lines.append(f"{remaining} more items not listed")
+    if staples_line:
+        lines.append(staples_line)
+
+    text = INSTRUCTIONS.format(
+        count='one recipe' if count == 1 else f'up to {count} recipes',
+        cuisine=cuisine,
+        spicy_level=spicy_level,
+        cooking_time=cooking_time,
+        ingredients='\n'.join(lines),
+    )
+    if candidates:
+        text += candidates_section(candidates)
+    tokens_before = None
+    if logger.isEnabledFor(logging.DEBUG):
+        tokens_before = count_tokens(legacy_prompt(ingredients, cuisine, spicy_level, cooking_time))
+    prompt = RecipePrompt(
+        text=text,
+        tokens=count_tokens(text),
+        tokens_before=tokens_before,
+        included=included,
+        aggregated=len(rest),
+        staples=staples,
+    )
+    logger.info(
+        f"Recipe prompt: {prompt.tokens} tokens, "
+        f"{included} ingredients listed, {len(rest)} aggregated, {len(staples)} staples"
+    )
+    if tokens_before is not None:
+        logger.debug(f"Recipe prompt: {tokens_before} tokens in the legacy format")
+    return prompt
+
+
+def legacy_prompt(ingredients, cuisine, spicy_level, cooking_time):
+    """
+    The prompt as it was built before compaction, kept to report the savings.
+    """
+    return (
+        f"You are a recipe assistant API. Based on the following ingredients: {ingredients}, prioritize ingredients that are close to expiration and "
+        f"suggest upto 3 recipes. Ensure that all main (non-optional) ingredients in the recipes are selected only from the provided ingredient list. "
+        f"The recipes should match the cuisine: {cuisine} (if any, then reflect in the output based on the recipe), have a spicy level: {spicy_level}, "
+        f"and take approximately {cooking_time} to cook. Provide detailed instructions and ingredient quantities in this format:\n" +
+        "[{{\"recipe\": \"<recipe_name>\", \"ingredients\": [{{\"name\": \"<ingredient_name>\", \"quantity\": <quantity>, \"unit\": \"<unit>\", \"expiration_date\": \"<date>\"}}], \"cuisine\": \"<cuisine of suggested recipe>\", \"spicy_level\": \"<spicy_level of suggested recipe>\", \"cooking_time\": <time_in_minutes of suggested recipe>, \"overview\": \"<overview>\", \"instructions\": \"<instructions>\"}}]"
+    )
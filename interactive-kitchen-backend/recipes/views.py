@@ -1,12 +1,72 @@
 import openai
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status
 from inventory.models import InventoryItem
+from . import cache as recipe_cache
+from . import matcher
 from .utils import gpt_utils
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from users.authentication import async_token_required
+from utils import async_runtime, llm_output
+from utils.request_utils import is_truthy
+import json
 import openai
 
+def _recipe_response(user, recipe, cached, engine='gpt'):
+    return {
+        "user": {
+            "username": user.username,
+            "email": user.email,
+        },
+        "recipe": recipe,
+        "cached": cached,
+        "engine": engine,
+    }
+
+
+def _prompt_version(engine, fanout_calls=0):
+    # Hybrid and fan-out prompts differ from the plain one, so they must not share cache entries
+    version = gpt_utils.RECIPE_PROMPT_VERSION + ('+hybrid' if engine == 'hybrid' else '')
+    return version + (f'+fanout{fanout_calls}' if fanout_calls else '')
+
+
+def _fanout_calls(value):
+    """
+    Number of concurrent completions requested by the `fanout` field: a count, a boolean flag
+    (RECIPE_FANOUT['CALLS']) or nothing (RECIPE_FANOUT['ENABLED']). 0 means a single completion.
+    """
+    options = gpt_utils.get_fanout_options()
+    if value is None:
+        value = options['ENABLED']
+    if isinstance(value, int) and not isinstance(value, bool):
+        return max(0, min(value, options['MAX_CALLS']))
+    return options['CALLS'] if is_truthy(value) else 0
+
+
+def _fanout_response(user, result, engine):
+    """
+    Build (payload, status code) for a fan-out result. Partial results are still a 200;
+    nothing at all is a 504 when calls ran out of time and a 500 when they all failed.
+    """
+    summary = {"calls": result["calls"], "wall_ms": result["wall_ms"]}
+    statuses = [call["status"] for call in result["calls"]]
+    if not result["recipes"]:
+        if "timed_out" in statuses:
+            return {"error": "No recipe was generated before the deadline.", "fanout": summary}, status.HTTP_504_GATEWAY_TIMEOUT
+        return {"error": "Recipe generation failed.", "fanout": summary}, status.HTTP_500_INTERNAL_SERVER_ERROR
+    payload = _recipe_response(user, result["recipes"], cached=False, engine=engine)
+    payload.update(fanout=summary, partial=any(s != "succeeded" for s in statuses))
+    return payload, status.HTTP_200_OK
+
+
+def _invalid_engine_error():
+    return {"error": f"'engine' must be one of: {', '.join(matcher.ENGINES)}"}
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def suggest_recipe(request):
@@ -19,9 +79,20 @@ def suggest_recipe(request):
     - cuisine: The preferred cuisine type (default is 'any').
     - spicy_level: The desired spice level (default is 'medium').
     - cooking_time: The maximum cooking time (default is 'any').
+    - regenerate: Skip the recipe cache and ask the model for new suggestions (default is false).
+    - engine: 'gpt' asks the model, 'local' matches the bundled recipe collection offline
+      (recipes/matcher.py) and 'hybrid' passes the best local matches to the model as candidates
+      (default is RECIPE_MATCHER['DEFAULT_ENGINE']).
+    - fanout: true or a number of concurrent one-recipe completions to run instead of one long
+      completion. Whatever finishes before RECIPE_FANOUT['DEADLINE'] is returned, with per-call
+      latencies under "fanout" and "partial": true if any call failed or timed out.
+
+    Model suggestions are cached per user by a fingerprint of the ingredients and preferences
+    (see recipes/cache.py) and dropped when the user's inventory changes.
 
     Returns:
-    - A JSON response containing the user's details and the generated recipe.
+    - A JSON response containing the user's details, the generated recipe, whether it came from the cache
+      and the engine used.
 
     Example cURL request:
     ```bash
@@ -36,8 +107,12 @@ def suggest_recipe(request):
     }'
     ```
     """
+    engine = request.data.get('engine', matcher.get_options()['DEFAULT_ENGINE'])
+    if engine not in matcher.ENGINES:
+        return Response(_invalid_engine_error(), status=status.HTTP_400_BAD_REQUEST)
+
     # # Validate API Key
-    if not gpt_utils.OPENAI_API_KEY:
+    if engine != 'local' and not gpt_utils.is_configured():
         return Response({"error": "API key not configured"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     # Extract user details
@@ -56,15 +131,136 @@ def suggest_recipe(request):
     if not ingredients:
         return Response({"error": "'ingredients' field is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+    if engine == 'local':
+        recipe = matcher.suggest(ingredients, cuisine, spicy_level, cooking_time)
+        return Response(_recipe_response(user, recipe, cached=False, engine=engine), status=status.HTTP_200_OK)
+
+    # Serve the previous suggestions for an equivalent pantry unless the user asked for new ones
+    fanout_calls = _fanout_calls(request.data.get('fanout'))
+    fingerprint = recipe_cache.fingerprint(ingredients, cuisine, spicy_level, cooking_time, _prompt_version(engine, fanout_calls))
+    cache_key = recipe_cache.make_key(fingerprint)
+    regenerate = is_truthy(request.data.get('regenerate', False))
+    if not regenerate and recipe_cache.is_enabled():
+        cached_recipe = recipe_cache.lookup(user, cache_key)
+        if cached_recipe is not None:
+            return Response(_recipe_response(user, cached_recipe, cached=True, engine=engine), status=status.HTTP_200_OK)
+
+    candidates = None
+    if engine == 'hybrid':
+        candidates = matcher.suggest(ingredients, cuisine, spicy_level, cooking_time, k=matcher.get_options()['PREFILTER_K'])
+
+    if fanout_calls:
+        result = gpt_utils.generate_recipes_fanout(
+            ingredients, cuisine, spicy_level, cooking_time, calls=fanout_calls, candidates=candidates
+        )
+        payload, status_code = _fanout_response(user, result, engine)
+        # Only complete answers are cached; a partial one should be retried next time
+        if status_code == status.HTTP_200_OK and not payload["partial"] and recipe_cache.is_enabled():
+            recipe_cache.store(user, cache_key, fingerprint, result["recipes"])
+        return Response(payload, status=status_code)
+
     try:
         # Generate recipe synchronously
-        recipe = gpt_utils.generate_recipe(ingredients, cuisine, spicy_level, cooking_time)
-        return Response({
-            "user": {
-                "username": user.username,
-                "email": user.email,
-            },
-            "recipe": recipe
-        }, status=status.HTTP_200_OK)
+        recipe = gpt_utils.generate_recipe(ingredients, cuisine, spicy_level, cooking_time, candidates=candidates)
+        if recipe_cache.is_enabled():
+            recipe_cache.store(user, cache_key, fingerprint, recipe)
+        return Response(_recipe_response(user, recipe, cached=False, engine=engine), status=status.HTTP_200_OK)
     except openai.OpenAIError as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except llm_output.ParseError as e:
+        return Response({"error": f"The model's answer could not be parsed: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
+
+
+@require_POST
+@async_token_required
+async def suggest_recipe_async(request):
+    """
+    Async-native version of `suggest_recipe` with the same request body and response.
+
+    Under an ASGI server the view awaits the OpenAI call instead of blocking a worker thread,
+    so one process can keep many suggestions in flight. The inventory is read with the async ORM.
+
+    Example cURL request:
+    ```bash
+    curl -X POST http://<your-domain>/api/recipe/suggest/async/ \
+    -H "Authorization: Token <your-access-token>" \
+    -H "Content-Type: application/json" \
+    -d '{"cuisine": "Italian"}'
+    ```
+    """
+    user = request.user
+    gpt_utils.logger.info(f"Recipe request by user: {user.username}")
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"error": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+    engine = data.get('engine', matcher.get_options()['DEFAULT_ENGINE'])
+    if engine not in matcher.ENGINES:
+        return JsonResponse(_invalid_engine_error(), status=status.HTTP_400_BAD_REQUEST)
+    if engine != 'local' and not gpt_utils.is_configured():
+        return JsonResponse({"error": "API key not configured"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    ingredients = data.get('ingredients')
+    if 'ingredients' not in data:
+        ingredients = [
+            item async for item in InventoryItem.objects.filter(added_by=user.id).values('name', 'unit', 'quantity', 'expiration_date')
+        ]
+    cuisine = data.get('cuisine', 'any')
+    spicy_level = data.get('spicy_level', 'medium')
+    cooking_time = data.get('cooking_time', 'any')
+
+    if not ingredients:
+        return JsonResponse({"error": "'ingredients' field is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if engine == 'local':
+        recipe = await sync_to_async(matcher.suggest)(ingredients, cuisine, spicy_level, cooking_time)
+        return JsonResponse(_recipe_response(user, recipe, cached=False, engine=engine), status=status.HTTP_200_OK)
+
+    fanout_calls = _fanout_calls(data.get('fanout'))
+    fingerprint = recipe_cache.fingerprint(ingredients, cuisine, spicy_level, cooking_time, _prompt_version(engine, fanout_calls))
+    cache_key = recipe_cache.make_key(fingerprint)
+    if not is_truthy(data.get('regenerate', False)) and recipe_cache.is_enabled():
+        cached_recipe = await sync_to_async(recipe_cache.lookup)(user, cache_key)
+        if cached_recipe is not None:
+            return JsonResponse(_recipe_response(user, cached_recipe, cached=True, engine=engine), status=status.HTTP_200_OK)
+
+    candidates = None
+    if engine == 'hybrid':
+        candidates = await sync_to_async(matcher.suggest)(
+            ingredients, cuisine, spicy_level, cooking_time, k=matcher.get_options()['PREFILTER_K']
+        )
+
+    if fanout_calls:
+        result = await async_runtime.run_async(gpt_utils.generate_recipes_fanout_async(
+            ingredients, cuisine, spicy_level, cooking_time, calls=fanout_calls, candidates=candidates
+        ))
+        payload, status_code = _fanout_response(user, result, engine)
+        if status_code == status.HTTP_200_OK and not payload["partial"] and recipe_cache.is_enabled():
+            await sync_to_async(recipe_cache.store)(user, cache_key, fingerprint, result["recipes"])
+        return JsonResponse(payload, status=status_code)
+
+    try:
+        # Runs on the shared runtime loop that owns the pooled client
+        recipe = await async_runtime.run_async(
+            gpt_utils.generate_recipe_async(ingredients, cuisine, spicy_level, cooking_time, candidates=candidates)
+        )
+        if recipe_cache.is_enabled():
+            await sync_to_async(recipe_cache.store)(user, cache_key, fingerprint, recipe)
+        return JsonResponse(_recipe_response(user, recipe, cached=False, engine=engine), status=status.HTTP_200_OK)
+    except openai.OpenAIError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except llm_output.ParseError as e:
+        return JsonResponse({"error": f"The model's answer could not be parsed: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def recipe_cache_stats(request):
+    """
+    Returns the recipe cache counters of this process (hits, misses, stores, evictions,
+    invalidations, hit rate) and the number of stored entries, plus the parse outcomes of
+    the model's answers under "parsing" (see utils/llm_output.py).
+    """
+    return Response(dict(recipe_cache.stats(), parsing=llm_output.stats(llm_output.RECIPE.name)), status=status.HTTP_200_OK)
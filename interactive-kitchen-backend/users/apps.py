@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+        from . import token_cache
+        post_delete.connect(token_cache.on_token_deleted, sender=Token, dispatch_uid='users.token_cache.token_deleted')
+        post_save.connect(token_cache.on_user_changed, sender=get_user_model(), dispatch_uid='users.token_cache.user_saved')
+        post_delete.connect(token_cache.on_user_changed, sender=get_user_model(), dispatch_uid='users.token_cache.user_deleted')
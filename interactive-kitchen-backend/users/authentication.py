@@ -0,0 +1,79 @@
+"""
+Token authentication backed by the token cache (users/token_cache.py).
+
+CachedTokenAuthentication is DRF's TokenAuthentication with the key looked up in the cache
+before the database, so steady-state requests authenticate without a query. The user is
+loaded without its password hash, which authentication does not need and the cache must
+not hold.
+
+DRF's authentication runs synchronously inside APIView.dispatch, so the native async
+(non-DRF) views authenticate the `Authorization: Token <key>` header themselves with the
+async ORM, through the same cache.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from . import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            try:
+                token = Token.objects.select_related('user').defer('user__password').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token_cache.store(token)
+            cached = token.user, token
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, token
+
+
+async def aauthenticate_token(request):
+    """
+    Return the active user for the request's token, or None.
+    """
+    header = request.headers.get('Authorization', '')
+    keyword, _, key = header.partition(' ')
+    if keyword.lower() != 'token' or not key.strip():
+        return None
+    key = key.strip()
+    cached = await token_cache.aget(key)
+    if cached is None:
+        try:
+            token = await Token.objects.select_related('user').defer('user__password').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        await token_cache.astore(token)
+        cached = token.user, token
+    user, _token = cached
+    return user if user.is_active else None
+
+
+def async_token_required(view):
+    """
+    Decorator for async views: sets `request.user` from the token or responds 401 like DRF does.
+    Token-authenticated requests carry no session cookie, so CSRF checks are skipped as in DRF.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aauthenticate_token(request)
+        if user is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=401,
+                headers={"WWW-Authenticate": "Token"},
+            )
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
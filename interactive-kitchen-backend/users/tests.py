@@ -1,3 +1,131 @@
-from django.test import TestCase
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from users import token_cache
+from users.models import CustomUser
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        token_cache.reset_stats()
+        self.user = CustomUser.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = "/api/inventory/"
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [query['sql'] for query in queries if Token._meta.db_table in query['sql']]
+
+    def test_steady_state_requests_do_not_query_the_token(self):
+        response, queries = self.token_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.token_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+        stats = token_cache.stats()
+        self.assertEqual((stats['local_hits'], stats['misses'], stats['stores']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_cached_user_is_a_copy(self):
+        self.client.get(self.url)
+        user, token = token_cache.get(self.token.key)
+        user.first_name = "Changed"
+        self.assertEqual(token_cache.get(self.token.key)[0].first_name, "")
+        self.assertIs(token.user, user)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token nope")
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_invalidates_the_token(self):
+        self.client.get(self.url)
+        response = self.client.post("/api/auth/logout/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_changes_invalidate_the_token(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(token_cache.stats()['invalidations'], 1)
+
+    def test_logins_do_not_invalidate_the_token(self):
+        self.client.get(self.url)
+        update_last_login(None, self.user)
+        self.assertEqual(token_cache.stats()['invalidations'], 0)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    @override_settings(TOKEN_AUTH_CACHE={'MAX_ENTRIES': 1})
+    def test_least_recently_used_tokens_are_evicted(self):
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        other_token = Token.objects.create(user=other)
+        self.client.get(self.url)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {other_token.key}")
+        self.client.get(self.url)
+        self.assertEqual(token_cache.stats()['entries'], 1)
+        self.assertEqual(token_cache.stats()['evictions'], 1)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(TOKEN_AUTH_CACHE={'TTL': 300, 'LOCAL_TTL': 0})
+    def test_local_entries_expire_after_local_ttl_without_a_shared_cache(self):
+        # Other processes cannot be told about a logout; they must re-read the token soon
+        self.token_queries()
+        _, queries = self.token_queries()
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(TOKEN_AUTH_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.token_queries()
+        _, queries = self.token_queries()
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_shared_cache(self):
+        cache.clear()
+        self.client.get(self.url)
+        # Another process: nothing in its local LRU, the shared cache answers
+        token_cache.clear()
+        response, queries = self.token_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+        self.assertEqual(token_cache.stats()['shared_hits'], 1)
+        # Logging out anywhere removes the shared entry
+        key = self.token.key
+        token_cache.clear()
+        self.token.delete()
+        self.assertIsNone(cache.get(token_cache.KEY_PREFIX + key))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_shared_cache_does_not_hold_the_password_hash(self):
+        cache.clear()
+        self.client.get(self.url)
+        entry = cache.get(token_cache.KEY_PREFIX + self.token.key)
+        self.assertNotIn('password', entry['user'])
+        self.assertNotIn(self.user.password, repr(entry))
+        token_cache.clear()
+        user, token = token_cache.get(self.token.key)
+        self.assertEqual((user.pk, user.username, token.key), (self.user.pk, "testuser", self.token.key))
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_stats_endpoint_requires_an_admin(self):
+        url = "/api/auth/token_cache/stats/"
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_rate', response.data)
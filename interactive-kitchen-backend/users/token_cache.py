@@ -0,0 +1,256 @@
+"""
+Cache of authenticated tokens.
+
+DRF's TokenAuthentication reads `authtoken_token` joined to the user on every request.
+CachedTokenAuthentication (users/authentication.py) looks the key up here first: in a
+per-process LRU, then in an optional shared Django cache (TOKEN_AUTH_CACHE['SHARED_CACHE'],
+e.g. Redis), and only then in the database, storing the (user, token) pair it found.
+
+The shared cache holds plain field values, not pickled models, and never the password
+hash; a hit rebuilds the user with its password deferred. The authentication queries defer
+it as well, so the local LRU does not hold it either.
+
+Entries are dropped when the token is deleted (logout) and when its user is saved or
+deleted (deactivation, password change). Invalidation only reaches the local LRU of the
+process it happens in and the shared cache; other processes notice it once their local
+entry expires, which is why local entries live for LOCAL_TTL (10 seconds) at most. A shared
+cache keeps the hit rate up across processes and entries for the full TTL. Changes that
+bypass model signals (`QuerySet.update()`) are seen after the TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+
+DEFAULT_TTL_SECONDS = 5 * 60
+DEFAULT_LOCAL_TTL_SECONDS = 10
+DEFAULT_MAX_ENTRIES = 10000
+
+KEY_PREFIX = 'auth-token:'
+
+_lock = threading.Lock()
+# token key -> (expires_at, user, token), least recently used first
+_entries = OrderedDict()
+_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+
+def _config():
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {})
+
+
+def is_enabled():
+    return _config().get('ENABLED', True)
+
+
+def _ttl():
+    return _config().get('TTL', DEFAULT_TTL_SECONDS)
+
+
+def _shared_cache():
+    alias = _config().get('SHARED_CACHE')
+    return caches[alias] if alias else None
+
+
+def _local_ttl():
+    """
+    Local entries never outlive LOCAL_TTL, with or without a shared cache: invalidation does
+    not reach the LRU of other processes, so this bounds how long they accept a revoked token.
+    """
+    return min(_config().get('LOCAL_TTL', DEFAULT_LOCAL_TTL_SECONDS), _ttl())
+
+
+def _max_entries():
+    return _config().get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def _fresh(user, token):
+    # Views may modify request.user; hand out a copy so the cached instance stays as loaded
+    user = copy.copy(user)
+    token = copy.copy(token)
+    token.user = user
+    return user, token
+
+
+def _pack(user, token):
+    """
+    The shared-cache form of an entry: the user's loaded field values without the password.
+    """
+    deferred = user.get_deferred_fields() | {'password'}
+    fields = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields if field.attname not in deferred
+    }
+    return {'user': fields, 'token': (token.key, token.created)}
+
+
+def _unpack(packed):
+    from rest_framework.authtoken.models import Token
+
+    user_model = get_user_model()
+    fields = packed['user']
+    names = [field.attname for field in user_model._meta.concrete_fields if field.attname in fields]
+    user = user_model.from_db(router.db_for_read(user_model), names, [fields[name] for name in names])
+    key, created = packed['token']
+    token = Token.from_db(router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user.pk, created])
+    token.user = user
+    return user, token
+
+
+def _get_local(key):
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        _stats['local_hits'] += 1
+        return entry[1], entry[2]
+
+
+def _set_local(key, user, token):
+    expires_at = time.monotonic() + _local_ttl()
+    evicted = 0
+    with _lock:
+        _entries[key] = (expires_at, user, token)
+        _entries.move_to_end(key)
+        while len(_entries) > _max_entries():
+            _entries.popitem(last=False)
+            evicted += 1
+        _stats['evictions'] += evicted
+
+
+def get(key):
+    """
+    The cached (user, token) for a token key, or None. Shared-cache hits refill the local LRU.
+    """
+    if not is_enabled():
+        return None
+    found = _get_local(key)
+    if found is None:
+        shared = _shared_cache()
+        packed = shared.get(KEY_PREFIX + key) if shared is not None else None
+        if packed is None:
+            _count('misses')
+            return None
+        _count('shared_hits')
+        found = _unpack(packed)
+        _set_local(key, *found)
+    return _fresh(*found)
+
+
+async def aget(key):
+    if not is_enabled():
+        return None
+    found = _get_local(key)
+    if found is None:
+        shared = _shared_cache()
+        packed = await shared.aget(KEY_PREFIX + key) if shared is not None else None
+        if packed is None:
+            _count('misses')
+            return None
+        _count('shared_hits')
+        found = _unpack(packed)
+        _set_local(key, *found)
+    return _fresh(*found)
+
+
+def store(token):
+    """
+    Cache a token loaded with its user (`select_related('user')`, password deferred).
+    """
+    if not is_enabled():
+        return
+    user = token.user
+    _set_local(token.key, user, token)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(KEY_PREFIX + token.key, _pack(user, token), _ttl())
+    _count('stores')
+
+
+async def astore(token):
+    if not is_enabled():
+        return
+    user = token.user
+    _set_local(token.key, user, token)
+    shared = _shared_cache()
+    if shared is not None:
+        await shared.aset(KEY_PREFIX + token.key, _pack(user, token), _ttl())
+    _count('stores')
+
+
+def invalidate(keys):
+    """
+    Drop token keys from the local LRU and the shared cache.
+    """
+    keys = [key for key in keys if key]
+    if not keys:
+        return
+    with _lock:
+        for key in keys:
+            _entries.pop(key, None)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete_many([KEY_PREFIX + key for key in keys])
+    _count('invalidations', len(keys))
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached tokens of a user: the ones in the local LRU and the user's current token.
+    """
+    from rest_framework.authtoken.models import Token
+
+    with _lock:
+        keys = {key for key, (_, user, _) in _entries.items() if user.pk == user_id}
+    if _shared_cache() is not None:
+        keys.update(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    invalidate(keys)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def on_token_deleted(sender, instance, **kwargs):
+    invalidate([instance.key])
+
+
+def on_user_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    # Logging in only stamps last_login (update_last_login); it changes nothing authentication reads
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    invalidate_user(instance.pk)
+
+
+def stats():
+    """
+    Return the counters of this process, the hit rate over both layers and the local entry count.
+    """
+    with _lock:
+        snapshot = dict(_stats)
+        snapshot['entries'] = len(_entries)
+    lookups = snapshot['local_hits'] + snapshot['shared_hits'] + snapshot['misses']
+    snapshot['hit_rate'] = (snapshot['local_hits'] + snapshot['shared_hits']) / lookups if lookups else 0.0
+    snapshot['shared_cache'] = _config().get('SHARED_CACHE')
+    return snapshot
+
+
+def reset_stats():
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
@@ -1,9 +1,11 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.authtoken.models import Token
+from . import token_cache
 from .models import CustomUser
 from .serializers import UserSerializer
 
@@ -47,4 +49,14 @@ class LogoutView(APIView):
     def post(self, request):
         request.user.auth_token.delete()
         logout(request)
-        return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def token_cache_stats(request):
+    """
+    Returns the token authentication cache counters of this process (local and shared hits,
+    misses, stores, evictions, invalidations, hit rate) and the number of local entries.
+    """
+    return Response(token_cache.stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,153 @@
+"""
+A long-lived asyncio event loop for the async LLM clients.
+
+`asyncio.run()` per request creates and closes an event loop every time, and with it the
+AsyncOpenAI connection pool, so every call pays for a new TCP + TLS handshake. Instead, one
+daemon thread per process runs a loop forever and owns the async clients. Synchronous code
+calls `run(coro)`; async code (ASGI views) awaits `run_async(coro)`. Either way the coroutine
+executes on the runtime loop, so the clients' keep-alive connections are reused across requests.
+
+The client comes from the configured LLM provider (utils/llm_providers.py); pool limits and
+timeouts come from `settings.OPENAI_CLIENT`.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+
+import httpx
+from django.conf import settings
+
+from . import llm_providers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    'KEEPALIVE_EXPIRY': 30.0,
+    'CONNECT_TIMEOUT': 5.0,
+    'READ_TIMEOUT': 60.0,
+    'WRITE_TIMEOUT': 10.0,
+    'POOL_TIMEOUT': 10.0,
+    'MAX_RETRIES': 2,
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'OPENAI_CLIENT', {}))
+    return options
+
+
+def build_http_client(options=None):
+    options = options or get_options()
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=options['MAX_CONNECTIONS'],
+            max_keepalive_connections=options['MAX_KEEPALIVE_CONNECTIONS'],
+            keepalive_expiry=options['KEEPALIVE_EXPIRY'],
+        ),
+        timeout=httpx.Timeout(
+            connect=options['CONNECT_TIMEOUT'],
+            read=options['READ_TIMEOUT'],
+            write=options['WRITE_TIMEOUT'],
+            pool=options['POOL_TIMEOUT'],
+        ),
+    )
+
+
+class AsyncRuntime:
+    """
+    An event loop running in a daemon thread, plus the async clients bound to it.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='async-runtime', daemon=True)
+        self._llm = None
+        self._llm_provider = None
+        self._client_lock = threading.Lock()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def llm(self):
+        """
+        The shared async client of the configured LLM provider (OpenAI-compatible).
+        Only use it in coroutines running on this runtime's loop.
+        """
+        provider = llm_providers.get_provider()
+        with self._client_lock:
+            # Rebuilt when the provider changes, e.g. when a benchmark switches to the fake one
+            if self._llm is None or self._llm_provider is not provider:
+                self._llm = provider.async_client(http_client=build_http_client())
+                self._llm_provider = provider
+            return self._llm
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the runtime loop and return a concurrent.futures.Future.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the runtime loop and block the calling thread until it finishes.
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("AsyncRuntime.run() cannot be called from the runtime loop; await the coroutine instead.")
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro):
+        """
+        Await a coroutine on the runtime loop from another event loop (e.g. an ASGI view).
+        """
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def close(self, timeout=5):
+        if self.loop.is_closed():
+            return
+        close = getattr(self._llm, 'close', None)
+        if close is not None and self.loop.is_running():
+            try:
+                self.submit(close()).result(timeout)
+            except Exception as e:
+                logger.warning(f"Could not close the LLM client cleanly: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    """
+    Return the process-wide runtime, starting it on first use.
+    """
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AsyncRuntime().start()
+            atexit.register(_runtime.close)
+            logger.info("Started the async client runtime")
+        return _runtime
+
+
+def run(coro, timeout=None):
+    return get_runtime().run(coro, timeout)
+
+
+async def run_async(coro):
+    return await get_runtime().run_async(coro)
@@ -0,0 +1,232 @@
+"""
+Namespaced caching on top of Django's cache framework.
+
+The backend comes from CACHES, picked by CACHE_BACKEND in settings: `locmem`, `file`,
+`redis` (needs redis-py) or `fake-redis` (utils/fake_redis.py). Features do not use the
+cache directly but declare a `Namespace`:
+
+    SUMMARIES = caching.Namespace('expiry-summary', ttl=3600)
+    summary = SUMMARIES.get_or_set(today.isoformat(), compute, scope=user_id)
+    SUMMARIES.invalidate(scope=user_id)
+
+Keys carry the namespace, a namespace version and, for scoped keys, the scope's version
+("expiry-summary:v17:42.v3:2025-04-01"). `invalidate` increments a version instead of
+deleting keys, so dropping everything of a namespace or of one user is a single write on
+any backend; the orphaned entries expire with their TTL. Versions start from the clock, so
+a version key lost to eviction never brings back old entries.
+
+`get_or_set` protects against stampedes: on a miss only one caller computes the value. In
+a process the others wait on a lock; across processes a short-lived lock key (`add`) makes
+them poll for the value instead of computing it too, for at most LOCK_WAIT seconds.
+
+Each namespace counts hits, misses, computes, waits and invalidations (`stats()`).
+Options come from CACHING in settings; NAMESPACES overrides the TTL and ENABLED flag of
+single namespaces.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Hashable, TypeVar, Union
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+Scope = Union[str, int, None]
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'LOCK_TIMEOUT': 30,  # seconds a cross-process compute lock is held at most
+    'LOCK_WAIT': 5.0,  # seconds to wait for another process's value before computing it too
+    'POLL_INTERVAL': 0.05,
+    'NAMESPACES': {},  # name -> {'TTL': seconds, 'ENABLED': bool}
+}
+
+MISSING = object()
+
+# Striped in-process locks for single-flight computes
+_compute_locks = [threading.Lock() for _ in range(64)]
+
+_registry_lock = threading.Lock()
+_namespaces = {}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'CACHING', {}))
+    return options
+
+
+def _new_version() -> int:
+    return time.time_ns() // 1000
+
+
+class Namespace:
+    """
+    A named group of cache entries with a default TTL (seconds, None for no expiry).
+    """
+
+    def __init__(self, name: str, ttl: Union[int, None] = 300, alias: Union[str, None] = None):
+        self.name = name
+        self.default_ttl = ttl
+        self.alias = alias
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "computes": 0, "waits": 0, "invalidations": 0}
+        with _registry_lock:
+            _namespaces[name] = self
+
+    def __repr__(self):
+        return f"Namespace({self.name!r})"
+
+    def _options(self) -> dict:
+        options = get_options()
+        return dict(options, **options['NAMESPACES'].get(self.name, {}))
+
+    @property
+    def enabled(self) -> bool:
+        return self._options().get('ENABLED', True)
+
+    @property
+    def ttl(self) -> Union[int, None]:
+        return self._options().get('TTL', self.default_ttl)
+
+    @property
+    def cache(self):
+        return caches[self.alias or get_options()['ALIAS']]
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _version_key(self, scope: Scope = None) -> str:
+        return f"{self.name}:version" if scope is None else f"{self.name}:{scope}:version"
+
+    def _versions(self, scope: Scope) -> list:
+        keys = [self._version_key()] + ([self._version_key(scope)] if scope is not None else [])
+        found = self.cache.get_many(keys)
+        versions = []
+        for key in keys:
+            version = found.get(key)
+            if version is None:
+                version = _new_version()
+                # Another caller may have set it in between; use whatever won
+                if not self.cache.add(key, version, None):
+                    version = self.cache.get(key, version)
+            versions.append(version)
+        return versions
+
+    def key(self, key: Hashable, scope: Scope = None) -> str:
+        """
+        The backend key of `key` under the current namespace (and scope) version.
+        """
+        versions = self._versions(scope)
+        if scope is None:
+            return f"{self.name}:v{versions[0]}:{key}"
+        return f"{self.name}:v{versions[0]}:{scope}.v{versions[1]}:{key}"
+
+    def get(self, key: Hashable, default: Any = None, scope: Scope = None) -> Any:
+        if not self.enabled:
+            return default
+        value = self.cache.get(self.key(key, scope), MISSING)
+        if value is MISSING:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Union[int, None, object] = MISSING, scope: Scope = None):
+        if not self.enabled:
+            return
+        self.cache.set(self.key(key, scope), value, self.ttl if ttl is MISSING else ttl)
+        self._count('sets')
+
+    def delete(self, key: Hashable, scope: Scope = None):
+        self.cache.delete(self.key(key, scope))
+
+    def get_or_set(self, key: Hashable, compute: Callable[[], T], ttl: Union[int, None, object] = MISSING,
+                   scope: Scope = None) -> T:
+        """
+        The cached value of `key`, or `compute()` stored under it. Concurrent misses of the
+        same key compute it once.
+        """
+        if not self.enabled:
+            return compute()
+        ttl = self.ttl if ttl is MISSING else ttl
+        full_key = self.key(key, scope)
+        value = self.cache.get(full_key, MISSING)
+        if value is not MISSING:
+            self._count('hits')
+            return value
+        self._count('misses')
+
+        with _compute_locks[hash(full_key) % len(_compute_locks)]:
+            # A thread of this process may have stored it while we waited
+            value = self.cache.get(full_key, MISSING)
+            if value is not MISSING:
+                self._count('waits')
+                return value
+            options = self._options()
+            lock_key = f"{full_key}:lock"
+            if not self.cache.add(lock_key, 1, options['LOCK_TIMEOUT']):
+                value = self._wait_for(full_key, options)
+                if value is not MISSING:
+                    self._count('waits')
+                    return value
+                logger.warning(f"Cache namespace {self.name}: gave up waiting for {full_key}, computing it")
+            try:
+                value = compute()
+                self.cache.set(full_key, value, ttl)
+                self._count('computes')
+            finally:
+                self.cache.delete(lock_key)
+        return value
+
+    def _wait_for(self, full_key: str, options: dict) -> Any:
+        deadline = time.monotonic() + options['LOCK_WAIT']
+        while time.monotonic() < deadline:
+            time.sleep(options['POLL_INTERVAL'])
+            value = self.cache.get(full_key, MISSING)
+            if value is not MISSING:
+                return value
+        return MISSING
+
+    def invalidate(self, scope: Scope = None):
+        """
+        Drop every entry of the namespace, or only those of `scope`.
+        """
+        version_key = self._version_key(scope)
+        try:
+            self.cache.incr(version_key)
+        except ValueError:
+            self.cache.set(version_key, _new_version(), None)
+        self._count('invalidations')
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_rate'] = snapshot['hits'] / lookups if lookups else 0.0
+        return snapshot
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+def stats() -> dict:
+    """
+    The counters of every namespace of this process, by name.
+    """
+    with _registry_lock:
+        namespaces = list(_namespaces.values())
+    return {namespace.name: namespace.stats() for namespace in namespaces}
+
+
+def reset_stats():
+    with _registry_lock:
+        namespaces = list(_namespaces.values())
+    for namespace in namespaces:
+        namespace.reset_stats()
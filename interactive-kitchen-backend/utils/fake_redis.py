@@ -0,0 +1,195 @@
+"""
+In-process stand-in for a Redis server behind Django's Redis cache backend.
+
+`FakeRedisCache` is `django.core.cache.backends.redis.RedisCache` with the redis-py client
+swapped for `FakeRedis`, which implements the commands Django's backend sends (GET, SET with
+EX/NX, MGET, MSET, DEL, EXISTS, INCRBY, EXPIRE, PERSIST, FLUSHDB, pipelines) on a dict.
+Values are stored as bytes like a server would store them, so serialization, integer
+counters and expiry behave as against Redis. Caches with the same LOCATION share one
+server, like processes pointed at the same URL. Tests and benchmarks use it through
+CACHE_BACKEND=fake-redis; it needs neither redis-py nor a running server.
+"""
+import threading
+import time
+
+from django.core.cache.backends.redis import RedisCache, RedisCacheClient, RedisSerializer
+from django.utils.module_loading import import_string
+
+_servers_lock = threading.Lock()
+_servers = {}
+
+
+class FakeRedisServer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value bytes, expires_at or None)
+        self.data = {}
+
+    def _alive(self, key, now):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self.data[key]
+            return None
+        return entry
+
+    def read(self, key):
+        with self.lock:
+            entry = self._alive(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def write(self, key, value, ex=None, nx=False):
+        now = time.monotonic()
+        with self.lock:
+            entry = self._alive(key, now)
+            if nx and entry is not None:
+                return False
+            self.data[key] = (value, now + ex if ex is not None else None)
+            return True
+
+    def expire(self, key, seconds):
+        with self.lock:
+            entry = self._alive(key, time.monotonic())
+            if entry is None:
+                return False
+            self.data[key] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    def persist(self, key):
+        with self.lock:
+            entry = self._alive(key, time.monotonic())
+            if entry is None or entry[1] is None:
+                return False
+            self.data[key] = (entry[0], None)
+            return True
+
+    def delete(self, keys):
+        now = time.monotonic()
+        with self.lock:
+            deleted = [key for key in keys if self._alive(key, now) is not None]
+            for key in deleted:
+                del self.data[key]
+            return len(deleted)
+
+    def incr(self, key, delta):
+        with self.lock:
+            entry = self._alive(key, time.monotonic())
+            value = int(entry[0]) + delta if entry else delta
+            self.data[key] = (_encode(value), entry[1] if entry else None)
+            return value
+
+    def flush(self):
+        with self.lock:
+            self.data.clear()
+
+
+def _encode(value):
+    # Redis stores strings; numbers come back as their decimal representation
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def get_server(url):
+    with _servers_lock:
+        return _servers.setdefault(url, FakeRedisServer())
+
+
+class FakeConnectionPool:
+
+    def __init__(self, url):
+        self.url = url
+        self.server = get_server(url)
+
+    @classmethod
+    def from_url(cls, url, **options):
+        return cls(url)
+
+
+class FakeRedis:
+    """
+    The subset of `redis.Redis` used by Django's cache backend.
+    """
+
+    def __init__(self, connection_pool):
+        self.server = connection_pool.server
+
+    def get(self, key):
+        return self.server.read(key)
+
+    def mget(self, keys):
+        return [self.server.read(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        return self.server.write(key, _encode(value), ex=ex, nx=nx) or None
+
+    def mset(self, mapping):
+        for key, value in mapping.items():
+            self.server.write(key, _encode(value))
+        return True
+
+    def delete(self, *keys):
+        return self.server.delete(keys)
+
+    def exists(self, *keys):
+        return sum(self.server.read(key) is not None for key in keys)
+
+    def incr(self, key, amount=1):
+        return self.server.incr(key, amount)
+
+    def expire(self, key, seconds):
+        return self.server.expire(key, seconds)
+
+    def persist(self, key):
+        return self.server.persist(key)
+
+    def flushdb(self):
+        self.server.flush()
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results = [command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class FakeRedisCacheClient(RedisCacheClient):
+
+    def __init__(self, servers, serializer=None, **options):
+        self._servers = servers
+        self._pools = {}
+        self._client = FakeRedis
+        self._pool_class = FakeConnectionPool
+        if isinstance(serializer, str):
+            serializer = import_string(serializer)
+        if callable(serializer):
+            serializer = serializer()
+        self._serializer = serializer or RedisSerializer()
+        self._pool_options = {}
+
+
+class FakeRedisCache(RedisCache):
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._class = FakeRedisCacheClient
@@ -0,0 +1,70 @@
+"""
+Incremental parsing of a JSON array of objects arriving in chunks, e.g. from a streamed
+LLM completion. Each object is returned as soon as its closing brace arrives, so callers
+can act on the first item long before the response is complete.
+"""
+import json
+
+
+class JSONArrayStream:
+    """
+    Feed text chunks with `feed()`; it returns the objects completed by that chunk.
+
+    Anything before the opening `[` (a markdown fence, a sentence of preamble) is skipped,
+    and so is anything after the closing `]`. Strings are tracked so braces inside item
+    names do not confuse the scanner. An object that is not valid JSON is not returned; its
+    text is kept in `invalid` and scanning goes on with the next one.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.current = []
+        self.count = 0
+        self.invalid = []
+
+    def feed(self, chunk):
+        completed = []
+        for char in chunk:
+            if self.finished:
+                break
+            if not self.started:
+                if char == '[':
+                    self.started = True
+                continue
+
+            if self.depth:
+                self.current.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if not self.depth:
+                    self.current = [char]
+                self.depth += 1
+            elif char in '}]':
+                if not self.depth:
+                    # The closing bracket of the top-level array
+                    self.finished = True
+                    continue
+                self.depth -= 1
+                if not self.depth:
+                    fragment = ''.join(self.current)
+                    self.current = []
+                    try:
+                        completed.append(json.loads(fragment))
+                    except ValueError:
+                        self.invalid.append(fragment)
+                        continue
+                    self.count += 1
+        return completed
@@ -0,0 +1,441 @@
+"""
+Parsing structured (JSON) output from LLM completions.
+
+Models are told to answer with JSON only, but now and then wrap it in a markdown fence, add a
+sentence before or after it, leave a trailing comma, answer with Python literals or get cut off
+by `max_tokens`. Failing the request on any of these makes users retry the whole expensive call,
+so `parse()` tries the cheap fixes first:
+
+1. `json.loads` of the whole response (the common case);
+2. extraction: the first JSON value in the text, after any fence or preamble, ignoring whatever
+   follows it;
+3. local repair: smart quotes, trailing commas, `None`/`True`/`False`, single quotes, and closing
+   the brackets of a truncated value after its last complete element.
+
+The result is then validated against a `Schema`, which coerces obvious type slips ("2" -> 2.0,
+"30 minutes" -> 30) and drops objects that cannot be used. If nothing usable is left a
+`ParseError` is raised, and `parse_with_reask()` asks the model once more as a last resort.
+
+Outcomes are counted per schema, in the style of the cache modules (`stats()`).
+"""
+import ast
+import datetime
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+
+from .json_stream import JSONArrayStream
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'REASK_ATTEMPTS': 1,
+}
+
+REASK_PROMPT = (
+    "Your previous reply could not be used ({error}). "
+    "Reply again with only the JSON, without markdown or any other text."
+)
+
+OUTCOMES = ('direct', 'extracted', 'repaired', 'reasked', 'failed')
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LLM_OUTPUT', {}))
+    return options
+
+
+class ParseError(ValueError):
+    """
+    The completion contained no usable JSON for the schema.
+    """
+
+
+class SchemaError(ValueError):
+    """
+    One object does not match its schema.
+    """
+
+
+# Marks optional fields that are left out of the cleaned object when missing
+OMIT = object()
+
+
+@dataclass(frozen=True)
+class Field:
+    coerce: Callable
+    required: bool = False
+    default: object = OMIT
+    aliases: tuple = ()
+
+
+class Schema:
+    """
+    A named set of fields. `clean()` returns a new dict with only the declared fields, each
+    coerced; unknown keys are dropped.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def clean(self, obj):
+        if not isinstance(obj, dict):
+            raise SchemaError(f"{self.name}: expected an object, got {type(obj).__name__}")
+        cleaned = {}
+        for key, field in self.fields.items():
+            source = next((k for k in (key,) + field.aliases if obj.get(k) not in (None, '')), None)
+            if source is None:
+                if field.required:
+                    raise SchemaError(f"{self.name}: '{key}' is required")
+                if field.default is not OMIT:
+                    cleaned[key] = field.default() if callable(field.default) else field.default
+                continue
+            try:
+                cleaned[key] = field.coerce(obj[source])
+            except (TypeError, ValueError) as e:
+                if field.required:
+                    raise SchemaError(f"{self.name}: '{key}' is invalid: {e}") from e
+                if field.default is not OMIT:
+                    cleaned[key] = field.default() if callable(field.default) else field.default
+        return cleaned
+
+    def clean_many(self, objs):
+        """
+        Return (cleaned objects, number dropped).
+        """
+        cleaned = []
+        for obj in objs:
+            try:
+                cleaned.append(self.clean(obj))
+            except SchemaError as e:
+                logger.debug(f"Dropping invalid object: {e}")
+        return cleaned, len(objs) - len(cleaned)
+
+
+def text(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError("expected text")
+    value = str(value).strip()
+    if not value:
+        raise ValueError("empty")
+    return value
+
+
+def number(value):
+    """
+    A number, or the leading number of a string ("2", "1,5", "2 kg").
+    """
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    if isinstance(value, (int, float)):
+        return value
+    match = re.match(r'\s*(-?\d+(?:[.,]\d+)?)', str(value))
+    if not match:
+        raise ValueError(f"not a number: {value!r}")
+    return float(match.group(1).replace(',', '.'))
+
+
+def iso_date(value):
+    """
+    An ISO date string from "2025-04-03", "2025/04/03" or "2025-04-03T00:00:00".
+    """
+    match = re.match(r'\s*(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})', str(value))
+    if not match:
+        raise ValueError(f"not a date: {value!r}")
+    return datetime.date(*map(int, match.groups())).isoformat()
+
+
+def minutes(value):
+    """
+    Whole minutes from 30, "30", "30 minutes" or "1 hour".
+    """
+    amount = number(value)
+    if re.search(r'\b(h|hr|hrs|hour|hours)\b', str(value).lower()):
+        amount *= 60
+    return int(amount)
+
+
+def instructions(value):
+    """
+    Instructions as one string; a list of steps is numbered.
+    """
+    if isinstance(value, list):
+        return '\n'.join(f"{i}. {text(step)}" for i, step in enumerate(value, 1))
+    return text(value)
+
+
+def list_of(schema):
+    def coerce(value):
+        if not isinstance(value, list):
+            raise ValueError("expected a list")
+        return schema.clean_many(value)[0]
+    return coerce
+
+
+RECEIPT_ITEM = Schema('receipt_item', {
+    'name': Field(text, required=True, aliases=('item', 'item_name')),
+    'quantity': Field(number, default=1, aliases=('qty',)),
+    'unit': Field(text, default=''),
+    'expiration_date': Field(iso_date, default=None, aliases=('expiry', 'expiry_date')),
+    'price': Field(number),
+})
+
+RECIPE_INGREDIENT = Schema('recipe_ingredient', {
+    'name': Field(text, required=True, aliases=('ingredient',)),
+    'quantity': Field(number),
+    'unit': Field(text),
+    'expiration_date': Field(iso_date),
+})
+
+RECIPE = Schema('recipe', {
+    'recipe': Field(text, required=True, aliases=('name', 'title', 'recipe_name')),
+    'ingredients': Field(list_of(RECIPE_INGREDIENT)),
+    'cuisine': Field(text),
+    'spicy_level': Field(text),
+    'cooking_time': Field(minutes),
+    'overview': Field(text),
+    'instructions': Field(instructions, aliases=('steps', 'method')),
+})
+
+
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '‘': "'", '’': "'"})
+_TRAILING_COMMA_RE = re.compile(r',\s*([\]}])')
+_PY_LITERALS = {'None': 'null', 'True': 'true', 'False': 'false'}
+_PY_LITERAL_RE = re.compile(r'\b(None|True|False)\b')
+_FENCE_RE = re.compile(r'```[a-zA-Z]*\s*(.*?)(?:```|$)', re.DOTALL)
+
+_decoder = json.JSONDecoder()
+
+
+def _start(text_):
+    positions = [i for i in (text_.find('['), text_.find('{')) if i != -1]
+    return min(positions) if positions else -1
+
+
+def _open_brackets(fragment):
+    """
+    The closing brackets `fragment` is missing, innermost first, and whether it ends inside a string.
+    """
+    stack, in_string, escaped = [], False, False
+    for char in fragment:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '[{':
+            stack.append(']' if char == '[' else '}')
+        elif char in ']}' and stack:
+            stack.pop()
+    return ''.join(reversed(stack)), in_string
+
+
+def _closed(fragment, max_cuts=20):
+    """
+    A truncated value closed at the end, or cut back to one of its last complete elements.
+    """
+    cuts = [len(fragment)]
+    for index in range(len(fragment) - 1, -1, -1):
+        if len(cuts) > max_cuts:
+            break
+        if fragment[index] in ']}':
+            cuts.append(index + 1)
+        elif fragment[index] == ',':
+            cuts.append(index)
+    for cut in cuts:
+        head = fragment[:cut].rstrip().rstrip(',')
+        closers, in_string = _open_brackets(head)
+        if closers and not in_string:
+            yield head + closers
+
+
+def _repairs(fragment):
+    """
+    Repaired variants of `fragment`, cheapest first.
+    """
+    cleaned = _TRAILING_COMMA_RE.sub(r'\1', fragment.translate(_SMART_QUOTES))
+    yield cleaned
+    literals = _PY_LITERAL_RE.sub(lambda m: _PY_LITERALS[m.group(1)], cleaned)
+    yield literals
+    yield from _closed(literals)
+
+
+def extract_json(raw):
+    """
+    Return (value, method) for the first JSON value in `raw`; method is "direct", "extracted"
+    or "repaired". Raises ParseError when there is none.
+    """
+    raw = raw or ''
+    try:
+        return json.loads(raw), 'direct'
+    except ValueError:
+        pass
+
+    fenced = _FENCE_RE.search(raw)
+    region = fenced.group(1) if fenced else raw
+    start = _start(region)
+    if start == -1:
+        raise ParseError("no JSON array or object found")
+    fragment = region[start:].strip()
+
+    try:
+        return _decoder.raw_decode(fragment)[0], 'extracted'
+    except ValueError:
+        pass
+
+    for candidate in _repairs(fragment):
+        try:
+            return _decoder.raw_decode(candidate)[0], 'repaired'
+        except ValueError:
+            continue
+    try:
+        value = ast.literal_eval(fragment)
+        if isinstance(value, (list, dict)):
+            return value, 'repaired'
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        pass
+    if fragment.startswith('['):
+        # Last resort for a mangled array: keep every object that still decodes on its own
+        objects = JSONArrayStream().feed(fragment.translate(_SMART_QUOTES))
+        if objects:
+            return objects, 'repaired'
+    raise ParseError("the JSON could not be repaired")
+
+
+def _objects(value, many):
+    if isinstance(value, list):
+        return value if many else value[:1]
+    if isinstance(value, dict) and many:
+        # {"items": [...]} or {"recipes": [...]}
+        lists = [v for v in value.values() if isinstance(v, list) and all(isinstance(o, dict) for o in v)]
+        if len(value) == 1 and len(lists) == 1:
+            return lists[0]
+    return [value]
+
+
+def _parse(raw, schema, many):
+    value, method = extract_json(raw)
+    objects = _objects(value, many)
+    cleaned, dropped = schema.clean_many(objects)
+    if objects and not cleaned:
+        raise ParseError(f"no valid {schema.name} objects")
+    if not many and not cleaned:
+        raise ParseError(f"no {schema.name} object")
+    return (cleaned if many else cleaned[0]), method, dropped
+
+
+def parse(raw, schema, many=True):
+    """
+    Parse `raw` into cleaned objects (a list, or one object when `many` is False).
+    Raises ParseError.
+    """
+    try:
+        result, method, dropped = _parse(raw, schema, many)
+    except ParseError:
+        _record(schema, 'failed')
+        raise
+    _record(schema, method, dropped)
+    return result
+
+
+def reask_messages(messages, raw, error):
+    """
+    `messages` followed by the unusable reply and a request to answer with JSON only.
+    """
+    return list(messages) + [
+        {"role": "assistant", "content": raw or ''},
+        {"role": "user", "content": REASK_PROMPT.format(error=error)},
+    ]
+
+
+def parse_with_reask(raw, schema, reask, many=True, attempts=None):
+    """
+    `parse()`, then up to `attempts` (LLM_OUTPUT['REASK_ATTEMPTS']) calls of `reask(raw, error)`,
+    which must return a new completion text.
+    """
+    attempts = get_options()['REASK_ATTEMPTS'] if attempts is None else attempts
+    for attempt in range(attempts + 1):
+        try:
+            result, method, dropped = _parse(raw, schema, many)
+        except ParseError as e:
+            if attempt == attempts:
+                _record(schema, 'failed')
+                raise
+            logger.warning(f"Re-asking the model for {schema.name} output: {e}")
+            raw = reask(raw, str(e))
+            continue
+        _record(schema, 'reasked' if attempt else method, dropped)
+        return result
+
+
+async def aparse_with_reask(raw, schema, reask, many=True, attempts=None):
+    """
+    `parse_with_reask()` for an async `reask`.
+    """
+    attempts = get_options()['REASK_ATTEMPTS'] if attempts is None else attempts
+    for attempt in range(attempts + 1):
+        try:
+            result, method, dropped = _parse(raw, schema, many)
+        except ParseError as e:
+            if attempt == attempts:
+                _record(schema, 'failed')
+                raise
+            logger.warning(f"Re-asking the model for {schema.name} output: {e}")
+            raw = await reask(raw, str(e))
+            continue
+        _record(schema, 'reasked' if attempt else method, dropped)
+        return result
+
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _record(schema, outcome, dropped=0):
+    with _stats_lock:
+        counters = _stats.setdefault(schema.name, dict.fromkeys(OUTCOMES + ('dropped',), 0))
+        counters[outcome] += 1
+        counters['dropped'] += dropped
+
+
+def record_dropped(schema, count):
+    """
+    Count objects dropped outside `parse()`, e.g. while parsing a streamed answer.
+    """
+    if count:
+        with _stats_lock:
+            counters = _stats.setdefault(schema.name, dict.fromkeys(OUTCOMES + ('dropped',), 0))
+            counters['dropped'] += count
+
+
+def stats(name=None):
+    """
+    Counters per schema (or for one schema), with `success_rate` (parsed without asking the
+    model again) and `repair_rate` (needed extraction or repair).
+    """
+    with _stats_lock:
+        snapshot = {schema: dict(counters) for schema, counters in _stats.items()}
+    for counters in snapshot.values():
+        total = sum(counters[outcome] for outcome in OUTCOMES)
+        local = counters['direct'] + counters['extracted'] + counters['repaired']
+        counters['success_rate'] = round(local / total, 3) if total else None
+        counters['repair_rate'] = round((counters['extracted'] + counters['repaired']) / total, 3) if total else None
+    if name is not None:
+        return snapshot.get(name, dict.fromkeys(OUTCOMES + ('dropped',), 0))
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
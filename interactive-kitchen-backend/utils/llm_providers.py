@@ -0,0 +1,254 @@
+"""
+LLM providers: where chat completions come from.
+
+Callers never build API clients themselves. They ask the configured provider for an
+OpenAI-compatible client (`client`, or `async_client()` for the async runtime) and call
+`chat.completions.create(...)` on it as usual. `settings.LLM_PROVIDER['BACKEND']` selects:
+
+- `openai`: the real API (`OPENAI_API_KEY`);
+- `fake`: an in-process stand-in that needs no key or network. It answers with canned
+  responses after a latency drawn from a configurable distribution, and can fail a share of
+  calls. Benchmarks, load tests and CI use it to measure our own code path in isolation
+  (see `python manage.py benchmark_llm`);
+- a dotted path to any class with the same interface.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'openai',
+    'FAKE_LATENCY': {'DISTRIBUTION': 'lognormal', 'MEDIAN_MS': 800, 'SIGMA': 0.5},
+    'FAKE_ERROR_RATE': 0.0,
+    'FAKE_SEED': None,
+    'FAKE_RESPONSES': {},
+}
+
+BACKENDS = {
+    'openai': 'utils.llm_providers.OpenAIProvider',
+    'fake': 'utils.llm_providers.FakeProvider',
+}
+
+# Canned answers of the fake provider, by kind of request
+FAKE_RESPONSES = {
+    'receipt': [
+        {"name": "Milk", "quantity": 1, "unit": "l", "expiration_date": "2025-04-06"},
+        {"name": "Eggs", "quantity": 12, "unit": "pcs", "expiration_date": "2025-04-20"},
+        {"name": "Spinach", "quantity": 1, "unit": "bag", "expiration_date": "2025-04-04"},
+    ],
+    'recipe': [
+        {
+            "recipe": "Spinach Omelette",
+            "ingredients": [
+                {"name": "Eggs", "quantity": 3, "unit": "pcs", "expiration_date": "2025-04-20"},
+                {"name": "Spinach", "quantity": 50, "unit": "g", "expiration_date": "2025-04-04"},
+            ],
+            "cuisine": "French",
+            "spicy_level": "low",
+            "cooking_time": 10,
+            "overview": "A quick omelette with wilted spinach.",
+            "instructions": "1. Whisk the eggs. 2. Wilt the spinach. 3. Cook together and fold.",
+        }
+    ],
+}
+
+
+def get_options():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LLM_PROVIDER', {}))
+    return options
+
+
+class OpenAIProvider:
+    """
+    The OpenAI API. The sync client is created on first use; async clients are created by the
+    async runtime with its pooled HTTP client (utils/async_runtime.py).
+    """
+    name = 'openai'
+
+    def __init__(self, api_key=None, max_retries=2, **options):
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.max_retries = max_retries
+        self._client = None
+        self._lock = threading.Lock()
+        if not self.api_key:
+            logger.error("OpenAI API Key not found. Ensure it's set in the environment variables.")
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = openai.OpenAI(api_key=self.api_key, max_retries=self.max_retries)
+            return self._client
+
+    def async_client(self, http_client=None):
+        return openai.AsyncOpenAI(api_key=self.api_key, max_retries=self.max_retries, http_client=http_client)
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason='stop')])
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=None)])
+
+
+class FakeProvider:
+    """
+    Deterministic in-process stand-in for the API.
+
+    `latency` is a dict with a DISTRIBUTION of `constant` (MS), `uniform` (LOW_MS, HIGH_MS) or
+    `lognormal` (MEDIAN_MS, SIGMA). `responses` maps a kind (`receipt` for requests with an
+    image, `recipe` otherwise) to a JSON value or a list of raw answers used in turn.
+    A `seed` makes latencies and injected errors reproducible.
+    """
+    name = 'fake'
+
+    def __init__(self, latency=None, error_rate=0.0, seed=None, responses=None, **options):
+        self.latency = latency or DEFAULTS['FAKE_LATENCY']
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.responses = {kind: self._answers(value) for kind, value in dict(FAKE_RESPONSES, **(responses or {})).items()}
+        self.calls = 0
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions(self)))
+
+    @staticmethod
+    def _answers(value):
+        if isinstance(value, list) and value and all(isinstance(answer, str) for answer in value):
+            return itertools.cycle(value)
+        return itertools.repeat(json.dumps(value))
+
+    def is_configured(self):
+        return True
+
+    def async_client(self, http_client=None):
+        return SimpleNamespace(chat=SimpleNamespace(completions=_FakeAsyncCompletions(self)))
+
+    def sample_latency(self):
+        """
+        Seconds the next call takes.
+        """
+        distribution = self.latency.get('DISTRIBUTION', 'constant')
+        with self._random_lock:
+            if distribution == 'uniform':
+                ms = self.random.uniform(self.latency['LOW_MS'], self.latency['HIGH_MS'])
+            elif distribution == 'lognormal':
+                ms = self.random.lognormvariate(0, self.latency.get('SIGMA', 0.5)) * self.latency['MEDIAN_MS']
+            else:
+                ms = self.latency.get('MS', 0)
+        return ms / 1000
+
+    def answer(self, messages):
+        """
+        Return (content, latency) for a request, or raise an injected API error.
+        """
+        kind = 'receipt' if any(isinstance(m.get('content'), list) for m in messages) else 'recipe'
+        with self._random_lock:
+            self.calls += 1
+            failed = self.error_rate and self.random.random() < self.error_rate
+            content = next(self.responses[kind])
+        if failed:
+            raise openai.APIConnectionError(request=httpx.Request('POST', 'https://fake.invalid/v1/chat/completions'))
+        return content, self.sample_latency()
+
+    @staticmethod
+    def pieces(content, size=16):
+        return [content[i:i + size] for i in range(0, len(content), size)] or ['']
+
+
+class _FakeCompletions:
+    def __init__(self, provider):
+        self.provider = provider
+
+    def create(self, model=None, messages=(), stream=False, **kwargs):
+        content, latency = self.provider.answer(messages)
+        if not stream:
+            time.sleep(latency)
+            return _completion(content)
+
+        def chunks():
+            pieces = self.provider.pieces(content)
+            for piece in pieces:
+                time.sleep(latency / len(pieces))
+                yield _chunk(piece)
+        return chunks()
+
+
+class _FakeAsyncCompletions:
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def create(self, model=None, messages=(), stream=False, **kwargs):
+        content, latency = self.provider.answer(messages)
+        if not stream:
+            await asyncio.sleep(latency)
+            return _completion(content)
+
+        async def chunks():
+            pieces = self.provider.pieces(content)
+            for piece in pieces:
+                await asyncio.sleep(latency / len(pieces))
+                yield _chunk(piece)
+        return chunks()
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def build_provider(options=None):
+    from .async_runtime import get_options as client_options
+
+    options = options or get_options()
+    backend = options['BACKEND']
+    provider_class = import_string(BACKENDS.get(backend, backend))
+    return provider_class(
+        max_retries=client_options()['MAX_RETRIES'],
+        latency=options['FAKE_LATENCY'],
+        error_rate=options['FAKE_ERROR_RATE'],
+        seed=options['FAKE_SEED'],
+        responses=options['FAKE_RESPONSES'],
+    )
+
+
+def get_provider():
+    """
+    Return the process-wide provider, building it from settings on first use.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = build_provider()
+            logger.info(f"Using the {_provider.name} LLM provider")
+        return _provider
+
+
+def reset_provider():
+    global _provider
+    with _provider_lock:
+        _provider = None
+
+
+@receiver(setting_changed)
+def _on_setting_changed(setting, **kwargs):
+    if setting == 'LLM_PROVIDER':
+        reset_provider()
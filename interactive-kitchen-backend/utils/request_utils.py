@@ -9,4 +9,11 @@ def set_request_data_mutable(request, key, value):
     # Change the values you want
     request.data[key] = value
     # Set mutable flag back
-    request.data._mutable = _mutable
\ No newline at end of file
+    request.data._mutable = _mutable
+
+
+def is_truthy(value):
+    """
+    Interpret a form or query-string flag ("1", "true", "yes", "on") as a boolean.
+    """
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,44 @@
+"""
+Helpers for Server-Sent Events responses.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+def format_event(event, data):
+    """
+    Encode one SSE message: an `event:` line, a single-line JSON `data:` payload and a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def event_stream_response(events):
+    """
+    Stream `(event, data)` pairs as `text/event-stream`. Proxy buffering is disabled so
+    every event reaches the client as soon as it is produced.
+    """
+    response = StreamingHttpResponse(
+        (format_event(event, data) for event, data in events),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF views accept `Accept: text/event-stream`. Regular responses from such a view
+    (validation errors, for instance) are sent as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        event = 'error' if response is not None and response.status_code >= 400 else 'message'
+        return format_event(event, data).encode(self.charset)